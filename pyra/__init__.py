@@ -98,10 +98,30 @@ def initialize(config_file: str) -> bool:
 
         DEBUG = DEBUG or bool(CONFIG['Logging']['DEBUG_LOGGING'])
 
+        # react to settings changed at runtime
+        config.bus.subscribe(pattern='Logging.DEBUG_LOGGING', callback=_on_debug_logging_change)
+        config.bus.subscribe(pattern='Logging.LOG_R*', callback=_on_log_rotation_change)
+        config.bus.subscribe(pattern='*', callback=_on_config_change)
+
         _INITIALIZED = True
         return True
 
 
+def _on_debug_logging_change(changes: dict):
+    """Change the level of the loggers, called when the ``DEBUG_LOGGING`` setting changes."""
+    logger.set_debug(debug=bool(changes[('Logging', 'DEBUG_LOGGING')]))
+
+
+def _on_log_rotation_change(changes: dict):
+    """Recreate the log handlers, called when the rotation or retention settings change."""
+    logger.setup_loggers()
+
+
+def _on_config_change(changes: dict):
+    """Update the log blacklist, called when any setting changes."""
+    logger.blacklist_config(config=config.CONFIG)
+
+
 def stop(exit_code: Union[int, str] = 0, restart: bool = False):
     """
     Stop RetroArcher.
@@ -127,6 +147,13 @@ def stop(exit_code: Union[int, str] = 0, restart: bool = False):
     except AttributeError:
         pass
 
+    # stop the webapp, giving requests in progress time to finish
+    from pyra.webapp import stop_webapp
+    stop_webapp()
+
+    # deliver config changes which are still pending
+    config.bus.stop(timeout=5)
+
     if restart:
         if definitions.Modes.FROZEN:
             args = [definitions.Paths.BINARY_PATH]
@@ -0,0 +1,394 @@
+"""
+..
+   assets.py
+
+Functions related to serving the static assets of the webapp.
+
+Assets are served with a strong ``ETag`` derived from their content. URLs built with ``url_for('static', ...)`` include
+the content hash, so those responses can be cached by browsers for a year without revalidating. Text assets are sent
+gzip or brotli compressed when the browser accepts it, using ``.gz`` and ``.br`` sidecar files when they exist, or
+compressing the asset once on the first request otherwise. Other assets, such as videos, support range requests.
+
+Sidecar files can be generated at build time with ``python ./scripts/_compress_assets.py``.
+"""
+# standard imports
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from typing import Optional
+
+# lib imports
+from flask import Response, abort, request, send_file
+from werkzeug.security import safe_join
+
+# local imports
+from pyra import logger
+
+try:
+    import brotli
+except ModuleNotFoundError:
+    brotli = None
+
+log = logger.get_logger(name=__name__)
+
+# one year, the maximum recommended by RFC 9111
+immutable_max_age = 31536000
+
+# files smaller than this are not worth compressing
+min_compress_size = 256
+
+compressible_types = (
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+    'image/x-icon',
+    'image/vnd.microsoft.icon',
+    'text/',
+)
+
+_sidecar_extensions = dict(br='.br', gzip='.gz')
+
+_lock = threading.Lock()
+_assets = {}  # path -> Asset
+_compressed = {}  # (path, encoding) -> (mtime, bytes)
+
+
+class Asset:
+    """
+    A static asset and its content hash.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+
+    Attributes
+    ----------
+    path : str
+        The path of the file.
+    mtime : float
+        The modification time of the file when it was hashed.
+    size : int
+        The size of the file when it was hashed.
+    digest : str
+        The first 16 characters of the SHA-256 hash of the content.
+    mimetype : str
+        The mimetype of the file.
+
+    Examples
+    --------
+    >>> Asset(path='web/css/custom.css').digest
+    '3f1c0a2b9d8e7f65'
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+        stat = os.stat(path)
+        self.mtime = stat.st_mtime
+        self.size = stat.st_size
+
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        self.digest = sha256.hexdigest()[:16]
+
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    @property
+    def compressible(self) -> bool:
+        """
+        Check if the asset is worth compressing.
+
+        Returns
+        -------
+        bool
+            ``True`` if the asset is a text based format and is not tiny.
+
+        Examples
+        --------
+        >>> Asset(path='web/css/custom.css').compressible
+        True
+        """
+        return self.size >= min_compress_size and self.mimetype.startswith(compressible_types)
+
+
+def get_asset(path: str) -> Asset:
+    """
+    Get a static asset.
+
+    Assets are cached, the content is hashed again only if the modification time or size of the file changes.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+
+    Returns
+    -------
+    Asset
+        The asset.
+
+    Raises
+    ------
+    OSError
+        If the file cannot be read.
+
+    Examples
+    --------
+    >>> get_asset(path='web/css/custom.css')
+    <pyra.assets.Asset object at 0x...>
+    """
+    stat = os.stat(path)
+
+    with _lock:
+        asset = _assets.get(path)
+    if asset and asset.mtime == stat.st_mtime and asset.size == stat.st_size:
+        return asset
+
+    asset = Asset(path=path)
+    with _lock:
+        _assets[path] = asset
+    return asset
+
+
+def version(directory: str, filename: str) -> Optional[str]:
+    """
+    Get the content hash of a static asset, for use in its URL.
+
+    Parameters
+    ----------
+    directory : str
+        The static directory.
+    filename : str
+        The path of the file within the static directory.
+
+    Returns
+    -------
+    Optional[str]
+        The content hash, ``None`` if the file does not exist.
+
+    Examples
+    --------
+    >>> version(directory='web', filename='css/custom.css')
+    '3f1c0a2b9d8e7f65'
+    """
+    path = safe_join(directory, filename)
+    if not path or not os.path.isfile(path):
+        return None
+    return get_asset(path=path).digest
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """
+    Compress data.
+
+    Parameters
+    ----------
+    data : bytes
+        The data to compress.
+    encoding : str
+        ``gzip`` or ``br``.
+    level : Optional[int]
+        The compression level, or quality for brotli. Lower levels are faster. The maximum level is used by default.
+
+    Returns
+    -------
+    bytes
+        The compressed data.
+
+    Examples
+    --------
+    >>> compress(data=b'RetroArcher', encoding='gzip')
+    b'\\x1f\\x8b...'
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if level is None else level)
+    # no mtime, so the output only depends on the input
+    return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+
+
+def compress_file(path: str) -> list:
+    """
+    Write the compressed sidecar files of an asset.
+
+    Sidecar files are only written if they are missing or older than the asset. Brotli sidecars are only written if
+    ``brotli`` is installed.
+
+    Parameters
+    ----------
+    path : str
+        The path of the asset.
+
+    Returns
+    -------
+    list
+        The paths of the sidecar files that were written.
+
+    Examples
+    --------
+    >>> compress_file(path='web/css/custom.css')
+    ['web/css/custom.css.br', 'web/css/custom.css.gz']
+    """
+    asset = get_asset(path=path)
+    if not asset.compressible:
+        return []
+
+    written = []
+    data = None
+    for encoding, extension in sorted(_sidecar_extensions.items()):
+        if encoding == 'br' and not brotli:
+            continue
+
+        sidecar = path + extension
+        if os.path.isfile(sidecar) and os.path.getmtime(sidecar) >= asset.mtime:
+            continue
+
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+
+        with open(sidecar, 'wb') as f:
+            f.write(compress(data=data, encoding=encoding))
+        written.append(sidecar)
+
+    return written
+
+
+def compress_directory(directory: str) -> list:
+    """
+    Write the compressed sidecar files of all assets in a directory.
+
+    Parameters
+    ----------
+    directory : str
+        The directory to search recursively.
+
+    Returns
+    -------
+    list
+        The paths of the sidecar files that were written.
+
+    Examples
+    --------
+    >>> compress_directory(directory='web')
+    [...]
+    """
+    written = []
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1] in _sidecar_extensions.values():
+                continue
+            written += compress_file(path=os.path.join(root, name))
+
+    return written
+
+
+def _encoded(asset: Asset, encoding: str) -> bytes:
+    """Get the compressed content of an asset, from a sidecar file or compressed once and cached in memory."""
+    sidecar = asset.path + _sidecar_extensions[encoding]
+    try:
+        if os.path.getmtime(sidecar) >= asset.mtime:
+            with open(sidecar, 'rb') as f:
+                return f.read()
+    except OSError:
+        pass  # no sidecar file
+
+    with _lock:
+        cached = _compressed.get((asset.path, encoding))
+    if cached and cached[0] == asset.mtime:
+        return cached[1]
+
+    with open(asset.path, 'rb') as f:
+        data = compress(data=f.read(), encoding=encoding)
+
+    with _lock:
+        _compressed[(asset.path, encoding)] = (asset.mtime, data)
+    return data
+
+
+def choose_encoding() -> Optional[str]:
+    """
+    Get the preferred compression accepted by the client of the current request.
+
+    Returns
+    -------
+    Optional[str]
+        ``br`` or ``gzip``, ``None`` if the client does not accept compressed responses.
+
+    Examples
+    --------
+    >>> choose_encoding()
+    'gzip'
+    """
+    accepted = request.accept_encodings
+    encodings = ['br', 'gzip'] if brotli else ['gzip']
+
+    best = accepted.best_match(encodings)
+    if best and accepted.quality(best) > 0:
+        return best
+    return None
+
+
+def send_asset(directory: str, filename: str) -> Response:
+    """
+    Send a static asset.
+
+    Parameters
+    ----------
+    directory : str
+        The static directory.
+    filename : str
+        The path of the file within the static directory.
+
+    Returns
+    -------
+    Response
+        The response. ``304 Not Modified`` if the ``ETag`` matches, ``206 Partial Content`` for range requests of
+        uncompressed assets.
+
+    Raises
+    ------
+    werkzeug.exceptions.NotFound
+        If the file does not exist or is outside the static directory.
+
+    Examples
+    --------
+    >>> send_asset(directory='web', filename='css/custom.css')
+    <Response ... [200 OK]>
+    """
+    path = safe_join(directory, filename)
+    if not path or not os.path.isfile(path):
+        abort(404)
+
+    asset = get_asset(path=path)
+    encoding = choose_encoding() if asset.compressible else None
+
+    if encoding:
+        response = Response(response=_encoded(asset=asset, encoding=encoding), mimetype=asset.mimetype)
+        response.content_encoding = encoding
+        response.set_etag(f'{asset.digest}-{encoding}')
+        response.last_modified = asset.mtime
+        response.make_conditional(request)
+    else:
+        # supports range requests, e.g. for seeking in videos
+        response = send_file(path, mimetype=asset.mimetype, conditional=True, etag=asset.digest,
+                             last_modified=asset.mtime)
+
+    if asset.compressible:
+        response.vary.add('Accept-Encoding')
+
+    if request.args.get('v') == asset.digest:
+        # the url changes when the content changes
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = immutable_max_age
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True  # revalidate with the etag
+        response.cache_control.max_age = None
+
+    return response
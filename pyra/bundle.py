@@ -0,0 +1,337 @@
+"""
+..
+   bundle.py
+
+Pack a directory of static files into a single file, and serve files from it.
+
+This is used for the html documentation. Serving thousands of small files from the directory costs a ``stat`` and an
+``open`` per request, which is slow in the PyInstaller onefile build where the files are in a temporary directory. A
+bundle is opened once and memory-mapped, after which serving a file is a dictionary lookup and a copy from the map.
+
+A bundle is laid out as follows.
+
+- 8 bytes, the magic ``PYRABNDL``.
+- 8 bytes, the length of the index as a little-endian unsigned integer.
+- The index, a utf-8 encoded json object mapping the posix path of each file to a list of its offset, length, gzip
+  offset, gzip length, ETag, and mimetype. Offsets are from the start of the bundle. The gzip offset and length are
+  ``0`` if the file is not worth compressing.
+- The content of the files.
+"""
+# future imports
+from __future__ import annotations
+
+# standard imports
+import hashlib
+import json
+import mimetypes
+import mmap
+import os
+import struct
+import threading
+from typing import NamedTuple, Optional
+
+# lib imports
+from flask import Response, abort, request
+
+# local imports
+from pyra import assets
+from pyra import logger
+
+log = logger.get_logger(name=__name__)
+
+MAGIC = b'PYRABNDL'
+_index_length = struct.Struct('<Q')
+HEADER_SIZE = len(MAGIC) + _index_length.size
+
+
+class Entry(NamedTuple):
+    """
+    The location of a file in a bundle.
+
+    Attributes
+    ----------
+    offset : int
+        The offset of the content.
+    length : int
+        The length of the content.
+    gzip_offset : int
+        The offset of the gzip compressed content.
+    gzip_length : int
+        The length of the gzip compressed content, ``0`` if the file is not compressed.
+    etag : str
+        The first 16 characters of the SHA-256 hash of the content.
+    mimetype : str
+        The mimetype of the file.
+    """
+    offset: int
+    length: int
+    gzip_offset: int
+    gzip_length: int
+    etag: str
+    mimetype: str
+
+
+def create_bundle(directory: str, path: str) -> int:
+    """
+    Pack a directory into a bundle.
+
+    Text files are stored both uncompressed and gzip compressed.
+
+    Parameters
+    ----------
+    directory : str
+        The directory to pack, searched recursively.
+    path : str
+        The path of the bundle to write.
+
+    Returns
+    -------
+    int
+        The number of files in the bundle.
+
+    Examples
+    --------
+    >>> create_bundle(directory='docs/build/html', path='docs/build/docs.bundle')
+    412
+    """
+    files = []
+    for root, _dirs, names in os.walk(directory):
+        for name in sorted(names):
+            file_path = os.path.join(root, name)
+            files.append((os.path.relpath(file_path, directory).replace(os.sep, '/'), file_path))
+    files.sort()
+
+    index = {}
+    chunks = []
+    offset = 0  # relative to the start of the data, adjusted once the size of the index is known
+    for name, file_path in files:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        compressed = b''
+        if len(data) >= assets.min_compress_size and mimetype.startswith(assets.compressible_types):
+            compressed = assets.compress(data=data, encoding='gzip')
+            if len(compressed) >= len(data):
+                compressed = b''
+
+        index[name] = [offset, len(data), offset + len(data), len(compressed),
+                       hashlib.sha256(data).hexdigest()[:16], mimetype]
+        chunks += [data, compressed]
+        offset += len(data) + len(compressed)
+
+    # the offsets are stored as json, so their length depends on their value; use the final data offset in the
+    # index until its encoded length stops changing
+    data_offset = 0
+    while True:
+        encoded_index = json.dumps({
+            name: [entry[0] + data_offset, entry[1], entry[2] + data_offset, entry[3], entry[4], entry[5]]
+            for name, entry in index.items()
+        }, separators=(',', ':')).encode('utf-8')
+        if HEADER_SIZE + len(encoded_index) == data_offset:
+            break
+        data_offset = HEADER_SIZE + len(encoded_index)
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_index_length.pack(len(encoded_index)))
+        f.write(encoded_index)
+        for chunk in chunks:
+            f.write(chunk)
+
+    return len(index)
+
+
+class Bundle:
+    """
+    A memory-mapped bundle.
+
+    The bundle is opened the first time it is used. If it does not exist, or is not valid, the bundle is unavailable
+    and is not checked again.
+
+    Parameters
+    ----------
+    path : str
+        The path of the bundle.
+
+    Methods
+    -------
+    get:
+        Get the location of a file.
+    read:
+        Read the content of a file.
+    close:
+        Close the bundle.
+
+    Examples
+    --------
+    >>> Bundle(path='docs/build/docs.bundle').get(name='index.html')
+    Entry(offset=..., length=..., gzip_offset=..., gzip_length=..., etag='...', mimetype='text/html')
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._map = None
+        self._index = {}
+
+    def _load(self):
+        """Map the bundle and read its index."""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+
+            try:
+                with open(self.path, 'rb') as f:
+                    bundle_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return  # the bundle does not exist, or is empty
+
+            try:
+                if bundle_map[:len(MAGIC)] != MAGIC:
+                    raise ValueError('bad magic')
+                index_length = _index_length.unpack_from(bundle_map, len(MAGIC))[0]
+                index = json.loads(bundle_map[HEADER_SIZE:HEADER_SIZE + index_length].decode('utf-8'))
+                self._index = {name: Entry(*entry) for name, entry in index.items()}
+            except (ValueError, TypeError, struct.error) as e:
+                log.error(msg=f'Invalid bundle {self.path}: {e}')
+                bundle_map.close()
+                return
+
+            self._map = bundle_map
+
+    @property
+    def available(self) -> bool:
+        """
+        Check if the bundle exists and is valid.
+
+        Returns
+        -------
+        bool
+            ``True`` if files can be read from the bundle.
+
+        Examples
+        --------
+        >>> Bundle(path='docs/build/docs.bundle').available
+        True
+        """
+        if not self._loaded:
+            self._load()
+        return self._map is not None
+
+    def get(self, name: str) -> Optional[Entry]:
+        """
+        Get the location of a file.
+
+        Parameters
+        ----------
+        name : str
+            The posix path of the file within the bundled directory.
+
+        Returns
+        -------
+        Optional[Entry]
+            The location of the file, ``None`` if the file is not in the bundle or the bundle is unavailable.
+
+        Examples
+        --------
+        >>> Bundle(path='docs/build/docs.bundle').get(name='missing.html')
+        """
+        if not self._loaded:
+            self._load()
+        return self._index.get(name)
+
+    def read(self, entry: Entry, gzip: bool = False) -> bytes:
+        """
+        Read the content of a file.
+
+        Parameters
+        ----------
+        entry : Entry
+            The location of the file.
+        gzip : bool, default = False
+            ``True`` to read the gzip compressed content. The file must have been compressed.
+
+        Returns
+        -------
+        bytes
+            The content.
+
+        Examples
+        --------
+        >>> bundle = Bundle(path='docs/build/docs.bundle')
+        >>> bundle.read(entry=bundle.get(name='index.html'))
+        b'<!doctype html>...'
+        """
+        if gzip:
+            return self._map[entry.gzip_offset:entry.gzip_offset + entry.gzip_length]
+        return self._map[entry.offset:entry.offset + entry.length]
+
+    def close(self):
+        """
+        Close the bundle.
+
+        Examples
+        --------
+        >>> Bundle(path='docs/build/docs.bundle').close()
+        """
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+            self._map = None
+            self._index = {}
+
+
+def send_bundled(bundle: Bundle, filename: str) -> Response:
+    """
+    Send a file from a bundle.
+
+    Parameters
+    ----------
+    bundle : Bundle
+        The bundle.
+    filename : str
+        The path of the file within the bundled directory. Directories are resolved to their ``index.html``.
+
+    Returns
+    -------
+    Response
+        The response. ``304 Not Modified`` if the ``ETag`` matches.
+
+    Raises
+    ------
+    werkzeug.exceptions.NotFound
+        If the file is not in the bundle.
+
+    Examples
+    --------
+    >>> send_bundled(bundle=Bundle(path='docs/build/docs.bundle'), filename='index.html')
+    <Response ... [200 OK]>
+    """
+    name = filename.replace('\\', '/').lstrip('/')
+    if not name or name.endswith('/'):
+        name += 'index.html'
+
+    entry = bundle.get(name=name)
+    if entry is None:
+        abort(404)
+
+    encoding = assets.choose_encoding() if entry.gzip_length else None
+    if encoding == 'br':  # bundles only contain gzip
+        encoding = 'gzip' if request.accept_encodings.quality('gzip') > 0 else None
+
+    if encoding:
+        response = Response(response=bundle.read(entry=entry, gzip=True), mimetype=entry.mimetype)
+        response.content_encoding = encoding
+        response.set_etag(f'{entry.etag}-{encoding}')
+    else:
+        response = Response(response=bundle.read(entry=entry), mimetype=entry.mimetype)
+        response.set_etag(entry.etag)
+
+    if entry.gzip_length:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True  # revalidate with the etag
+
+    return response.make_conditional(request)
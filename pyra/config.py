@@ -5,17 +5,24 @@
 Responsible for config related functions.
 """
 # standard imports
+import fnmatch
+import os
+import stat
 import sys
-from typing import Optional, List
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 # lib imports
-from configobj import ConfigObj
+from configobj import ConfigObj, ConfigObjError
 from validate import Validator, ValidateError
 
 # local imports
 from pyra import definitions
 from pyra import logger
 from pyra import locales
+from pyra import threads
 
 # get log
 log = logger.get_logger(name=__name__)
@@ -26,8 +33,11 @@ FILENAME = definitions.Files.CONFIG
 # access the config dictionary here
 CONFIG = None
 
+# incremented whenever CONFIG may have changed, see `mark_changed()`
+REVISION = 0
+
 # localization
-_ = locales.get_text()
+_ = locales.lazy_gettext  # translated when used, so changing the locale applies without a restart
 
 # increase CONFIG_VERSION default and max when changing default values
 # then do `if CONFIG_VERSION == x:` something to change the old default value to the new default value
@@ -157,6 +167,41 @@ _CONFIG_SPEC_DICT = dict(
             description=_('Enable debug logging.'),
             default=True,
         ),
+        LOG_ROTATE_SIZE=dict(
+            type='integer',
+            name=_('Log rotation size'),
+            advanced=True,
+            description=_('Size in MB at which a log file is compressed and a new one is started.'),
+            default=5,
+            min=1,
+            max=1000,
+            data_parsley_type='integer',
+            extra_class='col-md-3',
+        ),
+        LOG_ROTATE_INTERVAL=dict(
+            type='integer',
+            name=_('Log rotation interval'),
+            advanced=True,
+            description=_('Hours after which a log file is compressed and a new one is started, 0 to only rotate by '
+                          'size.'),
+            default=24,
+            min=0,
+            max=8760,
+            data_parsley_type='integer',
+            extra_class='col-md-3',
+        ),
+        LOG_RETENTION_SIZE=dict(
+            type='integer',
+            name=_('Log retention size'),
+            advanced=True,
+            description=_('Total size in MB of all log files. The oldest compressed log files are removed to stay '
+                          'below it.'),
+            default=50,
+            min=1,
+            max=100000,
+            data_parsley_type='integer',
+            extra_class='col-md-3',
+        ),
     ),
     Network=dict(
         type='section',
@@ -192,6 +237,107 @@ _CONFIG_SPEC_DICT = dict(
             description=_('Todo: The base URL of the web server. Used for reverse proxies.'),
             extra_class='col-lg-6',
         ),
+        HTTP_SERVER=dict(
+            type='option',
+            name=_('HTTP server'),
+            advanced=True,
+            description=_('The web server to use. Waitress is recommended, the development server should only be used '
+                          'for debugging.'),
+            default='waitress',
+            options=[
+                'waitress',
+                'development',
+            ],
+            option_names=[
+                'Waitress',
+                _('Development server'),
+            ],
+            extra_class='col-lg-6',
+        ),
+        HTTP_THREADS=dict(
+            type='integer',
+            name=_('HTTP threads'),
+            advanced=True,
+            description=_('Number of threads handling requests. Each open dashboard keeps one thread busy for its '
+                          'live updates.'),
+            default=16,
+            min=1,
+            max=256,
+            data_parsley_type='integer',
+            extra_class='col-md-3',
+        ),
+        HTTP_BACKLOG=dict(
+            type='integer',
+            name=_('HTTP backlog'),
+            advanced=True,
+            description=_('Number of connections waiting to be accepted before new connections are refused.'),
+            default=1024,
+            min=1,
+            max=65535,
+            data_parsley_type='integer',
+            extra_class='col-md-3',
+        ),
+        HTTP_KEEP_ALIVE=dict(
+            type='integer',
+            name=_('HTTP keep-alive timeout'),
+            advanced=True,
+            description=_('Seconds to keep an idle connection open.'),
+            default=120,
+            min=1,
+            max=3600,
+            data_parsley_type='integer',
+            extra_class='col-md-3',
+        ),
+        HTTP_DRAIN_TIMEOUT=dict(
+            type='integer',
+            name=_('HTTP drain timeout'),
+            advanced=True,
+            description=_('Seconds to wait for requests in progress to finish when stopping.'),
+            default=5,
+            min=0,
+            max=60,
+            data_parsley_type='integer',
+            extra_class='col-md-3',
+        ),
+    ),
+    Hardware=dict(
+        type='section',
+        name=_('Hardware'),
+        description=_('Hardware monitoring settings.'),
+        icon='microchip',
+        CPU_INTERVAL=dict(
+            type='integer',
+            name=_('System sampling interval'),
+            advanced=True,
+            description=_('Seconds between samples of the system cpu, memory, and network usage.'),
+            default=1,
+            min=1,
+            max=60,
+            data_parsley_type='integer',
+            extra_class='col-md-3',
+        ),
+        GPU_INTERVAL=dict(
+            type='integer',
+            name=_('GPU sampling interval'),
+            advanced=True,
+            description=_('Seconds between samples of the gpu usage.'),
+            default=2,
+            min=1,
+            max=60,
+            data_parsley_type='integer',
+            extra_class='col-md-3',
+        ),
+        PROCESS_INTERVAL=dict(
+            type='integer',
+            name=_('Process sampling interval'),
+            advanced=True,
+            description=_(f'Seconds between samples of the {definitions.Names.name} process usage.'),
+            default=5,
+            min=1,
+            max=60,
+            data_parsley_type='integer',
+            extra_class='col-md-3',
+        ),
     ),
     User_Interface=dict(
         type='section',
@@ -292,6 +438,223 @@ def convert_config(d: dict = _CONFIG_SPEC_DICT, _config_spec: Optional[List] = N
     return _config_spec
 
 
+def _to_boolean(value: Any) -> bool:
+    """Convert a boolean setting from a form value, without using ``eval``."""
+    if isinstance(value, bool):
+        return value
+    try:
+        return _boolean_values[str(value).lower()]
+    except KeyError:
+        raise ValueError(f'Invalid boolean: {value}')
+
+
+_boolean_values = {
+    'true': True,
+    'false': False,
+}
+
+# convert a value from the web ui to the type of the setting
+_coercers = dict(
+    boolean=_to_boolean,
+    float=float,
+    integer=int,
+    option=str,
+    string=str,
+)
+
+# the shared validator, it caches the parsed checks of the spec
+_validator = Validator()
+
+
+class CompiledSpec:
+    """
+    A config spec dictionary, compiled once.
+
+    Everything needed to create, validate, and update a config is derived from the spec dictionary when the object is
+    created, so the dictionary is not walked again.
+
+    Parameters
+    ----------
+    spec : dict
+        The config spec dictionary.
+
+    Attributes
+    ----------
+    spec : dict
+        The config spec dictionary.
+    configspec : list
+        The config spec list, see ``convert_config()``.
+    configspec_object : ConfigObj
+        The parsed config spec list, shared by every config created from this spec.
+    sections : Dict[str, List[str]]
+        The keys of each section.
+    settings : Dict[Tuple[str, str], dict]
+        The spec of each setting, keyed by section and key.
+    coercers : Dict[Tuple[str, str], Callable]
+        A function converting a value from the web ui to the type of each setting.
+    limits : Dict[Tuple[str, str], Tuple[Optional[float], Optional[float]]]
+        The minimum and maximum of each setting which has any.
+    options : Dict[Tuple[str, str], tuple]
+        The allowed values of each setting which has options.
+    on_change : Dict[Tuple[str, str], Callable]
+        The function to call when each setting which has one is changed.
+    checks : Dict[Tuple[str, str], str]
+        The ``validate`` check of each setting, e.g. ``integer(min=21, max=65535, default=9696)``.
+
+    Methods
+    -------
+    coerce:
+        Convert a value to the type of a setting.
+    validate:
+        Convert and validate the value of a single setting.
+
+    Examples
+    --------
+    >>> spec = CompiledSpec(spec=_CONFIG_SPEC_DICT)
+    >>> spec.coerce(section='Network', key='HTTP_PORT', value='9696')
+    9696
+    """
+    def __init__(self, spec: dict):
+        self.spec = spec
+        self.configspec = convert_config(d=spec)
+        self.configspec_object = ConfigObj(infile=self.configspec, list_values=False, _inspec=True)
+
+        self.sections = {}
+        self.settings = {}
+        self.coercers = {}
+        self.limits = {}
+        self.options = {}
+        self.on_change = {}
+        self.checks = {}
+
+        for section, section_spec in spec.items():
+            self.sections[section] = []
+            for key, setting in section_spec.items():
+                if not isinstance(setting, dict):
+                    continue  # section name, description, etc.
+
+                name = (section, key)
+                self.sections[section].append(key)
+                self.settings[name] = setting
+                self.coercers[name] = _coercers[setting['type']]
+
+                if 'min' in setting or 'max' in setting:
+                    self.limits[name] = (setting.get('min'), setting.get('max'))
+                if 'options' in setting:
+                    self.options[name] = tuple(setting['options'])
+                if 'on_change' in setting:
+                    self.on_change[name] = setting['on_change']
+                self.checks[name] = self.configspec_object[section][key]
+
+    def coerce(self, section: str, key: str, value: Any) -> Any:
+        """
+        Convert a value to the type of a setting.
+
+        Parameters
+        ----------
+        section : str
+            The section of the setting.
+        key : str
+            The key of the setting.
+        value : Any
+            The value, usually a string from the web ui.
+
+        Returns
+        -------
+        Any
+            The converted value.
+
+        Raises
+        ------
+        KeyError
+            If the setting is not in the spec.
+        ValueError
+            If the value cannot be converted.
+
+        Examples
+        --------
+        >>> CompiledSpec(spec=_CONFIG_SPEC_DICT).coerce(section='General', key='LAUNCH_BROWSER', value='false')
+        False
+        """
+        return self.coercers[(section, key)](value)
+
+    def validate(self, section: str, key: str, value: Any) -> Any:
+        """
+        Convert and validate the value of a single setting.
+
+        Only the check of this setting is run, the rest of the config is not validated.
+
+        Parameters
+        ----------
+        section : str
+            The section of the setting.
+        key : str
+            The key of the setting.
+        value : Any
+            The value, usually a string from the web ui.
+
+        Returns
+        -------
+        Any
+            The converted value.
+
+        Raises
+        ------
+        KeyError
+            If the setting is not in the spec.
+        ValueError
+            If the value cannot be converted, or is not valid.
+
+        Examples
+        --------
+        >>> CompiledSpec(spec=_CONFIG_SPEC_DICT).validate(section='Network', key='HTTP_PORT', value='80')
+        80
+        >>> CompiledSpec(spec=_CONFIG_SPEC_DICT).validate(section='Network', key='HTTP_PORT', value='1')
+        Traceback (most recent call last):
+        ...
+        ValueError: the value "1" is too small.
+        """
+        value = self.coerce(section=section, key=key, value=value)
+        try:
+            return _validator.check(check=self.checks[(section, key)], value=value)
+        except ValidateError as e:
+            raise ValueError(str(e))
+
+
+_compiled_specs = {}  # id(spec) -> CompiledSpec, the compiled spec keeps the spec alive so the id is not reused
+_compiled_specs_lock = threading.Lock()
+
+
+def compile_spec(spec: dict = _CONFIG_SPEC_DICT) -> CompiledSpec:
+    """
+    Get the compiled version of a config spec dictionary.
+
+    Each spec dictionary is compiled only once, later calls return the same object.
+
+    Parameters
+    ----------
+    spec : dict, default = _CONFIG_SPEC_DICT
+        The config spec dictionary.
+
+    Returns
+    -------
+    CompiledSpec
+        The compiled spec.
+
+    Examples
+    --------
+    >>> compile_spec() is compile_spec()
+    True
+    """
+    with _compiled_specs_lock:
+        try:
+            compiled = _compiled_specs[id(spec)]
+        except KeyError:
+            compiled = _compiled_specs[id(spec)] = CompiledSpec(spec=spec)
+
+    return compiled
+
+
 def create_config(config_file: str, config_spec: dict = _CONFIG_SPEC_DICT) -> ConfigObj:
     """
     Create a config file and `ConfigObj` using a config spec dictionary.
@@ -324,8 +687,8 @@ def create_config(config_file: str, config_spec: dict = _CONFIG_SPEC_DICT) -> Co
     >>> create_config(config_file='config.ini')
     ConfigObj({...})
     """
-    # convert config spec dictionary to list
-    config_spec_list = convert_config(d=config_spec)
+    # the config spec is compiled once, and shared by every config created from it
+    config_spec_list = compile_spec(spec=config_spec).configspec_object
 
     config = ConfigObj(
         configspec=config_spec_list,
@@ -376,15 +739,32 @@ def create_config(config_file: str, config_spec: dict = _CONFIG_SPEC_DICT) -> Co
         validate_config(config=config)
 
     config.filename = config_file
-    config.write()  # write the config file
+    with _write_lock:
+        _write_atomic(config=config)  # write the config file
 
     if config_spec == _CONFIG_SPEC_DICT:  # set CONFIG dictionary
         global CONFIG
         CONFIG = config
+        mark_changed()
 
     return config
 
 
+def mark_changed():
+    """
+    Record that the config has changed.
+
+    This increments ``REVISION``, which is used to build the ETag of responses containing the config. It must be called
+    after modifying ``CONFIG`` in place.
+
+    Examples
+    --------
+    >>> mark_changed()
+    """
+    global REVISION
+    REVISION += 1
+
+
 def save_config(config: ConfigObj = CONFIG) -> bool:
     """
     Save the config to file.
@@ -408,13 +788,192 @@ def save_config(config: ConfigObj = CONFIG) -> bool:
     True
     """
     try:
-        config.write()
+        with _write_lock:
+            _write_atomic(config=config)
     except Exception:
         return False
     else:
+        if config is CONFIG:
+            mark_changed()
         return True
 
 
+# held while writing a config file, or while a transaction is committed
+_write_lock = threading.RLock()
+
+
+def _write_atomic(config: ConfigObj):
+    """
+    Write a config to its file atomically.
+
+    The config is written to a temporary file in the same directory, which is flushed to disk and then renamed over
+    the config file. A crash or a concurrent save never leaves a truncated file.
+    """
+    directory = os.path.dirname(os.path.abspath(config.filename))
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(config.filename)}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            config.write(outfile=f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        try:
+            os.chmod(temp_path, stat.S_IMODE(os.stat(config.filename).st_mode))  # keep the permissions of the file
+        except OSError:
+            pass  # the file does not exist yet
+
+        os.replace(temp_path, config.filename)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class Transaction:
+    """
+    Change several settings at once.
+
+    Each value is validated against its own check in the compiled spec when it is set, the rest of the config is not
+    validated again. The changes are applied when the transaction is committed, only if all of them are valid, so an
+    invalid value never reaches the config. The config file is only written if a value actually changed.
+
+    Parameters
+    ----------
+    config : Optional[ConfigObj]
+        The config to change. ``CONFIG`` is used by default.
+    spec : Optional[CompiledSpec]
+        The compiled spec of the config. The compiled ``_CONFIG_SPEC_DICT`` is used by default.
+
+    Attributes
+    ----------
+    changes : Dict[Tuple[str, str], Any]
+        The validated value of each setting to change, keyed by section and key.
+    errors : Dict[Tuple[str, str], str]
+        The error of each invalid setting, keyed by section and key.
+
+    Methods
+    -------
+    set:
+        Validate a new value of a setting.
+    commit:
+        Apply the changes and save the config.
+
+    Examples
+    --------
+    >>> transaction = Transaction()
+    >>> transaction.set(section='Network', key='HTTP_PORT', value='9697')
+    True
+    >>> transaction.commit()
+    {('Network', 'HTTP_PORT'): 9696}
+    """
+    def __init__(self, config: Optional[ConfigObj] = None, spec: Optional[CompiledSpec] = None):
+        self.config = CONFIG if config is None else config
+        self.spec = compile_spec() if spec is None else spec
+
+        self.changes = {}
+        self.errors = {}
+
+    def set(self, section: str, key: str, value: Any) -> bool:
+        """
+        Validate a new value of a setting.
+
+        Parameters
+        ----------
+        section : str
+            The section of the setting.
+        key : str
+            The key of the setting.
+        value : Any
+            The new value, usually a string from the web ui.
+
+        Returns
+        -------
+        bool
+            ``True`` if the value is valid, otherwise the error is added to ``errors``.
+
+        Examples
+        --------
+        >>> Transaction().set(section='Network', key='HTTP_PORT', value='1')
+        False
+        """
+        name = (section, key)
+        try:
+            self.changes[name] = self.spec.validate(section=section, key=key, value=value)
+        except KeyError:
+            self.errors[name] = f'Unknown setting: {section}|{key}'
+        except ValueError as e:
+            self.errors[name] = str(e)
+        else:
+            self.errors.pop(name, None)
+            return True
+
+        self.changes.pop(name, None)
+        return False
+
+    def commit(self) -> Dict[Tuple[str, str], Any]:
+        """
+        Apply the changes and save the config.
+
+        Nothing is applied if any value is invalid. If the config file cannot be written, the config is restored to its
+        previous values.
+
+        Returns
+        -------
+        Dict[Tuple[str, str], Any]
+            The previous value of each setting which changed, ``None`` if it was not set. Empty if nothing changed, in
+            which case the config file is not written.
+
+        Raises
+        ------
+        ValueError
+            If any value is invalid.
+        OSError
+            If the config file cannot be written.
+
+        Examples
+        --------
+        >>> Transaction().commit()
+        {}
+        """
+        if self.errors:
+            raise ValueError('; '.join(f'{section}|{key}: {error}' for (section, key), error in self.errors.items()))
+
+        with _write_lock:
+            previous = {}
+            for (section, key), value in self.changes.items():
+                current = self.config.get(section, {}).get(key)
+                if current != value:
+                    previous[(section, key)] = current
+
+            if not previous:
+                return previous
+
+            for section, key in previous:
+                self.config[section][key] = self.changes[(section, key)]
+
+            try:
+                _write_atomic(config=self.config)
+            except BaseException:
+                self._restore(previous=previous)
+                raise
+
+        if self.config is CONFIG:
+            mark_changed()
+            bus.publish(changes={name: self.changes[name] for name in previous})
+
+        return previous
+
+    def _restore(self, previous: Dict[Tuple[str, str], Any]):
+        """Restore the previous values of the config."""
+        for (section, key), value in previous.items():
+            if value is None:
+                self.config[section].pop(key, None)
+            else:
+                self.config[section][key] = value
+
+
 def validate_config(config: ConfigObj) -> bool:
     """
     Validate ConfigObj dictionary.
@@ -437,10 +996,9 @@ def validate_config(config: ConfigObj) -> bool:
     >>> validate_config(config=config_object)
     True
     """
-    validator = Validator()
     try:
         config.validate(
-            validator=validator,
+            validator=_validator,
             copy=False  # don't write out default values
         )
         return True
@@ -449,3 +1007,357 @@ def validate_config(config: ConfigObj) -> bool:
         log.error(msg=log_msg)
         sys.stderr.write(log_msg)
         return False
+
+
+def reload_config(config: Optional[ConfigObj] = None) -> Dict[Tuple[str, str], Any]:
+    """
+    Apply changes made to the config file by other programs.
+
+    The file is parsed and validated against the compiled spec, then compared to the config in memory. Only the
+    settings which changed are applied, and published to ``bus``. Settings with an invalid value in the file are logged
+    and keep their current value. The file is not written.
+
+    Parameters
+    ----------
+    config : Optional[ConfigObj]
+        The config to update, ``CONFIG`` by default.
+
+    Returns
+    -------
+    Dict[Tuple[str, str], Any]
+        The new value of each setting which changed.
+
+    Examples
+    --------
+    >>> reload_config()
+    {('Logging', 'DEBUG_LOGGING'): False}
+    """
+    config = CONFIG if config is None else config
+    spec = compile_spec()
+
+    try:
+        file_config = ConfigObj(
+            infile=config.filename,
+            configspec=spec.configspec_object,
+            encoding='UTF-8',
+            list_values=True,
+            stringify=True,
+            write_empty_values=False,
+            file_error=True,
+        )
+    except (OSError, ConfigObjError) as e:
+        log.error(msg=f'Unable to reload {config.filename}: {e}')
+        return {}
+
+    # missing settings are set to their default, so removing a line resets the setting
+    results = file_config.validate(validator=_validator, preserve_errors=True, copy=False)
+
+    changes = {}
+    with _write_lock:
+        for section, keys in spec.sections.items():
+            section_results = results if results is True else results.get(section, False)
+            for key in keys:
+                valid = section_results if isinstance(section_results, bool) else section_results.get(key, False)
+                if valid is not True:
+                    if key in file_config.get(section, {}):
+                        log.warning(msg=f'Ignoring invalid value of {section}|{key} in {config.filename}')
+                    continue
+
+                value = file_config[section][key]
+                if config.get(section, {}).get(key) != value:
+                    changes[(section, key)] = value
+
+        for (section, key), value in changes.items():
+            config[section][key] = value
+
+    if changes:
+        log.info(msg=f"Reloaded {', '.join(f'{section}|{key}' for section, key in changes)} from {config.filename}")
+        if config is CONFIG:
+            mark_changed()
+            bus.publish(changes=changes)
+
+    return changes
+
+
+class Subscription:
+    """
+    A subscription to config changes, see ``ChangeBus.subscribe()``.
+
+    Attributes
+    ----------
+    pattern : str
+        The pattern of the settings, matched against ``<section>.<key>``.
+    callback : Callable
+        The function called with the changes.
+    debounce : float
+        Seconds to wait for more changes before calling ``callback``.
+    """
+    def __init__(self, pattern: str, callback: Callable, debounce: float):
+        self.pattern = pattern
+        self.callback = callback
+        self.debounce = debounce
+
+        self._pending = {}  # (section, key) -> value
+        self._due = 0.0
+
+    def matches(self, section: str, key: str) -> bool:
+        """
+        Check if a setting matches the pattern of the subscription.
+
+        Parameters
+        ----------
+        section : str
+            The section of the setting.
+        key : str
+            The key of the setting.
+
+        Returns
+        -------
+        bool
+            ``True`` if the setting matches.
+
+        Examples
+        --------
+        >>> subscription = Subscription(pattern='Hardware.*', callback=print, debounce=0)
+        >>> subscription.matches(section='Hardware', key='GPU_INTERVAL')
+        True
+        """
+        return fnmatch.fnmatchcase(f'{section}.{key}', self.pattern)
+
+
+class ChangeBus:
+    """
+    Deliver config changes to subscribers on a worker thread.
+
+    Publishing never waits for the subscribers, so a settings request returns as soon as the config is saved. Changes
+    to the settings of a subscription are coalesced until no more changes arrive for ``debounce`` seconds, then the
+    callback is called once with the latest value of each changed setting. A callback that raises is logged, and does
+    not affect other subscribers.
+
+    Parameters
+    ----------
+    clock : Callable, default = time.monotonic
+        The clock used for debouncing.
+
+    Methods
+    -------
+    subscribe:
+        Subscribe to changes of the settings matching a pattern.
+    unsubscribe:
+        Remove a subscription.
+    publish:
+        Publish changed settings.
+    flush:
+        Deliver all pending changes now, and wait for the callbacks to finish.
+    stop:
+        Stop the worker thread.
+
+    Examples
+    --------
+    >>> changes = ChangeBus()
+    >>> subscription = changes.subscribe(pattern='Logging.*', callback=print, debounce=0)
+    >>> changes.publish(changes={('Logging', 'DEBUG_LOGGING'): False})
+    >>> changes.flush()
+    {('Logging', 'DEBUG_LOGGING'): False}
+    """
+    def __init__(self, clock: Callable = time.monotonic):
+        self.clock = clock
+
+        self._condition = threading.Condition()
+        self._subscriptions = []
+        self._delivering = 0
+        self._thread = None
+        self._stopping = False
+
+    def subscribe(self, pattern: str, callback: Callable[[Dict[Tuple[str, str], Any]], Any],
+                  debounce: float = 0.25) -> Subscription:
+        """
+        Subscribe to changes of the settings matching a pattern.
+
+        Subscribing the same callback to the same pattern again returns the existing subscription.
+
+        Parameters
+        ----------
+        pattern : str
+            A shell-style pattern matched against ``<section>.<key>``, e.g. ``Logging.*`` or ``*.HTTP_PORT``.
+        callback : Callable[[Dict[Tuple[str, str], Any]], Any]
+            The function to call with the new value of each changed setting, keyed by section and key.
+        debounce : float, default = 0.25
+            Seconds to wait for more changes before calling ``callback``.
+
+        Returns
+        -------
+        Subscription
+            The subscription, pass it to ``unsubscribe()`` to stop receiving changes.
+
+        Examples
+        --------
+        >>> ChangeBus().subscribe(pattern='Hardware.*', callback=print)
+        <pyra.config.Subscription object at 0x...>
+        """
+        with self._condition:
+            for subscription in self._subscriptions:
+                if subscription.pattern == pattern and subscription.callback == callback:
+                    subscription.debounce = debounce
+                    return subscription
+
+            subscription = Subscription(pattern=pattern, callback=callback, debounce=debounce)
+            self._subscriptions.append(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """
+        Remove a subscription.
+
+        Pending changes of the subscription are discarded.
+
+        Parameters
+        ----------
+        subscription : Subscription
+            The subscription returned by ``subscribe()``.
+
+        Examples
+        --------
+        >>> changes = ChangeBus()
+        >>> changes.unsubscribe(subscription=changes.subscribe(pattern='Hardware.*', callback=print))
+        """
+        with self._condition:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, changes: Dict[Tuple[str, str], Any]):
+        """
+        Publish changed settings.
+
+        Parameters
+        ----------
+        changes : Dict[Tuple[str, str], Any]
+            The new value of each changed setting, keyed by section and key.
+
+        Examples
+        --------
+        >>> ChangeBus().publish(changes={('Network', 'HTTP_PORT'): 9697})
+        """
+        if not changes:
+            return
+
+        with self._condition:
+            now = self.clock()
+            for subscription in self._subscriptions:
+                matched = {name: value for name, value in changes.items() if subscription.matches(*name)}
+                if matched:
+                    subscription._pending.update(matched)
+                    subscription._due = now + subscription.debounce
+
+            if self._thread is None:
+                self._thread = threads.run_in_thread(target=self._run, name='ConfigChanges', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Deliver all pending changes now, and wait for the callbacks to finish.
+
+        Parameters
+        ----------
+        timeout : Optional[float]
+            Seconds to wait, wait forever by default.
+
+        Returns
+        -------
+        bool
+            ``True`` if all changes were delivered before the timeout.
+
+        Examples
+        --------
+        >>> ChangeBus().flush()
+        True
+        """
+        with self._condition:
+            now = self.clock()
+            for subscription in self._subscriptions:
+                subscription._due = min(subscription._due, now)
+            self._condition.notify_all()
+
+            return self._condition.wait_for(
+                predicate=lambda: self._thread is None or (
+                    not self._delivering and not any(sub._pending for sub in self._subscriptions)),
+                timeout=timeout,
+            )
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Deliver pending changes, then stop the worker thread.
+
+        The subscriptions are kept, a new worker thread is started by the next ``publish()``.
+
+        Parameters
+        ----------
+        timeout : Optional[float]
+            Seconds to wait for pending changes to be delivered, wait forever by default.
+
+        Examples
+        --------
+        >>> ChangeBus().stop()
+        """
+        self.flush(timeout=timeout)
+
+        with self._condition:
+            self._stopping = True
+            thread = self._thread
+            self._condition.notify_all()
+
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+
+    def _run(self):
+        """Deliver changes when their subscriptions are due."""
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopping:
+                        self._thread = None
+                        self._stopping = False  # a later publish starts a new worker
+                        self._condition.notify_all()
+                        return
+
+                    now = self.clock()
+                    due = [sub for sub in self._subscriptions if sub._pending and sub._due <= now]
+                    if due:
+                        break
+
+                    pending = [sub._due for sub in self._subscriptions if sub._pending]
+                    self._condition.wait(timeout=min(pending) - now if pending else None)
+
+                batches = [(subscription, subscription._pending) for subscription in due]
+                for subscription in due:
+                    subscription._pending = {}
+                self._delivering += 1
+
+            try:
+                for subscription, changes in batches:
+                    try:
+                        subscription.callback(changes)
+                    except Exception as e:
+                        log.exception(msg=f'Error in config change subscriber {subscription.pattern}: {e}')
+            finally:
+                with self._condition:
+                    self._delivering -= 1
+                    self._condition.notify_all()
+
+
+# changes of CONFIG are published here
+bus = ChangeBus()
+
+
+def _run_on_change(changes: Dict[Tuple[str, str], Any]):
+    """Run the ``on_change`` functions of the changed settings."""
+    on_change = compile_spec().on_change
+    for name in changes:
+        on_change[name]()
+
+
+# the `on_change` functions of the spec are run by the bus, not by the settings request
+for _section, _key in compile_spec().on_change:
+    bus.subscribe(pattern=f'{_section}.{_key}', callback=_run_on_change, debounce=0)
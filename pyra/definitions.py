@@ -132,10 +132,14 @@ class Paths:
         The data directory of the application.
     DOCS_DIR : str
         The directory containing html documentation.
+    DOCS_BUNDLE : str
+        The bundle of the html documentation, see ``pyra.bundle``. This is used instead of ``DOCS_DIR`` if it exists.
     LOCALE_DIR : str
         The directory containing localization files.
     LOG_DIR : str
         The directory containing log files.
+    METRICS_DIR : str
+        The directory containing the files of the dashboard metrics history.
 
     Examples
     --------
@@ -154,5 +158,7 @@ class Paths:
         DATA_DIR = '/config'  # overwrite the value that was already set
 
     DOCS_DIR = os.path.join(ROOT_DIR, 'docs', 'build', 'html')
+    DOCS_BUNDLE = os.path.join(ROOT_DIR, 'docs', 'build', 'docs.bundle')
     LOCALE_DIR = os.path.join(ROOT_DIR, 'locale')
     LOG_DIR = os.path.join(DATA_DIR, 'logs')
+    METRICS_DIR = os.path.join(DATA_DIR, 'metrics')
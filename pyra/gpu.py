@@ -0,0 +1,458 @@
+"""
+..
+   gpu.py
+
+Persistent collectors of Nvidia GPU usage.
+
+A backend is opened once and keeps its connection to the driver, so a sample is a cheap in-process read instead of
+spawning ``nvidia-smi`` for every sample.
+
+- :class:`NvmlBackend` reads the NVML library directly using
+  `nvidia-ml-py <https://pypi.org/project/nvidia-ml-py/>`_.
+- :class:`SmiBackend` starts a single long-lived ``nvidia-smi --loop-ms`` subprocess and parses the CSV it streams.
+- :class:`FakeBackend` replays recorded ``nvidia-smi`` CSV, this allows testing on machines without a GPU.
+"""
+# future imports
+from __future__ import annotations
+
+# standard imports
+import shutil
+import subprocess
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+# local imports
+from pyra import logger
+from pyra import threads
+
+try:
+    import pynvml
+except ModuleNotFoundError:
+    pynvml = None
+
+log = logger.get_logger(name=__name__)
+
+SMI_FIELDS = 'index,name,utilization.gpu'
+
+
+def parse_smi_line(line: str) -> Optional[Tuple[int, str, Optional[float]]]:
+    """
+    Parse a line of ``nvidia-smi`` CSV output.
+
+    The line must contain the fields of ``SMI_FIELDS``, as returned with ``--format=csv,noheader,nounits``.
+
+    Parameters
+    ----------
+    line : str
+        The line to parse.
+
+    Returns
+    -------
+    Optional[Tuple[int, str, Optional[float]]]
+        The index, name, and load percentage of the gpu. The load is ``None`` if it is not supported by the gpu.
+        ``None`` is returned if the line cannot be parsed.
+
+    Examples
+    --------
+    >>> parse_smi_line(line='0, NVIDIA GeForce RTX 3080, 12')
+    (0, 'NVIDIA GeForce RTX 3080', 12.0)
+    """
+    # the name may contain commas, but the index and load never do
+    index, sep, rest = line.strip().partition(',')
+    name, sep_2, load = rest.rpartition(',')
+    if not sep or not sep_2:
+        return None
+
+    try:
+        index = int(index)
+    except ValueError:
+        return None
+
+    try:
+        load = min(100.0, float(load))  # max of 100
+    except ValueError:
+        load = None  # e.g. `[N/A]`
+
+    return index, name.strip(), load
+
+
+class GpuBackend:
+    """
+    Base class of the gpu backends.
+
+    Methods
+    -------
+    read:
+        Get the latest load of each gpu.
+    close:
+        Release the resources held by the backend.
+    """
+    def read(self) -> List[Tuple[str, Optional[float]]]:
+        """
+        Get the latest load of each gpu.
+
+        Returns
+        -------
+        List[Tuple[str, Optional[float]]]
+            A list of tuples containing the name and load percentage of each gpu.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the resources held by the backend."""
+
+
+class NvmlBackend(GpuBackend):
+    """
+    Read gpu usage from the NVML library.
+
+    NVML is initialized once when the backend is created, each sample only queries the device handles.
+
+    Raises
+    ------
+    RuntimeError
+        If ``nvidia-ml-py`` is not installed.
+    pynvml.NVMLError
+        If NVML cannot be initialized, e.g. if there is no Nvidia driver.
+
+    Examples
+    --------
+    >>> NvmlBackend()
+    <pyra.gpu.NvmlBackend object at 0x...>
+    """
+    def __init__(self):
+        if not pynvml:
+            raise RuntimeError('nvidia-ml-py is not installed')
+
+        pynvml.nvmlInit()
+
+        self._handles = []
+        for index in range(pynvml.nvmlDeviceGetCount()):
+            handle = pynvml.nvmlDeviceGetHandleByIndex(index)
+            name = pynvml.nvmlDeviceGetName(handle)
+            if isinstance(name, bytes):  # older versions return bytes
+                name = name.decode('utf-8')
+            self._handles.append((f'{name}-{index}', handle))
+
+    def read(self) -> List[Tuple[str, Optional[float]]]:
+        """
+        Get the latest load of each gpu.
+
+        Returns
+        -------
+        List[Tuple[str, Optional[float]]]
+            A list of tuples containing the name and load percentage of each gpu.
+
+        Examples
+        --------
+        >>> NvmlBackend().read()
+        [('NVIDIA GeForce RTX 3080-0', 12.0)]
+        """
+        gpu_loads = []
+        for name, handle in self._handles:
+            try:
+                gpu_load = min(100.0, float(pynvml.nvmlDeviceGetUtilizationRates(handle).gpu))  # max of 100
+            except pynvml.NVMLError:
+                gpu_load = None
+            gpu_loads.append((name, gpu_load))
+
+        return gpu_loads
+
+    def close(self):
+        """
+        Shutdown NVML.
+
+        Examples
+        --------
+        >>> NvmlBackend().close()
+        """
+        self._handles = []
+        pynvml.nvmlShutdown()
+
+
+class CsvBackend(GpuBackend):
+    """
+    Base class of backends which parse ``nvidia-smi`` CSV output.
+
+    The latest sample of each gpu is held in memory, reading it does not wait for new output.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest = {}  # index -> (name, load)
+
+    def feed(self, line: str):
+        """
+        Update the latest sample of a gpu from a line of CSV.
+
+        Lines that cannot be parsed are ignored.
+
+        Parameters
+        ----------
+        line : str
+            A line of ``nvidia-smi`` CSV output.
+
+        Examples
+        --------
+        >>> CsvBackend().feed(line='0, NVIDIA GeForce RTX 3080, 12')
+        """
+        sample = parse_smi_line(line=line)
+        if sample:
+            index, name, load = sample
+            with self._lock:
+                self._latest[index] = (f'{name}-{index}', load)
+
+    def read(self) -> List[Tuple[str, Optional[float]]]:
+        """
+        Get the latest load of each gpu.
+
+        Returns
+        -------
+        List[Tuple[str, Optional[float]]]
+            A list of tuples containing the name and load percentage of each gpu, ordered by gpu index.
+
+        Examples
+        --------
+        >>> backend = CsvBackend()
+        >>> backend.feed(line='0, NVIDIA GeForce RTX 3080, 12')
+        >>> backend.read()
+        [('NVIDIA GeForce RTX 3080-0', 12.0)]
+        """
+        with self._lock:
+            return [self._latest[index] for index in sorted(self._latest)]
+
+
+class SmiBackend(CsvBackend):
+    """
+    Read gpu usage from a long-lived ``nvidia-smi`` subprocess.
+
+    ``nvidia-smi`` is started once with ``--loop-ms`` and streams a CSV line per gpu at every interval. A daemon thread
+    parses the lines as they arrive.
+
+    Parameters
+    ----------
+    interval : float, default = 1
+        Seconds between samples taken by ``nvidia-smi``.
+    executable : str, default = 'nvidia-smi'
+        The ``nvidia-smi`` executable.
+
+    Raises
+    ------
+    OSError
+        If ``nvidia-smi`` cannot be started.
+
+    Examples
+    --------
+    >>> SmiBackend()
+    <pyra.gpu.SmiBackend object at 0x...>
+    """
+    def __init__(self, interval: float = 1, executable: str = 'nvidia-smi'):
+        super().__init__()
+
+        self._process = subprocess.Popen(
+            args=[
+                executable,
+                f'--query-gpu={SMI_FIELDS}',
+                '--format=csv,noheader,nounits',
+                f'--loop-ms={max(1, int(interval * 1000))}',
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+
+        self._thread = threads.run_in_thread(target=self._read_output, name='nvidia-smi', daemon=True)
+        self._thread.start()
+
+    def _read_output(self):
+        """Feed each line of output until the subprocess exits."""
+        for line in self._process.stdout:
+            self.feed(line=line)
+
+    def close(self):
+        """
+        Stop the ``nvidia-smi`` subprocess.
+
+        Examples
+        --------
+        >>> SmiBackend().close()
+        """
+        if self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process.stdout.close()
+
+
+class FakeBackend(CsvBackend):
+    """
+    Replay recorded ``nvidia-smi`` CSV output.
+
+    Each read feeds the lines of the next recorded sample, a new sample starts whenever the index of a gpu repeats.
+    The recording restarts from the beginning once all samples have been replayed.
+
+    Parameters
+    ----------
+    lines : Iterable[str]
+        The recorded lines, as returned by ``nvidia-smi --query-gpu=index,name,utilization.gpu
+        --format=csv,noheader,nounits``.
+
+    Raises
+    ------
+    ValueError
+        If the recording does not contain any valid lines.
+
+    Examples
+    --------
+    >>> backend = FakeBackend(lines=['0, NVIDIA GeForce RTX 3080, 12', '0, NVIDIA GeForce RTX 3080, 15'])
+    >>> backend.read()
+    [('NVIDIA GeForce RTX 3080-0', 12.0)]
+    >>> backend.read()
+    [('NVIDIA GeForce RTX 3080-0', 15.0)]
+    """
+    def __init__(self, lines: Iterable[str]):
+        super().__init__()
+
+        self._samples = []
+        sample = []
+        for line in lines:
+            parsed = parse_smi_line(line=line)
+            if not parsed:
+                continue
+            if any(parse_smi_line(line=previous)[0] == parsed[0] for previous in sample):
+                self._samples.append(sample)
+                sample = []
+            sample.append(line)
+        if sample:
+            self._samples.append(sample)
+
+        if not self._samples:
+            raise ValueError('The recording does not contain any valid nvidia-smi lines')
+
+        self._position = 0
+
+    def read(self) -> List[Tuple[str, Optional[float]]]:
+        """
+        Replay the next recorded sample.
+
+        Returns
+        -------
+        List[Tuple[str, Optional[float]]]
+            A list of tuples containing the name and load percentage of each gpu, ordered by gpu index.
+
+        Examples
+        --------
+        >>> FakeBackend(lines=['0, NVIDIA GeForce RTX 3080, 12']).read()
+        [('NVIDIA GeForce RTX 3080-0', 12.0)]
+        """
+        for line in self._samples[self._position]:
+            self.feed(line=line)
+        self._position = (self._position + 1) % len(self._samples)
+
+        return super().read()
+
+
+def nvidia_backend(interval: float = 1) -> Optional[GpuBackend]:
+    """
+    Open the best available Nvidia backend.
+
+    NVML is preferred, ``nvidia-smi`` is used if NVML is not available.
+
+    Parameters
+    ----------
+    interval : float, default = 1
+        Seconds between samples taken by ``nvidia-smi``, if it is used.
+
+    Returns
+    -------
+    Optional[GpuBackend]
+        The backend, ``None`` if there is no way to read Nvidia gpus.
+
+    Examples
+    --------
+    >>> nvidia_backend()
+    <pyra.gpu.NvmlBackend object at 0x...>
+    """
+    if pynvml:
+        try:
+            return NvmlBackend()
+        except Exception as e:
+            log.debug(msg=f'NVML is not available: {e}')
+
+    executable = shutil.which('nvidia-smi')
+    if executable:
+        try:
+            return SmiBackend(interval=interval, executable=executable)
+        except OSError as e:
+            log.debug(msg=f'nvidia-smi is not available: {e}')
+
+    return None
+
+
+class GpuCollector:
+    """
+    Collect the usage of all gpus from a set of backends.
+
+    Parameters
+    ----------
+    backends : Iterable[Optional[GpuBackend]]
+        The backends to read. ``None`` values are ignored, so the result of ``nvidia_backend()`` can be passed directly.
+
+    Attributes
+    ----------
+    backends : list
+        The backends to read.
+
+    Methods
+    -------
+    read:
+        Get the latest load of each gpu.
+    close:
+        Close all backends.
+
+    Examples
+    --------
+    >>> collector = GpuCollector(backends=[FakeBackend(lines=['0, NVIDIA GeForce RTX 3080, 12'])])
+    >>> collector.read()
+    [('NVIDIA GeForce RTX 3080-0', 12.0)]
+    """
+    def __init__(self, backends: Iterable[Optional[GpuBackend]]):
+        self.backends = [backend for backend in backends if backend]
+
+    def read(self) -> List[Tuple[str, Optional[float]]]:
+        """
+        Get the latest load of each gpu.
+
+        A backend that fails is logged and skipped.
+
+        Returns
+        -------
+        List[Tuple[str, Optional[float]]]
+            A list of tuples containing the name and load percentage of each gpu.
+
+        Examples
+        --------
+        >>> GpuCollector(backends=[]).read()
+        []
+        """
+        gpu_loads = []
+        for backend in self.backends:
+            try:
+                gpu_loads.extend(backend.read())
+            except Exception as e:
+                log.error(msg=f'Unable to read gpu usage from {type(backend).__name__}: {e}')
+
+        return gpu_loads
+
+    def close(self):
+        """
+        Close all backends.
+
+        Examples
+        --------
+        >>> GpuCollector(backends=[]).close()
+        """
+        for backend in self.backends:
+            backend.close()
+        self.backends = []
@@ -5,24 +5,33 @@
 Functions related to the dashboard viewer.
 """
 # standard imports
+import json
+import os
+import threading
+from typing import Callable, Iterator, Optional, Tuple
 
 # lib imports
-import GPUtil
 from numexpr import cpuinfo
 import psutil
 
 # local imports
+from pyra import config
 from pyra import definitions
+from pyra import gpu
 from pyra import helpers
+from pyra import history
 from pyra import locales
 from pyra import logger
+from pyra import process_table
+from pyra import sampler
+from pyra import timeseries
 
 try:
     cpu_name = cpuinfo.cpu.info[0]['ProcessorNameString'].strip()
 except KeyError:
     cpu_name = None
 
-_ = locales.get_text()
+_ = locales.lazy_gettext  # translated when used, so changing the locale applies without a restart
 chart_translations = dict(
     cpu=dict(
         bare=_('cpu'),
@@ -53,11 +62,12 @@ log = logger.get_logger(__name__)
 initialized = False
 network_recv_last = 0
 network_sent_last = 0
-proc = psutil.Process()  # the main retroarcher process
-proc_id = proc.pid
-processes = [proc]
+# the main retroarcher process and all its descendants
+proc_table = process_table.ProcessTable(root_pid=os.getpid(), root_name=definitions.Names.name)
 
-nvidia_gpus = GPUtil.getGPUs()
+# the nvidia backend stays open, so sampling does not spawn `nvidia-smi` every time
+gpu_collector = gpu.GpuCollector(backends=[gpu.nvidia_backend()])
+nvidia_gpus = gpu_collector.backends  # list of open nvidia backends
 
 try:
     import pyamdgpuinfo  # linux only
@@ -73,32 +83,47 @@ else:
     pyamdgpu = True
     amd_gpus = range(pyamdgpuinfo.detect_gpus())  # integer representing amd gpus count
 
-dash_stats = dict(
-    time=dict(
-        timestamp=[],
-        relative_time=[]
-    ),
-    cpu=dict(
-        system=[]
-    ),
-    gpu=dict(),
-    memory=dict(
-        system=[]
-    ),
-    network=dict(
-        sent=[],
-        received=[]
-    )
+history_length = 120
+
+_lock = threading.Lock()  # updates are made by the sampler thread while the webapp reads the charts
+
+# latest values from `sample_processes()` and `sample_gpu()`, recorded by `update_system()`
+_process_stats = []
+_gpu_loads = []
+
+hardware_sampler = None  # set by `start_sampler()`
+
+# static parts of the charts, see `_chart_template()`
+_chart_templates = {}
+_chart_templates_locale = None
+_chart_templates_max = 64
+
+# raw samples for 2 minutes, 10 second rollups for an hour, and 1 minute rollups for a week
+metrics_history = history.MetricsHistory()
+
+_dash_series = dict(
+    cpu=['system'],
+    gpu=[],
+    memory=['system'],
+    network=['sent', 'received'],
 )
 
-history_length = 120
+# one sample per second, keep an extra sample so the oldest value sits exactly on the upper X axis label
+# the store is bounded by the number of samples, not by their age
+# this is kept in memory until `load_history()` is called
+dash_stats = timeseries.TimeSeriesStore(capacity=history_length + 1, series=_dash_series)
+
+
+def _read_cpu() -> float:
+    """Get the current system cpu percentage utilized."""
+    return min(float(100), psutil.cpu_percent(interval=None, percpu=False))  # max of 100
 
 
 def update_cpu() -> float:
     """
     Update dashboard stats for system CPU usage.
 
-    This will append a new value to the ``dash_stats['cpu'][system']`` list.
+    This will record a new value in the ``dash_stats['cpu']['system']`` series.
 
     Returns
     -------
@@ -109,67 +134,70 @@ def update_cpu() -> float:
     --------
     >>> update_cpu()
     """
-    cpu_percent = min(float(100), psutil.cpu_percent(interval=None, percpu=False))  # max of 100
+    cpu_percent = _read_cpu()
 
     if initialized:
-        dash_stats['cpu']['system'].append(cpu_percent)
+        with _lock:
+            dash_stats.record(group='cpu', key='system', value=cpu_percent)
 
     return cpu_percent
 
 
+def _read_gpu() -> list:
+    """Get a list of tuples containing the name and load percentage of each gpu."""
+    gpu_loads = gpu_collector.read()  # nvidia gpus
+
+    for amd_gpu_index in amd_gpus:  # loop through found amd gpus
+        if pyamdgpu:
+            amd_gpu = pyamdgpuinfo.get_gpu(amd_gpu_index)
+            name = f'{amd_gpu.name}-{amd_gpu.gpu_id}'
+            gpu_load = min(100, amd_gpu.query_load())  # max of 100
+        else:
+            amd_gpu = amd_gpu_index  # pyadl device
+            name = f'{amd_gpu.adapterName.decode("utf-8")}-{amd_gpu.adapterIndex}'  # adapterName is bytes so decode it
+            try:
+                gpu_load = min(100, amd_gpu.getCurrentUsage())  # max of 100
+            except ADLError:
+                gpu_load = None
+
+        gpu_loads.append((name, gpu_load))
+
+    return gpu_loads
+
+
 def update_gpu():
     """
     Update dashboard stats for system GPU usage.
 
-    This will create new keys for the ``dash_stats`` dictionary if required, and then append a new value to the
-    appropriate list.
+    This will create new series in the ``dash_stats`` store if required, and then record a new value in the
+    appropriate series.
 
     AMD data is provided by `pyamdgpuinfo <https://github.com/mark9064/pyamdgpuinfo>`_ on Linux, and by
     `pyadl <https://github.com/nicolargo/pyadl>`_ on non Linux systems.
-    Nvidia data is provided by `GPUtil <https://github.com/anderskm/gputil>`_.
+    Nvidia data is provided by the persistent backends of ``pyra.gpu``, see ``gpu_collector``.
 
     Examples
     --------
     >>> update_gpu()
     """
-    global nvidia_gpus
-    nvidia_gpus = GPUtil.getGPUs()  # need to get the GPUs again otherwise the load does not update
-
-    gpu_types = [nvidia_gpus, amd_gpus]
-
-    for gpu_type in gpu_types:  # loop through gpu types
-        for gpu in gpu_type:  # loop through found gpus
-            name = None
-            gpu_load = None
-            if gpu_type == nvidia_gpus:
-                name = f'{gpu.name}-{gpu.id}'
-                gpu_load = min(100, gpu.load * 100)  # convert decimal to percentage, max of 100
-            elif gpu_type == amd_gpus:
-                if pyamdgpu:
-                    amd_gpu = pyamdgpuinfo.get_gpu(gpu)
-                    name = f'{amd_gpu.name}-{amd_gpu.gpu_id}'
-                    gpu_load = min(100, gpu.query_load())  # max of 100
-                else:
-                    name = f'{gpu.adapterName.decode("utf-8")}-{gpu.adapterIndex}'  # adapterName is bytes so decode it
-                    try:
-                        gpu_load = min(100, gpu.getCurrentUsage())  # max of 100
-                    except ADLError:
-                        gpu_load = None
-
-            if initialized and name:
-                try:
-                    dash_stats['gpu'][name]
-                except KeyError:
-                    dash_stats['gpu'][name] = []
-                finally:
-                    dash_stats['gpu'][name].append(gpu_load)
+    gpu_loads = _read_gpu()
+
+    if initialized:
+        with _lock:
+            for name, gpu_load in gpu_loads:
+                dash_stats.record(group='gpu', key=name, value=gpu_load)
+
+
+def _read_memory() -> float:
+    """Get the current system memory percentage utilized."""
+    return min(100, psutil.virtual_memory().percent)  # max of 100
 
 
 def update_memory():
     """
     Update dashboard stats for system memory usage.
 
-    This will append a new value to the ``dash_stats['memory']['system']`` list.
+    This will record a new value in the ``dash_stats['memory']['system']`` series.
 
     Returns
     -------
@@ -180,30 +208,17 @@ def update_memory():
     --------
     >>> update_memory()
     """
-    memory_percent = min(100, psutil.virtual_memory().percent)  # max of 100
+    memory_percent = _read_memory()
 
     if initialized:
-        dash_stats['memory']['system'].append(memory_percent)
+        with _lock:
+            dash_stats.record(group='memory', key='system', value=memory_percent)
 
     return memory_percent
 
 
-def update_network():
-    """
-    Update dashboard stats for system network usage.
-
-    This will append a new values to the ``dash_stats['network']['received']`` and ``dash_stats['network']['sent']``
-    lists.
-
-    Returns
-    -------
-    tuple
-        A tuple of the received and sent values as a difference since the last update.
-
-    Examples
-    --------
-    >>> update_network()
-    """
+def _read_network() -> tuple:
+    """Get the received and sent values as a difference since the last read."""
     global network_recv_last
     global network_sent_last
 
@@ -221,111 +236,329 @@ def update_network():
     network_recv_last = network_received_current
     network_sent_last = network_sent_current
 
+    return network_received_diff, network_sent_diff
+
+
+def update_network():
+    """
+    Update dashboard stats for system network usage.
+
+    This will record new values in the ``dash_stats['network']['received']`` and ``dash_stats['network']['sent']``
+    series.
+
+    Returns
+    -------
+    tuple
+        A tuple of the received and sent values as a difference since the last update.
+
+    Examples
+    --------
+    >>> update_network()
+    """
+    network_received_diff, network_sent_diff = _read_network()
+
     if initialized:
-        dash_stats['network']['received'].append(network_received_diff)
-        dash_stats['network']['sent'].append(network_sent_diff)
+        with _lock:
+            dash_stats.record(group='network', key='received', value=network_received_diff)
+            dash_stats.record(group='network', key='sent', value=network_sent_diff)
 
     return network_received_diff, network_sent_diff
 
 
+def _read_processes() -> list:
+    """Get a list of tuples containing the name, cpu percentage and memory percentage of each tracked process."""
+    return proc_table.sample()
+
+
+def sample_processes():
+    """
+    Sample the cpu and memory usage of this python process and its subprocesses.
+
+    The values are held until the next call of ``update_system()`` records them in the ``dash_stats`` store.
+
+    Examples
+    --------
+    >>> sample_processes()
+    """
+    global _process_stats
+    _process_stats = _read_processes()
+
+
+def sample_gpu():
+    """
+    Sample the system GPU usage.
+
+    The values are held until the next call of ``update_system()`` records them in the ``dash_stats`` store.
+
+    Examples
+    --------
+    >>> sample_gpu()
+    """
+    global _gpu_loads
+    _gpu_loads = _read_gpu()  # todo... AMD GPUs on non Linux... integrated GPUs... GPU stats for processes
+
+
+def update_system():
+    """
+    Append a new row of dashboard stats.
+
+    The system cpu, memory, and network usage are sampled, then a new row is appended to the ``dash_stats`` store with
+    those values and the latest values from ``sample_processes()`` and ``sample_gpu()``. Those may be sampled less
+    often than this function is called, in which case their last values are repeated.
+
+    The values are also added to the long-term ``metrics_history``.
+
+    All values are collected before the store is locked, so readers are only blocked while the new row is written and
+    never see a partially written row.
+
+    Examples
+    --------
+    >>> update_system()
+    """
+    global initialized
+
+    cpu_percent = _read_cpu()  # todo, need to investigate why this is sometimes lower than the individual process
+    memory_percent = _read_memory()
+    network_received_diff, network_sent_diff = _read_network()  # todo... network stats for processes
+
+    if not initialized:
+        initialized = True  # the first run only initializes the psutil counters
+        return
+
+    values = {}  # (group, key) -> value, in the order the series are shown in the charts
+    for proc_name, proc_cpu_percent, proc_memory_percent in _process_stats:
+        values[('cpu', proc_name)] = proc_cpu_percent
+        values[('memory', proc_name)] = proc_memory_percent
+    values[('cpu', 'system')] = cpu_percent
+    for name, gpu_load in _gpu_loads:
+        values[('gpu', name)] = gpu_load
+    values[('memory', 'system')] = memory_percent
+    values[('network', 'received')] = network_received_diff
+    values[('network', 'sent')] = network_sent_diff
+
+    timestamp = helpers.timestamp()
+
+    with _lock:
+        dash_stats.advance(timestamp=timestamp)
+        for (group, key), value in values.items():
+            dash_stats.record(group=group, key=key, value=value)
+
+        metrics_history.add(timestamp=timestamp, values=values)
+
+
 def update():
     """
     Update all dashboard stats.
 
-    This function updates the cpu and memory usage of this python process as well as subprocesses. Following that the
-    system functions are called to update system cpu, gpu, memory, and network usage. Finally, the keys in the
-    ``dash_stats`` dictionary are cleaned up to only hold 120 values. This function is called once per second,
-    therefore there are 2 minutes worth of values in the dictionary.
+    This function samples the cpu and memory usage of this python process as well as subprocesses, and the system gpu
+    usage. Following that ``update_system()`` is called to sample system cpu, memory, and network usage and append a
+    new row to the ``dash_stats`` store.
+
+    The store holds the newest 121 rows and overwrites the oldest row once full, i.e. it is bounded by the number of
+    samples rather than by age. The system stats are sampled once per second, therefore there are 2 minutes worth of
+    values in the store. If sampling is slower, the charts cover a longer period of time.
+
+    See Also
+    --------
+    start_sampler : Sample each type of stat at its own interval on a background thread.
 
     Examples
     --------
     >>> update()
     """
-    global initialized
+    sample_processes()
+    sample_gpu()
+    update_system()
 
-    current_timestamp = helpers.timestamp()
 
-    if initialized:
-        dash_stats['time']['timestamp'].append(helpers.timestamp())
-
-        dash_stats['time']['relative_time'] = []
-        for x in dash_stats['time']['timestamp']:
-            seconds_ago = current_timestamp - x
-            dash_stats['time']['relative_time'].append(seconds_ago)
-
-        child_processes = proc.children(recursive=False)  # list all children processes
-
-        for child in child_processes:
-            if child not in processes:
-                processes.append(child)
-
-    # find the indexes to remove from the lists
-    time_index = 0
-    last_tstamp = None
-    for tstamp in dash_stats['time']['relative_time']:
-        if tstamp <= history_length:
-            if last_tstamp is not None:
-                # ensures upper X axis label does not fall
-                if tstamp < history_length < last_tstamp and time_index > 0:
-                    time_index += -1
-            break
-        else:
-            last_tstamp = tstamp
-            time_index += 1
-
-    # remove oldest list entries
-    for stat_type, data in dash_stats.items():
-        for key in data:
-            data[key] = data[key][time_index:]  # keep the first 2 minutes
-
-    for p in processes:
-        # set the name
-        proc_name = definitions.Names.name if p.pid == proc_id else p.name()
-
-        # cpu stats per process
-        proc_cpu_percent = None
-        try:
-            proc_cpu_percent = min(float(100), p.cpu_percent())  # get current value, max of 100
-        except psutil.NoSuchProcess:
-            pass
-        finally:
-            if initialized:
-                try:
-                    dash_stats['cpu'][proc_name]
-                except KeyError:
-                    dash_stats['cpu'][proc_name] = []
-                finally:  # append the current value to the list
-                    dash_stats['cpu'][proc_name].append(proc_cpu_percent)
-
-        # memory stats per process
-        proc_memory_percent = None
-        try:
-            proc_memory_percent = min(float(100), p.memory_percent(memtype='rss'))  # get current value, max of 100
-        except psutil.NoSuchProcess:
-            pass
-        finally:
-            if initialized:
-                try:
-                    dash_stats['memory'][proc_name]
-                except KeyError:
-                    dash_stats['memory'][proc_name] = []
-                finally:  # append the current value to the list
-                    dash_stats['memory'][proc_name].append(proc_memory_percent)
-
-    update_cpu()  # todo, need to investigate why this is sometimes lower than the individual process
-    update_gpu()  # todo... AMD GPUs on non Linux... integrated GPUs... GPU stats for processes
-    update_memory()
-    update_network()  # todo... network stats for processes
+def load_history(directory: str = definitions.Paths.METRICS_DIR):
+    """
+    Store the dashboard stats and metrics history in memory-mapped files.
 
-    if not initialized:
-        initialized = True
+    The ``dash_stats`` store and the ``metrics_history`` are replaced by stores backed by files in the given directory.
+    If the files exist from a previous run, the stores resume with the history in the files.
+
+    Parameters
+    ----------
+    directory : str, default = definitions.Paths.METRICS_DIR
+        The directory to store the files in.
+
+    See Also
+    --------
+    save_history : Write the files to disk.
+    pyra.timeseries.MappedTimeSeriesStore : The layout of the files.
+
+    Examples
+    --------
+    >>> load_history()
+    """
+    global dash_stats
+    global metrics_history
+
+    mapped_dash_stats = timeseries.MappedTimeSeriesStore(
+        path=os.path.join(directory, 'dashboard.dat'),
+        capacity=history_length + 1,
+        series=_dash_series,
+    )
+    mapped_metrics_history = history.MetricsHistory(directory=directory)
+
+    with _lock:
+        dash_stats = mapped_dash_stats
+        metrics_history = mapped_metrics_history
+
+
+def save_history():
+    """
+    Write the dashboard stats and metrics history to disk.
+
+    This only applies after ``load_history()`` is called. The operating system writes changes to the files eventually,
+    this forces it to happen immediately, e.g. when shutting down.
+
+    Examples
+    --------
+    >>> save_history()
+    """
+    with _lock:
+        if isinstance(dash_stats, timeseries.MappedTimeSeriesStore):
+            dash_stats.flush()
+        metrics_history.save()
+
+
+def start_sampler(on_update: Optional[Callable] = None) -> sampler.Sampler:
+    """
+    Start sampling the dashboard stats on a background thread.
+
+    Each type of stat is sampled at the interval set in the ``Hardware`` section of the config. Each time the system
+    stats are sampled, a new row is appended to the ``dash_stats`` store.
+
+    Parameters
+    ----------
+    on_update : Optional[Callable]
+        Function to call after each new row is appended.
+
+    Returns
+    -------
+    pyra.sampler.Sampler
+        The running sampler, this is also available as ``hardware.hardware_sampler``.
+
+    Examples
+    --------
+    >>> start_sampler()
+    <pyra.sampler.Sampler object at 0x...>
+    """
+    global hardware_sampler
 
+    def sample_system():
+        update_system()
+        if on_update:
+            on_update()
 
-def chart_data() -> dict:
+    intervals = config.CONFIG['Hardware']
+
+    hardware_sampler = sampler.Sampler(name='Sampler')
+    # tasks due at the same time run in this order, so the first row includes the process and gpu stats
+    targets = dict(processes=sample_processes, gpu=sample_gpu, system=sample_system)
+    for key, task in _interval_tasks.items():
+        hardware_sampler.add_task(name=task, interval=intervals[key], target=targets[task])
+    hardware_sampler.start()
+
+    # apply interval changes from the settings without restarting
+    config.bus.subscribe(pattern='Hardware.*_INTERVAL', callback=_on_interval_change)
+
+    return hardware_sampler
+
+
+# the sampler task of each interval setting, in the order the tasks run
+_interval_tasks = dict(
+    PROCESS_INTERVAL='processes',
+    GPU_INTERVAL='gpu',
+    CPU_INTERVAL='system',
+)
+
+
+def _on_interval_change(changes: dict):
+    """Change the intervals of the sampler tasks, called when the ``Hardware`` settings change."""
+    for (_section, key), interval in changes.items():
+        if hardware_sampler and key in _interval_tasks:
+            hardware_sampler.set_interval(name=_interval_tasks[key], interval=interval)
+
+
+def history_data(metric: str, duration: int) -> dict:
+    """
+    Get the long-term history of a metric.
+
+    The finest resolution of ``metrics_history`` which covers the requested period of time is used, e.g. raw samples
+    for the last 2 minutes, 10 second rollups for the last hour, and 1 minute rollups for the last week.
+
+    Parameters
+    ----------
+    metric : str
+        The group and key of the metric separated by a dot, e.g. ``cpu.system`` or ``gpu.NVIDIA GeForce RTX 3080-0``.
+    duration : int
+        The number of seconds of history to return.
+
+    Returns
+    -------
+    dict
+        A dictionary with the ``metric``, the ``range`` in seconds, the ``step`` in seconds of the resolution used, the
+        timestamps in milliseconds since the epoch as ``x``, and the ``avg``, ``min``, and ``max`` values of each step.
+
+    Raises
+    ------
+    KeyError
+        If the metric has not been recorded.
+
+    Examples
+    --------
+    >>> history_data(metric='cpu.system', duration=3600)
+    {'metric': 'cpu.system', 'range': 3600, 'step': 10, 'x': [...], 'avg': [...], 'min': [...], 'max': [...]}
+    """
+    group, _sep, key = metric.partition('.')
+
+    with _lock:
+        data = metrics_history.query(group=group, key=key, duration=duration, now=helpers.timestamp())
+
+    return dict(metric=metric, range=duration, **data)
+
+
+def _chart_times(count: Optional[int] = None, absolute_time: bool = False) -> list:
+    """
+    Get the X axis values for the charts.
+
+    Parameters
+    ----------
+    count : Optional[int]
+        Only return the newest ``count`` values. All values are returned by default.
+    absolute_time : bool, default = False
+        ``True`` to return milliseconds since the epoch, otherwise the number of seconds ago.
+
+    Returns
+    -------
+    list
+        The X axis values, ordered from oldest to newest.
+    """
+    timestamps = dash_stats.times(count=count)
+
+    if absolute_time:
+        # the browser converts these to local dates, so the axis uses the viewer's timezone
+        return timeseries.to_list(values=timestamps * 1000)
+
+    # seconds ago, relative to the current time
+    return timeseries.to_list(values=helpers.timestamp() - timestamps)
+
+
+def chart_data(absolute_time: bool = False) -> dict:
     """
     Get chart data.
 
-    Get the data from the ``dash_stats`` dictionary, formatted for use with ``plotly``.
+    Get the data from the ``dash_stats`` store, formatted for use with ``plotly``.
+
+    Parameters
+    ----------
+    absolute_time : bool, default = False
+        ``True`` to use milliseconds since the epoch for the X axis, otherwise the number of seconds ago is used.
+        Absolute times do not change as time passes, which allows the charts to be extended with the data from
+        ``chart_delta()``.
 
     Returns
     -------
@@ -342,123 +575,321 @@ def chart_data() -> dict:
     >>> chart_data()
     {'graphs': [{"data": [...], "layout": ..., "config": ..., {"data": ...]}
     """
-    x = dash_stats['time']['relative_time']
+    with _lock:
+        return _chart_data(absolute_time=absolute_time)
 
-    graphs = dict(graphs=[])
 
-    accepted_chart_types = chart_types()
+def _build_chart_template(chart: str, keys: tuple, absolute_time: bool, mode: str) -> dict:
+    """
+    Build the static parts of a chart.
+
+    Parameters
+    ----------
+    chart : str
+        The chart type.
+    keys : tuple
+        The keys of the series in the chart.
+    absolute_time : bool
+        ``True`` if the X axis uses milliseconds since the epoch.
+    mode : str
+        The plotly mode of the traces.
+
+    Returns
+    -------
+    dict
+        The ``traces`` styling without the ``x`` and ``y`` values, the ``layout``, and the ``config`` of the chart.
+        ``trace_prefixes`` and ``suffix`` hold the same parts as encoded JSON fragments.
+    """
+    _ = locales.get_text()
 
     # todo
     # currently disabled: https://github.com/plotly/plotly.js/issues/6012
     # x_ticks = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 110, 120]
 
-    for chart in accepted_chart_types:
+    if chart == 'network':
+        # NOTE: Mbps = megabytes per second
+        hover_template = _('%(numeric_value)s Mbps') % {'numeric_value': '%{y:.3f}'}
+    else:
+        # NOTE: the double percent symbols is rendered as one in this case
+        hover_template = _('%(numeric_value)s %%') % {'numeric_value': '%{y:.2f}'}
+
+    # same as `chart_translations`, but using the current locale
+    usage = dict(cpu=_('cpu usage'), gpu=_('gpu usage'), memory=_('memory usage'), network=_('network usage'))
+    general = dict(received=_('received'), sent=_('sent'), system=_('system'))
+
+    traces = []
+    for key in keys:
+        name = general.get(key, key)  # try to get the name from the translation dictionary
+
+        traces.append(
+            dict(  # https://plotly.com/javascript/reference/scatter/
+                cliponaxis=False,
+                hovertemplate=hover_template,
+                line=dict(
+                    shape='spline',
+                    smoothing=0.8,  # 0.75 is nice, but sometimes drops below the axis line
+                    width=3.5,
+                ),
+                mode=mode,
+                name=name,
+                textfont=dict(
+                    family='Open Sans',
+                ),
+                type='scatter',
+            )
+        )
+
+    layout = dict(  # https://plotly.com/javascript/reference/layout/
+        autosize=True,  # makes chart responsive, works better than the responsive config option
+        font=dict(
+            color='FFF',
+            family='Open Sans',
+        ),
+        hoverlabel=dict(
+            bgcolor='252525',
+        ),
+        hovermode='x unified',  # show all Y values on hover
+        legend=dict(
+            entrywidth=0,
+            entrywidthmode='pixels',
+            orientation='h',
+        ),
+        margin=dict(
+            b=40,  # bottom
+            l=60,  # left
+            r=20,  # right
+            t=40,  # top
+        ),
+        meta=dict(
+            id=f'chart-{chart}',  # this must match the div id in the html template
+        ),
+        paper_bgcolor='#303030',
+        plot_bgcolor='#303030',
+        showlegend=True,
+        title=usage[chart],
+        uirevision=True,
+        xaxis=dict(
+            autorange=True if absolute_time else 'reversed',  # newest values on the right side
+            fixedrange=True,  # disable zoom of axis
+            layer='below traces',
+            showspikes=False,
+            tickformat='%H:%M:%S' if absolute_time else '',
+            type='date' if absolute_time else '-',
+            # todo
+            # currently disabled: https://github.com/plotly/plotly.js/issues/6012
+            # does not display how I would like
+            # would like to show "x s ago" (localizable) on the hover label, but not in the axis
+            # tickmode='array',
+            # # NOTE: this exact moment in time
+            # ticktext=[_('NOW') if value == 0 else
+            #           # NOTE: s = seconds, i.e. "5 s"... do not change "%(numeric_value)s"
+            #           _('%(numeric_value)s s') % {'numeric_value': value} for value in x_ticks],
+            # tickvals=x_ticks
+        ),
+        yaxis=dict(
+            fixedrange=True,  # disable zoom of axis
+            layer='below traces',
+            # rangemode='tozero',  # axis does not drop below 0; however the line gets cut below 0
+            title=dict(
+                standoff=10,  # separation between title and axis labels
+                text=_('Mbps') if chart == 'network' else _('%'),
+            ),
+        ),
+    )
 
-        if chart == 'network':
-            # NOTE: Mbps = megabytes per second
-            hover_template = _('%(numeric_value)s Mbps') % {'numeric_value': '%{y:.3f}'}
-        else:
-            # NOTE: the double percent symbols is rendered as one in this case
-            hover_template = _('%(numeric_value)s %%') % {'numeric_value': '%{y:.2f}'}
-
-        data = []
-        for key, value in dash_stats[chart].items():
-            y = value
-
-            try:  # try to get the name from the translation dictionary
-                name = chart_translations['general'][key]
-            except KeyError:
-                name = key
-
-            data.append(
-                dict(  # https://plotly.com/javascript/reference/scatter/
-                    cliponaxis=False,
-                    hovertemplate=hover_template,
-                    line=dict(
-                        shape='spline',
-                        smoothing=0.8,  # 0.75 is nice, but sometimes drops below the axis line
-                        width=3.5,
-                    ),
-                    mode='lines+markers' if len(x) < 30 else 'lines',
-                    name=name,
-                    textfont=dict(
-                        family='Open Sans',
-                    ),
-                    type='scatter',
-                    x=x,
-                    y=y,
-                )
+    config = dict(
+        displayModeBar=False,  # disable the modebar
+        editable=False,  # explicitly disable editing
+        responsive=False,  # keep False, does not work properly when True with ajax calls
+        scrollZoom=False  # explicitly disable mouse scroll zoom
+    )
+
+    return dict(
+        traces=traces,
+        layout=layout,
+        config=config,
+        # each trace is encoded without its closing brace, so the values can be appended
+        trace_prefixes=[_json_dumps(trace)[:-1] + ',"x":' for trace in traces],
+        suffix=f'],"layout":{_json_dumps(layout)},"config":{_json_dumps(config)}}}',
+    )
+
+
+def _json_dumps(data) -> str:
+    """Encode data as compact JSON."""
+    return json.dumps(data, separators=(',', ':'))
+
+
+def _chart_template(chart: str, keys: tuple, absolute_time: bool, mode: str) -> dict:
+    """
+    Get the cached static parts of a chart, building them if required.
+
+    Templates are cached per locale, and per set of series in the chart, so a new gpu or process builds a new template.
+    The cache is cleared when the locale changes.
+    """
+    global _chart_templates_locale
+
+    locale = locales.get_locale()
+    if locale != _chart_templates_locale or len(_chart_templates) >= _chart_templates_max:
+        _chart_templates.clear()
+        _chart_templates_locale = locale
+
+    cache_key = (chart, keys, absolute_time, mode)
+    try:
+        return _chart_templates[cache_key]
+    except KeyError:
+        template = _build_chart_template(chart=chart, keys=keys, absolute_time=absolute_time, mode=mode)
+        _chart_templates[cache_key] = template
+        return template
+
+
+def _chart_parts(absolute_time: bool) -> Iterator[Tuple[dict, list, list]]:
+    """Get the template, X values, and Y values of each chart, the caller must hold ``_lock``."""
+    x = _chart_times(absolute_time=absolute_time)
+
+    # traces extended by the client would keep their markers, so only use them for relative times
+    mode = 'lines+markers' if len(x) < 30 and not absolute_time else 'lines'
+
+    for chart in chart_types():
+        keys = tuple(dash_stats[chart])
+        if not keys:
+            continue
+
+        template = _chart_template(chart=chart, keys=keys, absolute_time=absolute_time, mode=mode)
+        y = [timeseries.to_list(values=series.values()) for _key, series in dash_stats[chart].items()]
+
+        yield template, x, y
+
+
+def _chart_data(absolute_time: bool) -> dict:
+    """Get chart data, the caller must hold ``_lock``."""
+    graphs = dict(graphs=[])
+
+    for template, x, y in _chart_parts(absolute_time=absolute_time):
+        graphs['graphs'].append(
+            dict(
+                data=[dict(trace, x=x, y=trace_y) for trace, trace_y in zip(template['traces'], y)],  # this is a list
+                layout=template['layout'],
+                config=template['config'],
             )
+        )
+
+    return graphs
+
+
+def chart_data_json(absolute_time: bool = False) -> str:
+    """
+    Get chart data encoded as JSON.
+
+    This returns the same data as ``chart_data()``. The static parts of each chart are cached as encoded JSON, so only
+    the X and Y values are encoded, and the X values are only encoded once for all traces.
+
+    Parameters
+    ----------
+    absolute_time : bool, default = False
+        ``True`` to use milliseconds since the epoch for the X axis, otherwise the number of seconds ago is used.
+
+    Returns
+    -------
+    str
+        The chart data, encoded as JSON.
+
+    See Also
+    --------
+    chart_data : Get the chart data as a dictionary.
+
+    Examples
+    --------
+    >>> chart_data_json()
+    '{"graphs":[{"data":[...],"layout":{...},"config":{...}},...]}'
+    """
+    parts = ['{"graphs":[']
+    x_json = None
+
+    with _lock:
+        for index, (template, x, y) in enumerate(_chart_parts(absolute_time=absolute_time)):
+            if x_json is None:
+                x_json = _json_dumps(x)
+
+            parts.append(',{"data":[' if index else '{"data":[')
+            parts.append(','.join(f'{prefix}{x_json},"y":{_json_dumps(trace_y)}}}'
+                                  for prefix, trace_y in zip(template['trace_prefixes'], y)))
+            parts.append(template['suffix'])
+
+    parts.append(']}')
+
+    return ''.join(parts)
 
-        if data:
-            graphs['graphs'].append(
+
+def chart_delta(since: int) -> dict:
+    """
+    Get the chart data appended since a sequence number.
+
+    Only the values recorded after ``since`` are returned, with milliseconds since the epoch on the X axis. The client
+    should add them to the existing charts with ``Plotly.extendTraces``. If the client is too far behind, or the series
+    have changed since ``since``, the full charts from ``chart_data(absolute_time=True)`` are returned instead and the
+    ``reset`` key is ``True``.
+
+    Parameters
+    ----------
+    since : int
+        The ``seq`` value of the last response received by the client. Use ``0`` to get the full charts.
+
+    Returns
+    -------
+    dict
+        A dictionary with the following keys.
+
+        - ``since``: The ``since`` value this data was built from.
+        - ``seq``: The sequence number to send with the next request.
+        - ``reset``: ``True`` if the charts must be replaced.
+        - ``graphs``: The full charts, only if ``reset`` is ``True``.
+        - ``max_points``: The number of points to keep in each trace.
+        - ``updates``: A list of dictionaries with ``id``, ``x`` and ``y`` keys, ready to pass to
+          ``Plotly.extendTraces``. Only if ``reset`` is ``False``.
+
+    See Also
+    --------
+    pyra.webapp.callback_dashboard : A callback called by javascript to get this data.
+
+    Examples
+    --------
+    >>> chart_delta(since=0)
+    {'since': 0, 'seq': ..., 'reset': True, 'max_points': 121, 'graphs': [...]}
+
+    >>> chart_delta(since=100)
+    {'since': 100, 'seq': ..., 'reset': False, 'max_points': 121, 'updates': [{'id': 'chart-cpu', ...}, ...]}
+    """
+    with _lock:
+        count = dash_stats.rows_since(seq=since)
+
+        delta = dict(
+            since=since,
+            seq=dash_stats.seq,
+            reset=since <= 0 or count is None or since <= dash_stats.structure_seq,
+            max_points=dash_stats.capacity,
+        )
+
+        if delta['reset']:
+            delta['graphs'] = _chart_data(absolute_time=True)['graphs']
+            return delta
+
+        x = _chart_times(count=count, absolute_time=True)
+
+        delta['updates'] = []
+        for chart in chart_types():
+            if not len(dash_stats[chart]):
+                continue
+
+            delta['updates'].append(
                 dict(
-                    data=data,  # this is a list
-                    layout=dict(  # https://plotly.com/javascript/reference/layout/
-                        autosize=True,  # makes chart responsive, works better than the responsive config option
-                        font=dict(
-                            color='FFF',
-                            family='Open Sans',
-                        ),
-                        hoverlabel=dict(
-                            bgcolor='252525',
-                        ),
-                        hovermode='x unified',  # show all Y values on hover
-                        legend=dict(
-                            entrywidth=0,
-                            entrywidthmode='pixels',
-                            orientation='h',
-                        ),
-                        margin=dict(
-                            b=40,  # bottom
-                            l=60,  # left
-                            r=20,  # right
-                            t=40,  # top
-                        ),
-                        meta=dict(
-                            id=f'chart-{chart}',  # this must match the div id in the html template
-                        ),
-                        paper_bgcolor='#303030',
-                        plot_bgcolor='#303030',
-                        showlegend=True,
-                        title=chart_translations[chart]['usage'],
-                        uirevision=True,
-                        xaxis=dict(
-                            autorange='reversed',  # smaller number, right side
-                            fixedrange=True,  # disable zoom of axis
-                            layer='below traces',
-                            showspikes=False,
-                            # todo
-                            # currently disabled: https://github.com/plotly/plotly.js/issues/6012
-                            # does not display how I would like
-                            # would like to show "x s ago" (localizable) on the hover label, but not in the axis
-                            # tickmode='array',
-                            # # NOTE: this exact moment in time
-                            # ticktext=[_('NOW') if value == 0 else
-                            #           # NOTE: s = seconds, i.e. "5 s"... do not change "%(numeric_value)s"
-                            #           _('%(numeric_value)s s') % {'numeric_value': value} for value in x_ticks],
-                            # tickvals=x_ticks
-                        ),
-                        yaxis=dict(
-                            fixedrange=True,  # disable zoom of axis
-                            layer='below traces',
-                            # rangemode='tozero',  # axis does not drop below 0; however the line gets cut below 0
-                            title=dict(
-                                standoff=10,  # separation between title and axis labels
-                                text=_('Mbps') if chart == 'network' else _('%'),
-                            ),
-                        ),
-                    ),
-                    config=dict(
-                        displayModeBar=False,  # disable the modebar
-                        editable=False,  # explicitly disable editing
-                        responsive=False,  # keep False, does not work properly when True with ajax calls
-                        scrollZoom=False  # explicitly disable mouse scroll zoom
-                    )
+                    id=f'chart-{chart}',  # this must match the div id in the html template
+                    x=[x for _key in dash_stats[chart]],
+                    y=[timeseries.to_list(values=series.values(count=count)) for _key, series in
+                       dash_stats[chart].items()],
                 )
             )
 
-    return graphs
+    return delta
 
 
 def chart_types():
@@ -490,3 +921,82 @@ def chart_types():
         chart_type_list.insert(1, 'gpu')
 
     return chart_type_list
+
+
+def _prometheus_label(value: str) -> str:
+    """Escape a label value for the Prometheus text exposition format."""
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def prometheus_metrics() -> str:
+    """
+    Get the latest dashboard stats in the Prometheus text exposition format.
+
+    The values are read from the newest row of the ``dash_stats`` store, so no new samples are taken. Series without a
+    value in the newest row, e.g. processes that exited, are omitted.
+
+    Returns
+    -------
+    str
+        The metrics, in version 0.0.4 of the text exposition format.
+
+    Examples
+    --------
+    >>> print(prometheus_metrics())
+    # HELP retroarcher_cpu_usage_percent System cpu usage.
+    # TYPE retroarcher_cpu_usage_percent gauge
+    retroarcher_cpu_usage_percent 12.5
+    ...
+    """
+    families = [
+        # name, type, help, group, label, keys of the group (None for all keys)
+        ('retroarcher_cpu_usage_percent', 'gauge', 'System cpu usage.', 'cpu', None, ['system']),
+        ('retroarcher_memory_usage_percent', 'gauge', 'System memory usage.', 'memory', None, ['system']),
+        ('retroarcher_gpu_load_percent', 'gauge', 'Load of each gpu.', 'gpu', 'gpu', None),
+        ('retroarcher_network_received_megabytes', 'gauge', 'Megabytes received since the previous sample.',
+         'network', None, ['received']),
+        ('retroarcher_network_sent_megabytes', 'gauge', 'Megabytes sent since the previous sample.',
+         'network', None, ['sent']),
+        ('retroarcher_process_cpu_percent', 'gauge', 'Cpu usage of RetroArcher and each of its subprocesses.',
+         'cpu', 'process', None),
+        ('retroarcher_process_memory_percent', 'gauge', 'Memory usage of RetroArcher and each of its subprocesses.',
+         'memory', 'process', None),
+    ]
+
+    lines = []
+    with _lock:
+        if dash_stats.length:
+            lines += [
+                '# HELP retroarcher_last_sample_timestamp_seconds Time of the newest sample.',
+                '# TYPE retroarcher_last_sample_timestamp_seconds gauge',
+                f'retroarcher_last_sample_timestamp_seconds {dash_stats.times(count=1)[0]:g}',
+            ]
+
+        for name, metric_type, description, group, label, keys in families:
+            samples = []
+            if dash_stats.length and group in dash_stats:
+                for key, series in dash_stats[group].items():
+                    if label == 'process' and key == 'system':
+                        continue  # system values have their own metric
+                    if keys is not None and key not in keys:
+                        continue
+                    value = series[-1]
+                    if value is None:
+                        continue
+                    labels = f'{{{label}="{_prometheus_label(value=key)}"}}' if label else ''
+                    samples.append(f'{name}{labels} {value:g}')
+
+            if samples:
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} {metric_type}'] + samples
+
+    # totals kept by the last sample, no new psutil calls
+    lines += [
+        '# HELP retroarcher_network_received_bytes_total Bytes received by the system.',
+        '# TYPE retroarcher_network_received_bytes_total counter',
+        f'retroarcher_network_received_bytes_total {round(network_recv_last * 1e6)}',
+        '# HELP retroarcher_network_sent_bytes_total Bytes sent by the system.',
+        '# TYPE retroarcher_network_sent_bytes_total counter',
+        f'retroarcher_network_sent_bytes_total {round(network_sent_last * 1e6)}',
+    ]
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,401 @@
+"""
+..
+   history.py
+
+Long-term, multi-resolution history of the dashboard metrics.
+
+Samples are consolidated into several archives in the style of RRDtool. Each archive covers a longer period of time at a
+coarser resolution, storing the average, minimum, and maximum of each metric over every step. Every archive has a fixed
+number of rows, so the memory used per metric is constant no matter how long RetroArcher runs.
+
+If a directory is given, the archives are stored in memory-mapped files so the history survives a restart. See
+``pyra.timeseries.MappedTimeSeriesStore`` for the layout of the files.
+"""
+# future imports
+from __future__ import annotations
+
+# standard imports
+import math
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# lib imports
+import numpy as np
+
+# local imports
+from pyra import timeseries
+
+# (step in seconds, number of rows)
+default_archives = (
+    (1, 120),  # raw samples for 2 minutes
+    (10, 360),  # 10 second rollups for an hour
+    (60, 10080),  # 1 minute rollups for a week
+)
+
+consolidation_functions = ('avg', 'min', 'max')
+
+_duration_units = dict(s=1, m=60, h=3600, d=86400, w=604800)
+
+
+def parse_duration(duration: str) -> int:
+    """
+    Parse a duration into seconds.
+
+    Parameters
+    ----------
+    duration : str
+        A number of seconds, optionally followed by a unit of ``s``, ``m``, ``h``, ``d``, or ``w``.
+
+    Returns
+    -------
+    int
+        The number of seconds.
+
+    Raises
+    ------
+    ValueError
+        If the duration cannot be parsed or is not positive.
+
+    Examples
+    --------
+    >>> parse_duration(duration='12h')
+    43200
+    >>> parse_duration(duration='90')
+    90
+    """
+    match = re.fullmatch(r'\s*(\d+)\s*([smhdw]?)\s*', duration.lower())
+    if not match or not int(match.group(1)):
+        raise ValueError(f'Invalid duration: {duration}')
+
+    return int(match.group(1)) * _duration_units[match.group(2) or 's']
+
+
+class Archive:
+    """
+    A single resolution of the metrics history.
+
+    Samples are accumulated until a step is complete, then the average, minimum, and maximum of the step are appended
+    as a new row, with the start of the step as its timestamp. Steps without any samples are not stored.
+
+    Parameters
+    ----------
+    step : int
+        Seconds per row.
+    rows : int
+        The number of rows to keep.
+    directory : Optional[str]
+        The directory to store the archive in, named ``history-<step>s-<function>.dat`` for each consolidation
+        function. The archive is kept in memory only by default.
+
+    Attributes
+    ----------
+    step : int
+        Seconds per row.
+    rows : int
+        The number of rows to keep.
+    stores : dict
+        A ``pyra.timeseries.TimeSeriesStore`` for each consolidation function.
+
+    Examples
+    --------
+    >>> Archive(step=10, rows=360)
+    <pyra.history.Archive object at 0x...>
+    """
+    def __init__(self, step: int, rows: int, directory: Optional[str] = None):
+        self.step = step
+        self.rows = rows
+
+        self.stores = {}
+        for function in consolidation_functions:
+            if directory:
+                self.stores[function] = timeseries.MappedTimeSeriesStore(
+                    path=os.path.join(directory, f'history-{step}s-{function}.dat'), capacity=rows)
+            else:
+                self.stores[function] = timeseries.TimeSeriesStore(capacity=rows)
+
+        self._bucket = None  # start of the step being accumulated
+        self._pending = {}  # (group, key) -> [sum, count, min, max]
+
+    @property
+    def duration(self) -> int:
+        """
+        Get the number of seconds covered by the archive.
+
+        Returns
+        -------
+        int
+            The number of seconds.
+
+        Examples
+        --------
+        >>> Archive(step=10, rows=360).duration
+        3600
+        """
+        return self.step * self.rows
+
+    def add(self, timestamp: float, values: Dict[Tuple[str, str], Optional[float]]):
+        """
+        Add a sample.
+
+        Parameters
+        ----------
+        timestamp : float
+            The timestamp of the sample.
+        values : Dict[Tuple[str, str], Optional[float]]
+            The value of each metric, keyed by group and key. ``None`` values are ignored.
+
+        Examples
+        --------
+        >>> Archive(step=10, rows=360).add(timestamp=1649631005, values={('cpu', 'system'): 12.5})
+        """
+        bucket = math.floor(timestamp / self.step) * self.step
+
+        if self._bucket is not None and bucket != self._bucket:
+            self.flush()
+        self._bucket = bucket
+
+        for name, value in values.items():
+            if value is None or np.isnan(value):
+                continue
+
+            try:
+                pending = self._pending[name]
+            except KeyError:
+                self._pending[name] = [value, 1, value, value]
+            else:
+                pending[0] += value
+                pending[1] += 1
+                pending[2] = min(pending[2], value)
+                pending[3] = max(pending[3], value)
+
+    def flush(self):
+        """
+        Append the step being accumulated as a new row.
+
+        Examples
+        --------
+        >>> Archive(step=10, rows=360).flush()
+        """
+        if self._bucket is None or not self._pending:
+            return
+
+        for store in self.stores.values():
+            store.advance(timestamp=self._bucket)
+
+        for (group, key), (total, count, minimum, maximum) in self._pending.items():
+            self.stores['avg'].record(group=group, key=key, value=total / count)
+            self.stores['min'].record(group=group, key=key, value=minimum)
+            self.stores['max'].record(group=group, key=key, value=maximum)
+
+        self._pending = {}
+
+    def save(self):
+        """
+        Write the stores of the archive to disk, if they are stored in files.
+
+        The step being accumulated is not saved.
+
+        Examples
+        --------
+        >>> Archive(step=10, rows=360).save()
+        """
+        for store in self.stores.values():
+            if isinstance(store, timeseries.MappedTimeSeriesStore):
+                store.flush()
+
+    def query(self, group: str, key: str, start: Optional[float] = None) -> dict:
+        """
+        Get the rows of a metric.
+
+        Parameters
+        ----------
+        group : str
+            The group of the metric.
+        key : str
+            The key of the metric.
+        start : Optional[float]
+            Only return rows with a timestamp at or after this time. All rows are returned by default.
+
+        Returns
+        -------
+        dict
+            A dictionary with the ``step`` of the archive, the timestamps in milliseconds since the epoch as ``x``, and
+            a list of values for each consolidation function. Missing values are ``None``. The lists are empty if no
+            step with a value for the metric has been completed yet.
+
+        Examples
+        --------
+        >>> archive = Archive(step=10, rows=360)
+        >>> archive.add(timestamp=1649631005, values={('cpu', 'system'): 12.5})
+        >>> archive.add(timestamp=1649631015, values={('cpu', 'system'): 20})
+        >>> archive.query(group='cpu', key='system')
+        {'step': 10, 'x': [1649631000000.0], 'avg': [12.5], 'min': [12.5], 'max': [12.5]}
+        """
+        data = dict(step=self.step, x=[])
+        for function in self.stores:
+            data[function] = []
+
+        if group not in self.stores['avg'] or key not in self.stores['avg'][group]:
+            return data
+
+        times = self.stores['avg'].times()
+        index = 0 if start is None else int(np.searchsorted(times, start))
+
+        data['x'] = (times[index:] * 1000).tolist()
+        for function, store in self.stores.items():
+            data[function] = timeseries.to_list(values=store.values(group=group, key=key)[index:])
+
+        return data
+
+
+class MetricsHistory:
+    """
+    Multi-resolution history of metrics.
+
+    Every sample is added to each archive, which consolidates it at its own resolution.
+
+    Parameters
+    ----------
+    archives : Iterable[Tuple[int, int]]
+        The step in seconds and number of rows of each archive, ordered from finest to coarsest resolution.
+    directory : Optional[str]
+        The directory to store the archives in. The history is kept in memory only by default.
+
+    Attributes
+    ----------
+    archives : list
+        The ``Archive`` objects, ordered from finest to coarsest resolution.
+
+    Methods
+    -------
+    add:
+        Add a sample to every archive.
+    query:
+        Get the history of a metric at the finest resolution that covers a period of time.
+
+    Examples
+    --------
+    >>> history = MetricsHistory()
+    >>> history.add(timestamp=1649631005, values={('cpu', 'system'): 12.5})
+    """
+    def __init__(self, archives: Iterable[Tuple[int, int]] = default_archives, directory: Optional[str] = None):
+        self.archives = [Archive(step=step, rows=rows, directory=directory) for step, rows in archives]
+
+        self._metrics = []  # (group, key) of each metric ever added, in the order they were first seen
+        for archive in self.archives:  # metrics loaded from files
+            for group, series_group in archive.stores['avg'].items():
+                for key in series_group:
+                    if (group, key) not in self._metrics:
+                        self._metrics.append((group, key))
+
+    def add(self, timestamp: float, values: Dict[Tuple[str, str], Optional[float]]):
+        """
+        Add a sample to every archive.
+
+        Parameters
+        ----------
+        timestamp : float
+            The timestamp of the sample.
+        values : Dict[Tuple[str, str], Optional[float]]
+            The value of each metric, keyed by group and key. ``None`` values are ignored.
+
+        Examples
+        --------
+        >>> MetricsHistory().add(timestamp=1649631005, values={('cpu', 'system'): 12.5})
+        """
+        for name, value in values.items():
+            if value is not None and name not in self._metrics:
+                self._metrics.append(name)
+
+        for archive in self.archives:
+            archive.add(timestamp=timestamp, values=values)
+
+    def save(self):
+        """
+        Write the archives to disk, if they are stored in files.
+
+        Examples
+        --------
+        >>> MetricsHistory().save()
+        """
+        for archive in self.archives:
+            archive.save()
+
+    def select(self, duration: float) -> Archive:
+        """
+        Get the finest archive that covers a period of time.
+
+        Parameters
+        ----------
+        duration : float
+            The number of seconds to cover.
+
+        Returns
+        -------
+        Archive
+            The archive, the coarsest archive if none of them cover the whole period.
+
+        Examples
+        --------
+        >>> MetricsHistory().select(duration=3600).step
+        10
+        """
+        for archive in self.archives:
+            if archive.duration >= duration:
+                return archive
+        return self.archives[-1]
+
+    def query(self, group: str, key: str, duration: float, now: float) -> dict:
+        """
+        Get the history of a metric at the finest resolution that covers a period of time.
+
+        Parameters
+        ----------
+        group : str
+            The group of the metric.
+        key : str
+            The key of the metric.
+        duration : float
+            The number of seconds before ``now`` to return.
+        now : float
+            The current timestamp.
+
+        Returns
+        -------
+        dict
+            See ``Archive.query()``.
+
+        Raises
+        ------
+        KeyError
+            If the metric has not been recorded.
+
+        Examples
+        --------
+        >>> history = MetricsHistory()
+        >>> history.add(timestamp=1649631005, values={('cpu', 'system'): 12.5})
+        >>> history.add(timestamp=1649631006, values={('cpu', 'system'): 20})
+        >>> history.query(group='cpu', key='system', duration=60, now=1649631006)
+        {'step': 1, 'x': [1649631005000.0], 'avg': [12.5], 'min': [12.5], 'max': [12.5]}
+        """
+        if (group, key) not in self._metrics:
+            raise KeyError((group, key))
+
+        return self.select(duration=duration).query(group=group, key=key, start=now - duration)
+
+    def metrics(self) -> List[Tuple[str, str]]:
+        """
+        Get the metrics recorded in the history.
+
+        Returns
+        -------
+        List[Tuple[str, str]]
+            The group and key of each metric.
+
+        Examples
+        --------
+        >>> MetricsHistory().metrics()
+        []
+        """
+        return list(self._metrics)
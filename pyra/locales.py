@@ -17,19 +17,24 @@ The aim of localization is to give a product or service the look and feel of hav
 target market, no matter their language, cultural preferences, or location.
 """
 # standard imports
+import contextlib
+import contextvars
 import gettext
+import json
 import os
-import subprocess
-import sys
+import threading
+from typing import Callable, Optional, Tuple
 
 # lib imports
 import babel
 from babel import localedata
+from babel.messages import mofile, pofile
 
 # local imports
 from pyra import config
 from pyra.definitions import Paths
 from pyra import logger
+from pyra import threads
 
 default_domain = 'retroarcher'
 default_locale = 'en'
@@ -38,6 +43,47 @@ supported_locales = ['en', 'es']
 
 log = logger.get_logger(__name__)
 
+_catalog_lock = threading.Lock()
+_catalogs = {}  # locale -> gettext.NullTranslations
+_compiling = set()  # locales being compiled
+_index_lock = threading.Lock()
+_locale_names = None  # locale -> display name
+
+_locale_override = contextvars.ContextVar('locale_override', default=None)
+
+
+def _index_path() -> str:
+    """Get the path of the locale index."""
+    return os.path.join(Paths.LOCALE_DIR, 'locales.json')
+
+
+def _load_index() -> dict:
+    """Read the locale index, or build and save it if it is missing or was built with another version of babel."""
+    path = _index_path()
+    try:
+        with open(path, encoding='utf-8') as f:
+            index = json.load(f)
+        if index['babel'] == babel.__version__:
+            return index['locales']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    log.debug(msg='Building the locale index.')
+    locales = {}
+    for locale_id in localedata.locale_identifiers():
+        locale = babel.Locale.parse(identifier=locale_id)
+        locales[locale_id] = locale.get_display_name()
+
+    try:
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(babel=babel.__version__, locales=locales), f, ensure_ascii=False, sort_keys=True)
+        os.replace(temp_path, path)
+    except OSError as e:
+        log.debug(msg=f'Unable to save the locale index to {path}: {e}')
+
+    return locales
+
 
 def get_all_locales() -> dict:
     """
@@ -59,6 +105,9 @@ def get_all_locales() -> dict:
           'ru': 'русский'
         }
 
+    The display names are read from ``locales.json`` in the locale directory, which is built from babel on first use
+    and rebuilt when babel is updated. The index is then kept in memory.
+
     Returns
     -------
     dict
@@ -69,23 +118,46 @@ def get_all_locales() -> dict:
     >>> get_all_locales()
     {... 'en': 'English', ... 'en_GB': 'English (United Kingdom)', ... 'es': 'español', ... 'fr': 'français', ...}
     """
-    log.debug(msg='Getting locale dictionary.')
-    locale_ids = localedata.locale_identifiers()
+    global _locale_names
+    if _locale_names is None:
+        with _index_lock:
+            if _locale_names is None:
+                _locale_names = _load_index()
 
-    locales = {}
+    return dict(_locale_names)
 
-    for locale_id in locale_ids:
-        locale = babel.Locale.parse(identifier=locale_id)
-        locales[locale_id] = locale.get_display_name()
 
-    return locales
+def get_installed_locales() -> dict:
+    """
+    Get a dictionary of the locales which have a catalog.
+
+    Returns
+    -------
+    dict
+        Dictionary of the installed locales, in the same form as ``get_all_locales()``.
+
+    Examples
+    --------
+    >>> get_installed_locales()
+    {'de': 'Deutsch', 'en': 'English', ... 'es': 'español', ... 'ru': 'русский', 'sv': 'svenska'}
+    """
+    all_locales = get_all_locales()
+
+    try:
+        locale_ids = sorted(os.listdir(Paths.LOCALE_DIR))
+    except OSError:
+        locale_ids = []
+
+    return {locale_id: all_locales[locale_id] for locale_id in locale_ids
+            if locale_id in all_locales and os.path.isfile(_catalog_paths(locale=locale_id)[1])}
 
 
 def get_locale() -> str:
     """
     Verify the locale.
 
-    Verify the locale from the config against supported locales and returns appropriate locale.
+    Verify the locale from the config against supported locales and returns appropriate locale. A locale set with
+    ``use_locale()`` takes precedence over the config.
 
     Returns
     -------
@@ -97,6 +169,10 @@ def get_locale() -> str:
     >>> get_locale()
     'en'
     """
+    override = _locale_override.get()
+    if override:
+        return override
+
     try:
         config_locale = config.CONFIG['General']['LOCALE']
     except TypeError:
@@ -108,46 +184,255 @@ def get_locale() -> str:
         return default_locale
 
 
-def get_text() -> gettext.gettext:
+@contextlib.contextmanager
+def use_locale(locale: str):
+    """
+    Translate to a locale other than the one in the config.
+
+    The locale only applies to the current thread or context, e.g. a single request.
+
+    Parameters
+    ----------
+    locale : str
+        The locale.
+
+    Examples
+    --------
+    >>> with use_locale(locale='es'):
+    ...     translate('Home')
+    'Inicio'
+    """
+    token = _locale_override.set(locale)
+    try:
+        yield
+    finally:
+        _locale_override.reset(token)
+
+
+def _catalog_paths(locale: str) -> Tuple[str, str]:
+    """Get the paths of the compiled and source catalogs of a locale."""
+    directory = os.path.join(Paths.LOCALE_DIR, locale, 'LC_MESSAGES')
+    return os.path.join(directory, f'{default_domain}.mo'), os.path.join(directory, f'{default_domain}.po')
+
+
+def compile_catalog(locale: str) -> bool:
     """
-    Install the language defined in the conifg.
+    Compile the catalog of a locale.
 
-    This function installs the language defined in the config and allows translations in python code.
+    The catalog is compiled in-process with babel, then loaded so translations use it immediately.
+
+    Parameters
+    ----------
+    locale : str
+        The locale.
+
+    Returns
+    -------
+    bool
+        ``True`` if the catalog was compiled, ``False`` if it has no source catalog or could not be compiled.
+
+    Examples
+    --------
+    >>> compile_catalog(locale='es')
+    True
+    """
+    mo_path, po_path = _catalog_paths(locale=locale)
+
+    try:
+        with open(po_path, 'rb') as f:
+            catalog = pofile.read_po(fileobj=f, locale=locale, domain=default_domain)
+
+        temp_path = f'{mo_path}.tmp'
+        with open(temp_path, 'wb') as f:
+            mofile.write_mo(fileobj=f, catalog=catalog)
+        os.replace(temp_path, mo_path)
+    except Exception as e:
+        log.warning(msg=f'Unable to compile the {locale} locale: {e}')
+        return False
+    finally:
+        with _catalog_lock:
+            _compiling.discard(locale)
+
+    log.info(msg=f'Compiled the {locale} locale.')
+    with _catalog_lock:
+        _catalogs.pop(locale, None)  # load the compiled catalog on next use
+    return True
+
+
+def get_translations(locale: Optional[str] = None) -> gettext.NullTranslations:
+    """
+    Get the translations of a locale.
+
+    Each catalog is loaded once and kept in memory. A catalog that is missing, or older than its source, is compiled
+    on a background thread; until then the loaded catalog, or no translation, is used.
+
+    Parameters
+    ----------
+    locale : Optional[str]
+        The locale, ``get_locale()`` by default.
 
     Returns
     -------
-    gettext.gettext
-        The `gettext.gettext` method.
+    gettext.NullTranslations
+        The translations, ``gettext.NullTranslations`` if the locale has no catalog.
 
     Examples
     --------
-    >>> get_text()
-    <bound method GNUTranslations.gettext of <gettext.GNUTranslations object at 0x...>>
-    """
-    translation_fallback = False
-    if not os.path.isfile(os.path.join(Paths.LOCALE_DIR, get_locale(), 'LC_MESSAGES', f'{default_domain}.mo')):
-        log.warning(msg='No locale mo translation file found.')
-
-        locale_script = os.path.join(Paths.ROOT_DIR, 'scripts', '_locale.py')
-
-        if os.path.isfile(locale_script):
-            log.info(msg='Running locale compile script.')
-            # run python script in a subprocess
-            subprocess.run(
-                args=[sys.executable, locale_script, '--compile'],
-                cwd=Paths.ROOT_DIR,
-            )
+    >>> get_translations(locale='es')
+    <gettext.GNUTranslations object at 0x...>
+    """
+    locale = locale or get_locale()
+
+    try:
+        return _catalogs[locale]
+    except KeyError:
+        pass
+
+    with _catalog_lock:
+        if locale in _catalogs:
+            return _catalogs[locale]
+
+        mo_path, po_path = _catalog_paths(locale=locale)
+        try:
+            with open(mo_path, 'rb') as f:
+                translations = gettext.GNUTranslations(fp=f)
+        except OSError:
+            translations = gettext.NullTranslations()
+            mo_mtime = None
         else:
-            log.warning(msg='Locale compile script not found. Defaulting to English.')
-            translation_fallback = True
+            mo_mtime = os.path.getmtime(mo_path)
+
+        try:
+            stale = mo_mtime is None or os.path.getmtime(po_path) > mo_mtime
+        except OSError:
+            stale = False  # no source catalog
+
+        if stale and locale not in _compiling:
+            log.info(msg=f'Compiling the {locale} locale in the background.')
+            _compiling.add(locale)
+            threads.run_in_thread(target=compile_catalog, name=f'CompileLocale-{locale}', daemon=True,
+                                  kwargs=dict(locale=locale)).start()
+
+        _catalogs[locale] = translations
+
+    return translations
+
+
+def translate(message: str) -> str:
+    """
+    Translate a message to the current locale.
+
+    Parameters
+    ----------
+    message : str
+        The message.
+
+    Returns
+    -------
+    str
+        The translated message, the message itself if it is not translated.
+
+    Examples
+    --------
+    >>> translate('Home')
+    'Home'
+    """
+    return get_translations().gettext(message)
+
+
+class LazyString:
+    """
+    A message translated to the current locale each time it is used.
+
+    Use this for messages defined at import time, such as the names of the settings, so they follow the locale after
+    it is changed.
+
+    Parameters
+    ----------
+    message : str
+        The message.
+
+    Examples
+    --------
+    >>> name = LazyString(message='Home')
+    >>> with use_locale(locale='es'):
+    ...     str(name)
+    'Inicio'
+    """
+    __slots__ = ('message',)
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def __str__(self) -> str:
+        return translate(self.message)
 
-    language = gettext.translation(
-        domain=default_domain,
-        localedir=Paths.LOCALE_DIR,
-        languages=[get_locale()],
-        fallback=translation_fallback,
-    )
+    def __repr__(self) -> str:
+        return f'LazyString({self.message!r})'
 
-    language.install()
+    def __len__(self) -> int:
+        return len(str(self))
 
-    return language.gettext
+    def __contains__(self, item: str) -> bool:
+        return item in str(self)
+
+    def __add__(self, other: str) -> str:
+        return str(self) + other
+
+    def __radd__(self, other: str) -> str:
+        return other + str(self)
+
+    def __mod__(self, other) -> str:
+        return str(self) % other
+
+    def __format__(self, format_spec: str) -> str:
+        return format(str(self), format_spec)
+
+    def __eq__(self, other) -> bool:
+        return str(self) == other
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+
+def lazy_gettext(message: str) -> LazyString:
+    """
+    Get a message which is translated each time it is used.
+
+    Parameters
+    ----------
+    message : str
+        The message.
+
+    Returns
+    -------
+    LazyString
+        The lazily translated message.
+
+    Examples
+    --------
+    >>> lazy_gettext('Home')
+    LazyString('Home')
+    """
+    return LazyString(message=message)
+
+
+def get_text() -> Callable[[str], str]:
+    """
+    Get the translation function.
+
+    The returned function translates to the locale current at the time it is called, so a change of the locale takes
+    effect without importing the module again. Nothing is installed into ``builtins``.
+
+    Returns
+    -------
+    Callable[[str], str]
+        The ``translate`` function.
+
+    Examples
+    --------
+    >>> _ = get_text()
+    >>> _('Home')
+    'Home'
+    """
+    return translate
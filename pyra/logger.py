@@ -10,16 +10,22 @@ from __future__ import annotations
 # standard imports
 import contextlib
 import errno
+import functools
+import gzip
+import ipaddress
 import logging
 import multiprocessing
 import os
-import pkgutil
 import re
+import shutil
 import sys
 import threading
+import time
 import traceback
 from logging import handlers
 from logging.handlers import QueueHandler, QueueListener
+from queue import Full, Queue
+from typing import Iterable, List, Optional
 
 # lib imports
 from configobj import ConfigObj
@@ -27,12 +33,14 @@ from configobj import ConfigObj
 # local imports
 import pyra
 from pyra import definitions
-from pyra import helpers
+from pyra import logview
 
 # These settings are for file logging only
 py_name = 'pyra'
 MAX_SIZE = 5000000  # 5 MB
-MAX_FILES = 5
+ROTATE_INTERVAL = 86400  # rotate the logs daily
+RETENTION_SIZE = 50000000  # total size of all log files, 50 MB
+QUEUE_SIZE = 10000  # records waiting to be written, more are dropped
 
 # used for log filters
 _BLACKLIST_KEYS = ['_APITOKEN', '_TOKEN', '_KEY', '_SECRET', '_PASSWORD', '_APIKEY', '_ID', '_HOOK']
@@ -45,6 +53,14 @@ _BLACKLIST_WORDS = set()
 # Global queue for multiprocessing logging
 queue = None
 
+# the log file of each logger, by the longest matching logger name, e.g. add ``'pyra.webapp': 'webapp'`` to log the
+# webapp to ``webapp.log``
+routes = {py_name: py_name, 'werkzeug': 'werkzeug'}
+
+_setup_lock = threading.RLock()
+_setup_key = None  # the settings the handlers were created with
+_async_handlers = {}  # log file -> AsyncHandler
+
 
 def blacklist_config(config: ConfigObj):
     """
@@ -80,7 +96,10 @@ def blacklist_config(config: ConfigObj):
                                                             any(bk in key.upper() for bk in _BLACKLIST_KEYS)):
                 blacklist.add(value.strip())
 
+    global _redactor
+
     _BLACKLIST_WORDS.update(blacklist)
+    _redactor = Redactor(words=_BLACKLIST_WORDS)
 
 
 class NoThreadFilter(logging.Filter):
@@ -137,83 +156,109 @@ class NoThreadFilter(logging.Filter):
         return not record.threadName == self.threadName
 
 
-# Taken from Hellowlol/HTPC-Manager
-class BlacklistFilter(logging.Filter):
+@functools.lru_cache(maxsize=1024)
+def _is_public_ip(address: str) -> bool:
+    """Check if an ipv4 address is public, without resolving it. Invalid addresses are not public."""
+    try:
+        return not ipaddress.IPv4Address(address).is_private
+    except ValueError:
+        return False
+
+
+class Redactor:
     """
-    Filter logs for blacklisted words.
+    Redact sensitive values from log messages.
 
-    Log filter for blacklisted tokens and passwords.
+    Blacklisted words, public ip addresses, email addresses, and Plex tokens are matched by a single compiled regex, so
+    a message is scanned once no matter how many words are blacklisted.
+
+    Parameters
+    ----------
+    words : Iterable[str]
+        The blacklisted words, e.g. passwords and api keys from the config.
 
     Methods
     -------
-    filter:
-        Filter the given record.
+    redact:
+        Redact a message.
 
     Examples
     --------
-    >>> BlacklistFilter()
-    <pyra.logger.BlacklistFilter object at 0x...>
+    >>> Redactor(words=['secret_password'])
+    <pyra.logger.Redactor object at 0x...>
     """
-
-    def __init__(self):
-        super(BlacklistFilter, self).__init__()
-
-    def filter(self, record) -> bool:
+    # Currently only checking for ipv4 addresses, also in the dashed form used by plex.direct host names
+    ip_pattern = r'[0-9]+(?:[.-][0-9]+){3}(?!\d*-[a-z0-9]{6})'
+    # the lookbehind only tries matches at the start of a word, rather than at every character of it
+    email_pattern = (r'(?i:(?<![a-z0-9!#$%&\'*+/=?^_`{|}~-])'
+                     r'[a-z0-9!#$%&\'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&\'*+/=?^_`{|}~-]+)*@'
+                     r'(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z0-9](?:[a-z0-9-]*[a-z0-9])?)')
+    token_pattern = r'(?:(?<=X-Plex-Token=)|(?<=X-Plex-Token%3D))[a-zA-Z0-9]+'
+
+    def __init__(self, words: Iterable[str] = ()):
+        patterns = []
+
+        # longest first, so a word containing another word is redacted completely
+        words = sorted({word for word in words if word}, key=len, reverse=True)
+        if words:
+            patterns.append(f"(?P<word>{'|'.join(re.escape(word) for word in words)})")
+
+        patterns += [
+            f'(?P<token>{self.token_pattern})',
+            f'(?P<email>{self.email_pattern})',
+            f'(?P<ip>{self.ip_pattern})',
+        ]
+
+        self.regex = re.compile(pattern='|'.join(patterns))
+
+    @staticmethod
+    def _replace(match: re.Match) -> str:
+        """Get the replacement of a match."""
+        text = match.group()
+        kind = match.lastgroup
+
+        if kind == 'ip':
+            if not _is_public_ip(address=text.replace('-', '.')):
+                return text
+            partition = '-' if '-' in text else '.'
+            return partition.join(['***'] * 4)
+        if kind == 'email':
+            return 16 * '*' + '@' + 8 * '*'
+        return 16 * '*'  # word or token
+
+    def redact(self, text: str) -> str:
         """
-        Filter the given record.
-
-        .. todo:: This documentation needs to be improved.
+        Redact a message.
 
         Parameters
         ----------
-        record : BlacklistFilter
-            The record to filter.
+        text : str
+            The message.
 
         Returns
         -------
-        bool
-            True in all cases.
+        str
+            The message with sensitive values replaced with asterisks.
 
         Examples
         --------
-        >>> BlacklistFilter().filter(record=BlacklistFilter())
-        True
+        >>> Redactor().redact(text='Testing 172.1.7.5 and example@example.com')
+        'Testing ***.***.***.*** and ****************@********'
+        >>> Redactor().redact(text='x-plex-token=5FBCvHo9vFf9erz8ssLQ&X-Plex-Token=5FBCvHo9vFf9erz8ssLQ')
+        'x-plex-token=5FBCvHo9vFf9erz8ssLQ&X-Plex-Token=****************'
         """
-        if not LOG_BLACKLIST:
-            return True
+        return self.regex.sub(self._replace, text)
 
-        for item in _BLACKLIST_WORDS:
-            try:
-                if item in record.msg:
-                    record.msg = record.msg.replace(item, 16 * '*')
-
-                args = []
-                for arg in record.args:
-                    try:
-                        arg_str = str(arg)
-                        if item in arg_str:
-                            arg_str = arg_str.replace(item, 16 * '*')
-                            arg = arg_str
-                    except Exception:
-                        pass
-                    args.append(arg)
-                record.args = tuple(args)
-            except Exception:
-                pass
 
-        return True
+_redactor = Redactor()
 
 
-class RegexFilter(logging.Filter):
+class RedactionFilter(logging.Filter):
     """
-    Base class for regex log filter.
+    Log filter for sensitive values.
 
-    Log filter for regex.
-
-    Attributes
-    ----------
-    regex : re.compile
-        The compiled regex pattern.
+    The arguments are merged into the message, then the message is redacted with a ``Redactor`` of the blacklisted
+    words. Records are only redacted once, even if they are handled by several handlers.
 
     Methods
     -------
@@ -222,24 +267,17 @@ class RegexFilter(logging.Filter):
 
     Examples
     --------
-    >>> RegexFilter()
-    <pyra.logger.RegexFilter object at 0x...>
+    >>> RedactionFilter()
+    <pyra.logger.RedactionFilter object at 0x...>
     """
 
-    def __init__(self):
-        super(RegexFilter, self).__init__()
-
-        self.regex = re.compile(pattern=r'')
-
-    def filter(self, record) -> bool:
+    def filter(self, record: logging.LogRecord) -> bool:
         """
         Filter the given record.
 
-        .. todo:: This documentation needs to be improved.
-
         Parameters
         ----------
-        record : RegexFilter
+        record : logging.LogRecord
             The record to filter.
 
         Returns
@@ -249,284 +287,589 @@ class RegexFilter(logging.Filter):
 
         Examples
         --------
-        >>> RegexFilter().filter(record=RegexFilter())
+        >>> RedactionFilter().filter(record=logging.makeLogRecord(dict(msg='Testing 172.1.7.5')))
         True
         """
-        if not LOG_BLACKLIST:
+        if not LOG_BLACKLIST or getattr(record, 'redacted', False):
             return True
 
         try:
-            matches = self.regex.findall(record.msg)
-            for match in matches:
-                record.msg = self.replace(record.msg, match)
-
-            args = []
-            for arg in record.args:
-                try:
-                    arg_str = str(arg)
-                    matches = self.regex.findall(arg_str)
-                    if matches:
-                        for match in matches:
-                            arg_str = self.replace(arg_str, match)
-                        arg = arg_str
-                except Exception:
-                    pass
-                args.append(arg)
-            record.args = tuple(args)
+            record.msg = _redactor.redact(text=record.getMessage())
+            record.args = None
         except Exception:
             pass
+        record.redacted = True
 
         return True
 
-    def replace(self, text, match):
-        return text
 
-
-class PublicIPFilter(RegexFilter):
+@contextlib.contextmanager
+def listener(logger: logging.Logger):
     """
-    Log filter for public IP addresses.
+    Create a QueueListener.
 
-    Class responsible for filtering public IP addresses.
+    Wrapper that create a QueueListener, starts it and automatically stops it.
+    To be used in a with statement in the main process, for multiprocessing.
 
-    Attributes
+    Parameters
     ----------
-    regex : re.compile
-        The compiled regex pattern.
+    logger : logging.Logger
+        The logger object.
 
-    Methods
-    -------
-    replace:
-        Filter that replaces a string within another string.
+    Examples
+    --------
+    >>> logger = get_logger(name='retroarcher')
+    >>> listener(logger=logger)
+    """
+
+    global queue
+
+    # Initialize queue if not already done
+    if queue is None:
+        try:
+            queue = multiprocessing.Queue()
+        except OSError as e:
+            queue = False
+
+            # Some machines don't have access to /dev/shm. See
+            # http://stackoverflow.com/questions/2009278 for more information.
+            if e.errno == errno.EACCES:
+                logger.warning('Multiprocess logging disabled, because current user cannot map shared memory. You '
+                               'won\'t see any logging generated by the worker processed.')
+
+    # Multiprocess logging may be disabled.
+    if not queue:
+        yield
+    else:
+        queue_listener = QueueListener(queue, *logger.handlers)
+
+        try:
+            queue_listener.start()
+            yield
+        finally:
+            queue_listener.stop()
+
+
+def init_multiprocessing(logger: logging.Logger):
+    """
+    Remove all handlers and add QueueHandler on top.
+
+    This should only be called inside a multiprocessing worker process, since it changes the logger completely.
+
+    Parameters
+    ----------
+    logger : logging.Logger
+        The logger to initialize for multiprocessing.
 
     Examples
     --------
-    >>> PublicIPFilter()
-    <pyra.logger.PublicIPFilter object at 0x...>
+    >>> logger = get_logger(name='retroarcher')
+    >>> init_multiprocessing(logger=logger)
     """
 
-    def __init__(self):
-        super(PublicIPFilter, self).__init__()
+    # Multiprocess logging may be disabled.
+    if not queue:
+        return
+
+    # Remove all handlers and add the Queue handler as the only one.
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
 
-        # Currently only checking for ipv4 addresses
-        self.regex = re.compile(pattern=r'[0-9]+(?:[.-][0-9]+){3}(?!\d*-[a-z0-9]{6})')
+    queue_handler = QueueHandler(queue)
+    queue_handler.setLevel(logging.DEBUG)
 
-    def replace(self, text: str, ip: str) -> str:
+    logger.addHandler(queue_handler)
+
+    # Change current thread name for log record
+    threading.current_thread().name = multiprocessing.current_process().name
+
+
+# records of all loggers are written by a single background thread
+_log_queue = Queue(maxsize=QUEUE_SIZE)
+_dropped_records = 0
+_dropped_lock = threading.Lock()
+
+
+class AsyncHandler(QueueHandler):
+    """
+    Hand records to the background log listener.
+
+    The calling thread only merges the arguments into the message and enqueues the record. Filtering, formatting and
+    writing happen on the listener thread, so logging never waits for the disk. If the queue is full the record is
+    dropped and counted, see ``queue_stats()``. If the listener is not running, records are written directly.
+
+    Parameters
+    ----------
+    targets : List[logging.Handler]
+        The handlers which write the records.
+
+    Attributes
+    ----------
+    targets : List[logging.Handler]
+        The handlers which write the records.
+
+    Examples
+    --------
+    >>> AsyncHandler(targets=[logging.StreamHandler()])
+    <AsyncHandler (NOTSET)>
+    """
+    def __init__(self, targets: List[logging.Handler]):
+        super().__init__(_log_queue)
+
+        self.targets = targets
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
         """
-        Filter a public address.
+        Prepare a record to be enqueued.
 
-        Filter the given ip address out of the given text. The ip address will only be filter if it is public.
+        The arguments are merged into the message now, since they may be changed by the caller before the record is
+        written.
 
         Parameters
         ----------
-        text : str
-            The text to replace the ip address within.
-        ip : str
-            The ip address to replace with asterisks.
+        record : logging.LogRecord
+            The record.
 
         Returns
         -------
-        str
-            The original text with the ip address replaced.
+        logging.LogRecord
+            The same record.
+
+        Examples
+        --------
+        >>> AsyncHandler(targets=[]).prepare(record=logging.makeLogRecord(dict(msg='%s', args=('test',))))
+        <LogRecord: None, 10, , 0, "test">
+        """
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        """
+        Enqueue a record, or drop it if the queue is full.
+
+        Parameters
+        ----------
+        record : logging.LogRecord
+            The record.
 
         Examples
         --------
-        >>> PublicIPFilter().replace(text='Testing 172.1.7.5', ip='172.1.7.5')
-        'Testing ***.***.***.***'
+        >>> AsyncHandler(targets=[]).enqueue(record=logging.makeLogRecord(dict(msg='test')))
+        """
+        global _dropped_records
+
+        if not _listener.running:
+            _write(targets=self.targets, record=record)
+            return
+
+        try:
+            self.queue.put_nowait((self.targets, record))
+        except Full:
+            with _dropped_lock:
+                _dropped_records += 1
+
+    def close(self):
         """
-        if helpers.is_public_ip(ip.replace('-', '.')):
-            partition = '-' if '-' in ip else '.'
-            return text.replace(ip, partition.join(['***'] * 4))
-        return text
+        Close the handler and its targets.
 
+        Records still in the queue are written first.
 
-class EmailFilter(RegexFilter):
+        Examples
+        --------
+        >>> AsyncHandler(targets=[]).close()
+        """
+        flush()
+        for target in self.targets:
+            target.close()
+        super().close()
+
+
+def _write(targets: List[logging.Handler], record: logging.LogRecord):
+    """Write a record with each target handler which accepts its level."""
+    for target in targets:
+        if record.levelno >= target.level:
+            target.handle(record)
+
+
+class LogListener(QueueListener):
     """
-    Log filter for email addresses.
+    Write the records of every ``AsyncHandler`` on a single background thread.
 
-    Class responsible for filtering email addresses.
+    Each queued item holds the record and the handlers of the logger which created it.
 
     Attributes
     ----------
-    regex : re.compile
-        The compiled regex pattern.
+    running : bool
+        ``True`` while the listener thread is running.
 
     Methods
     -------
-    replace:
-        Filter that replaces a string within another string.
+    start:
+        Start the listener thread.
+    stop:
+        Write the queued records, then stop the listener thread.
 
     Examples
     --------
-    >>> EmailFilter()
-    <pyra.logger.EmailFilter object at 0x...>
+    >>> LogListener(queue=Queue())
+    <pyra.logger.LogListener object at 0x...>
     """
+    def __init__(self, queue: Queue):
+        super().__init__(queue)
 
-    def __init__(self):
-        super(EmailFilter, self).__init__()
+        self.running = False
+
+    def start(self):
+        """
+        Start the listener thread.
+
+        Examples
+        --------
+        >>> LogListener(queue=Queue()).start()
+        """
+        super().start()
+        self._thread.name = 'LogListener'
+        self.running = True
 
-        self.regex = re.compile(pattern=r'([a-z0-9!#$%&\'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&\'*+/=?^_`{|}~-]+)*@'
-                                r'(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z0-9](?:[a-z0-9-]*[a-z0-9])?)',
-                                flags=re.IGNORECASE)
+    def stop(self):
+        """
+        Write the queued records, then stop the listener thread.
 
-    def replace(self, text: str, email: str) -> str:
+        Examples
+        --------
+        >>> LogListener(queue=Queue()).stop()
         """
-        Filter an email address.
+        self.running = False  # write new records directly
+        super().stop()
 
-        Filter the given email address out of the given text.
+    def enqueue_sentinel(self):
+        """Enqueue the stop sentinel, waiting for space if the queue is full."""
+        self.queue.put(self._sentinel)
+
+    def handle(self, item: tuple):
+        """
+        Write a queued record.
 
         Parameters
         ----------
-        text : str
-            The text to replace the email address within.
-        email : str
-            The email address to replace with asterisks.
-
-        Returns
-        -------
-        str
-            The original text with the email address replaced.
+        item : tuple
+            The target handlers and the record.
 
         Examples
         --------
-        >>> EmailFilter().replace(text='Testing example@example.com', email='example@example.com')
-        'Testing ****************@********'
+        >>> LogListener(queue=Queue()).handle(item=([], logging.makeLogRecord(dict(msg='test'))))
         """
-        email_parts = email.partition('@')
-        return text.replace(email, 16 * '*' + email_parts[1] + 8 * '*')
+        targets, record = item
+        try:
+            _write(targets=targets, record=record)
+        except Exception:
+            for target in targets:
+                target.handleError(record)
+                break
 
 
-class PlexTokenFilter(RegexFilter):
-    """
-    Log filter for X-Plex-Token.
+_listener = LogListener(queue=_log_queue)
 
-    Class responsible for filtering Plex tokens.
 
-    Attributes
+def flush(timeout: Optional[float] = 5) -> bool:
+    """
+    Wait for the queued records to be written.
+
+    Parameters
     ----------
-    regex : re.compile
-        The compiled regex pattern.
+    timeout : Optional[float], default = 5
+        Seconds to wait, ``None`` to wait forever.
 
-    Methods
+    Returns
     -------
-    replace:
-        Filter that replaces a string within another string.
+    bool
+        ``True`` if all queued records were written.
 
     Examples
     --------
-    >>> PlexTokenFilter()
-    <pyra.logger.PlexTokenFilter object at 0x...>
+    >>> flush()
+    True
     """
+    if not _listener.running or threading.current_thread() is _listener._thread:
+        return not _log_queue.unfinished_tasks
 
-    def __init__(self):
-        super(PlexTokenFilter, self).__init__()
+    with _log_queue.all_tasks_done:
+        return _log_queue.all_tasks_done.wait_for(predicate=lambda: not _log_queue.unfinished_tasks, timeout=timeout)
 
-        self.regex = re.compile(pattern=r'X-Plex-Token(?:=|%3D)([a-zA-Z0-9]+)')
 
-    def replace(self, text: str, token: str) -> str:
-        """
-        Filter a token.
+def queue_stats() -> dict:
+    """
+    Get the state of the log queue.
+
+    Returns
+    -------
+    dict
+        The number of records waiting to be written as ``size``, the ``capacity`` of the queue, and the total number
+        of records ``dropped`` because the queue was full.
+
+    Examples
+    --------
+    >>> queue_stats()
+    {'size': 0, 'capacity': 10000, 'dropped': 0}
+    """
+    return dict(size=_log_queue.qsize(), capacity=_log_queue.maxsize, dropped=_dropped_records)
+
+
+class LogFileHandler(handlers.BaseRotatingHandler):
+    """
+    Write records to a log file, rotated by size and by time.
+
+    On rotation the log file is renamed to a segment named after the time of the rotation, e.g.
+    ``pyra.log.20220410-223005``, and a new log file is started. The segment is then compressed and old segments are
+    removed by a background thread, see ``compress_segments()``, so rotating only costs a rename on the thread writing
+    the logs.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the log file.
+    max_bytes : int, default = MAX_SIZE
+        Rotate the log file once it reaches this size, ``0`` to not rotate by size.
+    interval : int, default = 0
+        Rotate the log file when a period of this many seconds ends, ``0`` to not rotate by time. Periods are aligned
+        to the epoch, so an interval of a day rotates at midnight UTC.
+
+    Examples
+    --------
+    >>> LogFileHandler(filename='logs/pyra.log', max_bytes=5000000, interval=86400)
+    <LogFileHandler .../logs/pyra.log (NOTSET)>
+    """
+    def __init__(self, filename: str, max_bytes: int = MAX_SIZE, interval: int = 0):
+        super().__init__(filename=filename, mode='a', encoding='utf-8', delay=False)
 
-        Filter the given token out of the given text.
+        self.max_bytes = max_bytes
+        self.interval = interval
+
+        # a log file left by a previous run is rotated once its period has ended
+        try:
+            start = os.path.getmtime(self.baseFilename)
+        except OSError:
+            start = time.time()
+        self.rollover_at = self._next_rollover(now=start)
+
+    def _next_rollover(self, now: float) -> Optional[float]:
+        """Get the end of the period containing a time."""
+        if not self.interval:
+            return None
+        return (now // self.interval + 1) * self.interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        """
+        Check if the log file should be rotated before writing a record.
 
         Parameters
         ----------
-        text : str
-            The text to replace the token within.
-        token : str
-            The token to replace with asterisks.
+        record : logging.LogRecord
+            The record to write.
 
         Returns
         -------
-        str
-            The original text with the token replaced.
+        bool
+            ``True`` if the log file is not empty, and has reached ``max_bytes`` or its period has ended.
 
         Examples
         --------
-        >>> PlexTokenFilter().replace(text='x-plex-token=5FBCvHo9vFf9erz8ssLQ', token='5FBCvHo9vFf9erz8ssLQ')
-        'x-plex-token=****************'
+        >>> LogFileHandler(filename='logs/pyra.log').shouldRollover(record=logging.makeLogRecord(dict(msg='test')))
+        False
         """
-        return text.replace(token, 16 * '*')
+        if self.stream is None:
+            self.stream = self._open()
+
+        # the size is checked before writing rather than formatting the record twice, so a file may exceed max_bytes
+        # by one record
+        size = self.stream.tell()
+        if not size:
+            return False
+        if self.rollover_at is not None and record.created >= self.rollover_at:
+            return True
+        return bool(self.max_bytes) and size >= self.max_bytes
 
+    def doRollover(self):
+        """
+        Rotate the log file.
 
-@contextlib.contextmanager
-def listener(logger: logging.Logger):
-    """
-    Create a QueueListener.
+        Examples
+        --------
+        >>> LogFileHandler(filename='logs/pyra.log').doRollover()
+        """
+        if self.stream:
+            self.stream.close()
+            self.stream = None
 
-    Wrapper that create a QueueListener, starts it and automatically stops it.
-    To be used in a with statement in the main process, for multiprocessing.
+        segment = f'{self.baseFilename}.{time.strftime("%Y%m%d-%H%M%S")}'
+        suffix = 0
+        while os.path.exists(segment) or os.path.exists(f'{segment}.gz'):
+            suffix += 1
+            segment = f'{self.baseFilename}.{time.strftime("%Y%m%d-%H%M%S")}-{suffix}'
 
-    Parameters
-    ----------
-    logger : logging.Logger
-        The logger object.
+        try:
+            os.rename(self.baseFilename, segment)
+        except OSError as e:
+            sys.stderr.write(f'Unable to rotate {self.baseFilename}: {e}\n')
+        else:
+            _compressor.submit(directory=os.path.dirname(self.baseFilename))
+
+        self.stream = self._open()
+        self.rollover_at = self._next_rollover(now=time.time())
+
+
+def rotation_settings() -> dict:
+    """
+    Get the rotation and retention settings of the log files.
+
+    Returns
+    -------
+    dict
+        The size to rotate at as ``max_bytes``, the rotation ``interval`` in seconds, and the total size to keep as
+        ``retention``. The defaults are used until the config is loaded.
 
     Examples
     --------
-    >>> logger = get_logger(name='retroarcher')
-    >>> listener(logger=logger)
+    >>> rotation_settings()
+    {'max_bytes': 5000000, 'interval': 86400, 'retention': 50000000}
     """
+    try:
+        settings = pyra.CONFIG['Logging']
+    except (KeyError, TypeError):
+        settings = {}
 
-    global queue
+    return dict(
+        max_bytes=int(settings.get('LOG_ROTATE_SIZE', MAX_SIZE // 1000000) * 1000000),
+        interval=int(settings.get('LOG_ROTATE_INTERVAL', ROTATE_INTERVAL // 3600) * 3600),
+        retention=int(settings.get('LOG_RETENTION_SIZE', RETENTION_SIZE // 1000000) * 1000000),
+    )
 
-    # Initialize queue if not already done
-    if queue is None:
-        try:
-            queue = multiprocessing.Queue()
-        except OSError as e:
-            queue = False
 
-            # Some machines don't have access to /dev/shm. See
-            # http://stackoverflow.com/questions/2009278 for more information.
-            if e.errno == errno.EACCES:
-                logger.warning('Multiprocess logging disabled, because current user cannot map shared memory. You '
-                               'won\'t see any logging generated by the worker processed.')
+def _is_segment(name: str) -> bool:
+    """Check if a file name is a rotated log file."""
+    return bool(_segment_regex.match(name))
 
-    # Multiprocess logging may be disabled.
-    if not queue:
-        yield
-    else:
-        queue_listener = QueueListener(queue, *logger.handlers)
 
-        try:
-            queue_listener.start()
-            yield
-        finally:
-            queue_listener.stop()
+# segments written by LogFileHandler, and numbered backups written by older versions
+_segment_regex = re.compile(r'^.+\.(?:log|jsonl)\.\d[\w-]*(?:\.gz)?$')
 
 
-def init_multiprocessing(logger: logging.Logger):
+def compress_segments(directory: str, retention: Optional[int] = None) -> List[str]:
     """
-    Remove all handlers and add QueueHandler on top.
-
-    This should only be called inside a multiprocessing worker process, since it changes the logger completely.
+    Compress the rotated log files in a directory, then remove the oldest until the logs fit in the retention size.
 
     Parameters
     ----------
-    logger : logging.Logger
-        The logger to initialize for multiprocessing.
+    directory : str
+        The log directory.
+    retention : Optional[int]
+        The maximum total size in bytes of all log files, including the current ones. Only rotated log files are
+        removed. The ``LOG_RETENTION_SIZE`` setting is used by default.
+
+    Returns
+    -------
+    List[str]
+        The paths of the removed files.
 
     Examples
     --------
-    >>> logger = get_logger(name='retroarcher')
-    >>> init_multiprocessing(logger=logger)
+    >>> compress_segments(directory='logs')
+    []
     """
+    retention = rotation_settings()['retention'] if retention is None else retention
 
-    # Multiprocess logging may be disabled.
-    if not queue:
-        return
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
 
-    # Remove all handlers and add the Queue handler as the only one.
-    for handler in logger.handlers[:]:
-        logger.removeHandler(handler)
+    for name in names:
+        path = os.path.join(directory, name)
+        if not _is_segment(name) or name.endswith('.gz') or f'{name}.gz' in names:
+            continue
 
-    queue_handler = QueueHandler(queue)
-    queue_handler.setLevel(logging.DEBUG)
+        temp_path = f'{path}.gz.tmp'
+        try:
+            with open(path, 'rb') as source, gzip.open(temp_path, 'wb', compresslevel=6) as target:
+                shutil.copyfileobj(source, target, length=1024 * 1024)
+            shutil.copystat(path, temp_path)  # keep the modification time, used to find the oldest files
+            os.replace(temp_path, f'{path}.gz')
+            os.remove(path)
+        except OSError as e:
+            sys.stderr.write(f'Unable to compress {path}: {e}\n')
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+
+    files = []
+    total = 0
+    for name in os.listdir(directory):
+        if not (_is_segment(name) or name.endswith(('.log', '.jsonl'))):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        total += stat.st_size
+        if _is_segment(name):
+            files.append((stat.st_mtime, path, stat.st_size))
+
+    removed = []
+    for _mtime, path, size in sorted(files):
+        if total <= retention:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed.append(path)
 
-    logger.addHandler(queue_handler)
+    return removed
+
+
+class _Compressor:
+    """Run ``compress_segments()`` on a background thread when a log file is rotated."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._thread = None
+
+    def submit(self, directory: str):
+        """Compress the rotated log files of a directory in the background."""
+        with self._lock:
+            self._pending.add(directory)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='LogCompressor', daemon=True)
+                self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the submitted directories to be compressed, ``True`` if they were."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+        return thread is None or not thread.is_alive()
+
+    def _run(self):
+        """Compress the submitted directories, the thread exits when there is nothing left to do."""
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                directories = list(self._pending)
+                self._pending.clear()
+
+            for directory in directories:
+                try:
+                    compress_segments(directory=directory)
+                except Exception as e:
+                    sys.stderr.write(f'Unable to compress the logs in {directory}: {e}\n')
 
-    # Change current thread name for log record
-    threading.current_thread().name = multiprocessing.current_process().name
+
+_compressor = _Compressor()
 
 
 def get_logger(name: str) -> logging.Logger:  # this also exists in helpers.py to prevent circular imports
@@ -560,28 +903,182 @@ def setup_loggers():
     """
     Setup all loggers.
 
-    Setup all the available loggers.
+    One set of handlers is created per log file in ``routes``, sharing a single console handler, formatter and
+    redaction filter, and is attached to the logger of each route. Other loggers, such as the logger of each module,
+    are not set up; they are created on first use by ``get_logger()`` and their records propagate to the logger of the
+    longest matching route.
+
+    Calling this again only rebuilds the handlers if the log directory, routes, console output, redaction or rotation
+    settings changed, otherwise only the levels of the loggers are updated.
 
     Examples
     --------
     >>> setup_loggers()
     """
-    loggers_list = [py_name, 'werkzeug']
+    global _setup_key
+
+    with _setup_lock:
+        log_dir = definitions.Paths.LOG_DIR
+        # Only add filters after the config file has been initialized
+        # Nothing prior to initialization should contain sensitive information
+        redact = bool(not pyra.DEV and pyra.CONFIG)
+        rotation = rotation_settings()
+        key = (log_dir, os.path.isdir(log_dir), pyra.QUIET, redact, tuple(sorted(routes.items())),
+               tuple(sorted(rotation.items())))
+
+        if key != _setup_key:
+            _remove_handlers()
+
+            redaction_filter = RedactionFilter()
+
+            console_handler = None
+            if not pyra.QUIET:
+                console_handler = logging.StreamHandler()
+                console_handler.setFormatter(logging.Formatter(
+                    '%(asctime)s - %(levelname)s :: %(threadName)s : %(message)s', '%Y-%m-%d %H:%M:%S'))
+                console_handler.setLevel(logging.DEBUG)
+                if redact:
+                    console_handler.addFilter(redaction_filter)
+
+            # every record is kept in memory for the log viewer, and written as a json line
+            ring_handler = logview.RingHandler(log_ring=logview.ring)
+            ring_handler.setLevel(logging.DEBUG)
+            shared_targets = [ring_handler]
+
+            logview.json_path = None
+            if os.path.isdir(log_dir):
+                logview.json_path = os.path.join(log_dir, f'{py_name}.jsonl')
+                logview.ring.resume(seq=logview.last_seq(path=logview.json_path))
+
+                json_handler = LogFileHandler(filename=logview.json_path, max_bytes=rotation['max_bytes'],
+                                              interval=rotation['interval'])
+                json_handler.setLevel(logging.DEBUG)
+                json_handler.setFormatter(logview.JsonFormatter())
+                shared_targets.append(json_handler)
+
+            if redact:
+                for handler in shared_targets:
+                    handler.addFilter(redaction_filter)
+            if console_handler:
+                shared_targets.append(console_handler)
+
+            file_formatter = logging.Formatter('%(asctime)s - %(levelname)-7s :: %(threadName)s : %(message)s',
+                                               '%Y-%m-%d %H:%M:%S')
+
+            for destination in sorted(set(routes.values())):
+                # the handlers writing the records on the listener thread, the ring handler first since it numbers
+                # the record for the json file
+                targets = list(shared_targets)
+
+                if os.path.isdir(log_dir):
+                    file_handler = LogFileHandler(filename=os.path.join(log_dir, f'{destination}.log'),
+                                                  max_bytes=rotation['max_bytes'], interval=rotation['interval'])
+                    file_handler.setLevel(logging.DEBUG)
+                    file_handler.setFormatter(file_formatter)
+                    if redact:
+                        file_handler.addFilter(redaction_filter)
+                    targets.append(file_handler)
+
+                # the calling thread only enqueues records, the listener filters, formats and writes them
+                async_handler = AsyncHandler(targets=targets)
+                async_handler.setLevel(logging.DEBUG)
+                _async_handlers[destination] = async_handler
+
+            for name, destination in routes.items():
+                logger = logging.getLogger(name=name)
+                logger.propagate = False
+                logger.addHandler(_async_handlers[destination])
+
+            if not _listener.running:
+                _listener.start()
+
+            # compress the log files rotated by a previous run, and apply the retention size
+            if os.path.isdir(log_dir):
+                _compressor.submit(directory=log_dir)
+
+            # Install exception hooks, all tracebacks go to 'pyra.log'
+            _init_hooks(get_logger(name=py_name))
+
+            _setup_key = key
+
+        _set_levels()
+
+
+def _remove_handlers():
+    """Remove the handlers created by ``setup_loggers()`` from the loggers, and close them."""
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        if not isinstance(logger, logging.Logger):
+            continue  # a placeholder for the parent of a logger
+        for handler in logger.handlers[:]:
+            if isinstance(handler, AsyncHandler):
+                logger.removeHandler(handler)
+                logger.propagate = True
+
+    for async_handler in _async_handlers.values():
+        async_handler.close()  # writes the queued records first
+    _async_handlers.clear()
+
+
+def _set_levels():
+    """Set the level of the routed loggers, the other loggers inherit it."""
+    for name in routes:
+        logging.getLogger(name=name).setLevel(logging.DEBUG if pyra.DEBUG else logging.INFO)
+
+
+def route(name: str) -> Optional[str]:
+    """
+    Get the log file of a logger.
+
+    Parameters
+    ----------
+    name : str
+        The name of the logger.
+
+    Returns
+    -------
+    Optional[str]
+        The name of the log file, without the ``.log`` extension. ``None`` if the logger is not routed.
+
+    Examples
+    --------
+    >>> route(name='pyra.webapp')
+    'pyra'
+    >>> route(name='werkzeug')
+    'werkzeug'
+    """
+    while name:
+        if name in routes:
+            return routes[name]
+        name = name.rpartition('.')[0]
+    return None
 
-    submodules = pkgutil.iter_modules(pyra.__path__)
 
-    for submodule in submodules:
-        loggers_list.append(f'{py_name}.{submodule[1]}')
+def set_debug(debug: bool):
+    """
+    Enable or disable debug logging.
 
-    for logger_name in loggers_list:
-        init_logger(log_name=logger_name)
+    The level of the loggers is changed without reinitializing their handlers.
+
+    Parameters
+    ----------
+    debug : bool
+        ``True`` to log debug messages.
+
+    Examples
+    --------
+    >>> set_debug(debug=True)
+    """
+    pyra.DEBUG = debug
+
+    _set_levels()
 
 
 def init_logger(log_name: str) -> logging.Logger:
     """
     Create a logger.
 
-    Creates a logging.Logger object from the given log name.
+    Creates a logging.Logger object from the given log name. If the logger is not routed, it is logged to its own
+    file, ``<log_name>.log``. The loggers are set up if needed.
 
     Parameters
     ----------
@@ -598,67 +1095,12 @@ def init_logger(log_name: str) -> logging.Logger:
     >>> init_logger(log_name='retroarcher')
     <Logger retroarcher (INFO)>
     """
-    logger = logging.getLogger(name=log_name)
-
-    # Close and remove old handlers. This is required to reinitialize the loggers at runtime
-    log_handlers = logger.handlers
-    for handler in log_handlers:
-        # Just make sure it is cleaned up.
-        if isinstance(handler, handlers.RotatingFileHandler):
-            handler.close()
-        elif isinstance(handler, logging.StreamHandler):
-            handler.flush()
+    with _setup_lock:
+        if route(name=log_name) is None:
+            routes[log_name] = log_name
+        setup_loggers()
 
-        logger.removeHandler(handler)
-
-    # Configure the logger to accept all messages
-    logger.propagate = False
-    logger.setLevel(logging.DEBUG if pyra.DEBUG else logging.INFO)
-
-    # Setup file logger
-    file_formatter = logging.Formatter('%(asctime)s - %(levelname)-7s :: %(threadName)s : %(message)s',
-                                       '%Y-%m-%d %H:%M:%S')
-
-    # Setup file logger
-    log_dir = definitions.Paths.LOG_DIR
-    if os.path.isdir(log_dir):
-        filename = os.path.join(log_dir, f'{log_name}.log')
-        file_handler = handlers.RotatingFileHandler(filename=filename, maxBytes=MAX_SIZE, backupCount=MAX_FILES,
-                                                    encoding='utf-8')
-        file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(file_formatter)
-
-        logger.addHandler(file_handler)
-
-    # Setup console logger
-    if not pyra.QUIET:
-        console_formatter = logging.Formatter('%(asctime)s - %(levelname)s :: %(threadName)s : %(message)s',
-                                              '%Y-%m-%d %H:%M:%S')
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(console_formatter)
-        console_handler.setLevel(logging.DEBUG)
-
-        logger.addHandler(console_handler)
-
-    # Add filters to log handlers
-    # Only add filters after the config file has been initialized
-    # Nothing prior to initialization should contain sensitive information
-    if not pyra.DEV and pyra.CONFIG:
-        log_handlers = logger.handlers
-        for handler in log_handlers:
-            handler.addFilter(BlacklistFilter())
-            handler.addFilter(PublicIPFilter())
-            handler.addFilter(EmailFilter())
-            handler.addFilter(PlexTokenFilter())
-
-    # Install exception hooks
-    if log_name == py_name:  # all tracebacks go to 'pyra.log'
-        _init_hooks(logger)
-
-    # replace warn
-    # logger.warn = logger.warning
-
-    return logger
+    return get_logger(name=log_name)
 
 
 def _init_hooks(logger: logging.Logger, global_exceptions: bool = True, thread_exceptions: bool = True,
@@ -721,7 +1163,10 @@ def shutdown():
     --------
     >>> shutdown()
     """
+    if _listener.running:
+        _listener.stop()  # write the queued records
     logging.shutdown()
+    _compressor.wait(timeout=5)  # segments left uncompressed are compressed on the next start
 
 
 # get logger
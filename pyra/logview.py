@@ -0,0 +1,610 @@
+"""
+..
+   logview.py
+
+Structured log records, for reading the logs without access to the log files.
+
+Every record is given a sequence number and written as a compact JSON line to ``pyra.jsonl`` in the log directory,
+which is rotated and compressed like the other log files. The most recent records of each level and logger are also
+kept in memory. Queries are answered from memory when possible. Older records are read from the JSON-lines files,
+starting from an offset found in an index of each file, so the files are never loaded into memory as a whole.
+"""
+# future imports
+from __future__ import annotations
+
+# standard imports
+import bisect
+import collections
+import gzip
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+RING_SIZE = 200  # records kept in memory per level and logger
+MAX_RECORDS = 1000  # records returned per query
+INDEX_INTERVAL = 64 * 1024  # bytes between the offsets in the index of a file
+BLOCK_SIZE = 64 * 1024  # bytes read at a time when reading a file backwards
+
+# the JSON-lines file, set up by ``pyra.logger.setup_loggers()``, ``None`` if there is no log directory
+json_path = None
+
+_formatter = logging.Formatter()
+
+
+def to_entry(record: logging.LogRecord, seq: Optional[int] = None) -> dict:
+    """
+    Get the structured form of a record.
+
+    Parameters
+    ----------
+    record : logging.LogRecord
+        The record.
+    seq : Optional[int]
+        The sequence number of the record.
+
+    Returns
+    -------
+    dict
+        The sequence number as ``seq``, the ``time`` as seconds since the epoch, the ``level`` name, the name of the
+        ``logger``, the ``thread`` name, the ``message``, and the formatted ``exception`` if there is one.
+
+    Examples
+    --------
+    >>> to_entry(record=logging.makeLogRecord(dict(msg='test', levelname='INFO', created=1649631005)), seq=1)
+    {'seq': 1, 'time': 1649631005, 'level': 'INFO', 'logger': None, 'thread': 'MainThread', 'message': 'test'}
+    """
+    entry = dict(seq=seq, time=round(record.created, 3), level=record.levelname, logger=record.name,
+                 thread=record.threadName, message=record.getMessage())
+    if record.exc_info:
+        if not record.exc_text:
+            record.exc_text = _formatter.formatException(record.exc_info)
+        entry['exception'] = record.exc_text
+    return entry
+
+
+def matches(entry: dict, level: int = logging.NOTSET, module: Optional[str] = None) -> bool:
+    """
+    Check if a record matches a query.
+
+    Parameters
+    ----------
+    entry : dict
+        The structured record.
+    level : int, default = logging.NOTSET
+        The minimum level.
+    module : Optional[str]
+        The name of the logger, its child loggers also match.
+
+    Returns
+    -------
+    bool
+        ``True`` if the record matches.
+
+    Examples
+    --------
+    >>> matches(entry=dict(level='INFO', logger='pyra.webapp'), level=logging.WARNING)
+    False
+    >>> matches(entry=dict(level='INFO', logger='pyra.webapp'), module='pyra')
+    True
+    """
+    levelno = logging.getLevelName(entry.get('level'))
+    if isinstance(levelno, int) and levelno < level:
+        return False
+    return _matches_module(name=entry.get('logger') or '', module=module)
+
+
+def _matches_module(name: str, module: Optional[str]) -> bool:
+    """Check if a logger is the module logger or one of its children."""
+    return not module or name == module or name.startswith(f'{module}.')
+
+
+class LogRing:
+    """
+    The most recent records of each level and logger.
+
+    Each level and logger keeps its own ring of records, so frequent debug messages do not push rare errors out of
+    memory.
+
+    Parameters
+    ----------
+    capacity : int, default = RING_SIZE
+        The number of records kept per level and logger.
+
+    Attributes
+    ----------
+    seq : int
+        The sequence number of the last record.
+    start : int
+        The sequence number of the first record added to the ring.
+
+    Methods
+    -------
+    add:
+        Add a record.
+    query:
+        Get the records matching a query.
+
+    Examples
+    --------
+    >>> LogRing(capacity=200)
+    <pyra.logview.LogRing object at 0x...>
+    """
+    def __init__(self, capacity: int = RING_SIZE):
+        self.capacity = capacity
+
+        self.seq = 0
+        self.start = 1
+
+        self._lock = threading.Lock()
+        self._records = {}  # (levelno, logger) -> deque of entries
+
+    def resume(self, seq: int):
+        """
+        Continue the sequence numbers after a previous run.
+
+        Only has an effect before the first record is added.
+
+        Parameters
+        ----------
+        seq : int
+            The sequence number of the last record of the previous run.
+
+        Examples
+        --------
+        >>> LogRing().resume(seq=1024)
+        """
+        with self._lock:
+            if not self._records and seq > self.seq:
+                self.seq = seq
+                self.start = seq + 1
+
+    def add(self, record: logging.LogRecord) -> dict:
+        """
+        Add a record.
+
+        Parameters
+        ----------
+        record : logging.LogRecord
+            The record.
+
+        Returns
+        -------
+        dict
+            The structured record, see ``to_entry()``.
+
+        Examples
+        --------
+        >>> LogRing().add(record=logging.makeLogRecord(dict(msg='test', levelname='INFO', created=1649631005)))
+        {'seq': 1, 'time': 1649631005, 'level': 'INFO', 'logger': None, 'thread': 'MainThread', 'message': 'test'}
+        """
+        with self._lock:
+            self.seq += 1
+            entry = to_entry(record=record, seq=self.seq)
+
+            key = (record.levelno, record.name)
+            try:
+                records = self._records[key]
+            except KeyError:
+                records = self._records[key] = collections.deque(maxlen=self.capacity)
+            records.append(entry)
+
+        return entry
+
+    def query(self, level: int = logging.NOTSET, module: Optional[str] = None, after: Optional[int] = None,
+              before: Optional[int] = None, limit: int = 100) -> Tuple[List[dict], int]:
+        """
+        Get the records matching a query.
+
+        Parameters
+        ----------
+        level : int, default = logging.NOTSET
+            The minimum level.
+        module : Optional[str]
+            The name of the logger, its child loggers also match.
+        after : Optional[int]
+            Get the oldest records with a sequence number greater than this.
+        before : Optional[int]
+            Get the newest records with a sequence number less than this. Ignored if ``after`` is given.
+        limit : int, default = 100
+            The maximum number of records.
+
+        Returns
+        -------
+        Tuple[List[dict], int]
+            The records, oldest first, and the lowest sequence number from which the ring holds every matching record.
+            Older matching records were removed from the ring, or were added in a previous run.
+
+        Examples
+        --------
+        >>> LogRing().query(level=logging.WARNING, limit=10)
+        ([], 1)
+        """
+        with self._lock:
+            matching = [list(records) for (levelno, name), records in self._records.items()
+                        if levelno >= level and _matches_module(name=name, module=module)]
+
+        complete = self.start
+        for records in matching:
+            if len(records) == self.capacity:
+                complete = max(complete, records[0]['seq'])
+
+        if after is not None:
+            entries = (entry for entry in heapq.merge(*matching, key=lambda e: e['seq']) if entry['seq'] > after)
+            return list(itertools.islice(entries, limit)), complete
+
+        entries = heapq.merge(*(reversed(records) for records in matching), key=lambda e: -e['seq'])
+        if before is not None:
+            entries = (entry for entry in entries if entry['seq'] < before)
+        return list(itertools.islice(entries, limit))[::-1], complete
+
+
+ring = LogRing()
+
+
+class RingHandler(logging.Handler):
+    """
+    Add records to a ``LogRing``.
+
+    The structured record is stored on the record as ``log_entry``, for ``JsonFormatter``.
+
+    Parameters
+    ----------
+    log_ring : LogRing
+        The ring.
+
+    Examples
+    --------
+    >>> RingHandler(log_ring=ring)
+    <RingHandler (NOTSET)>
+    """
+    def __init__(self, log_ring: LogRing):
+        super().__init__()
+
+        self.ring = log_ring
+
+    def emit(self, record: logging.LogRecord):
+        """
+        Add a record to the ring.
+
+        Parameters
+        ----------
+        record : logging.LogRecord
+            The record.
+
+        Examples
+        --------
+        >>> RingHandler(log_ring=ring).emit(record=logging.makeLogRecord(dict(msg='test')))
+        """
+        try:
+            record.log_entry = self.ring.add(record=record)
+        except Exception:
+            self.handleError(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as compact JSON lines.
+
+    Records already added to a ``LogRing`` keep their sequence number.
+
+    Examples
+    --------
+    >>> JsonFormatter().format(record=logging.makeLogRecord(dict(msg='test', levelname='INFO', created=1649631005)))
+    '{"seq":null,"time":1649631005,"level":"INFO","logger":null,"thread":"MainThread","message":"test"}'
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Format a record.
+
+        Parameters
+        ----------
+        record : logging.LogRecord
+            The record.
+
+        Returns
+        -------
+        str
+            The JSON line, without the line break.
+
+        Examples
+        --------
+        >>> JsonFormatter().format(record=logging.makeLogRecord(dict(msg='test')))
+        '{"seq":null,...,"message":"test"}'
+        """
+        entry = getattr(record, 'log_entry', None) or to_entry(record=record)
+        return json.dumps(entry, separators=(',', ':'), ensure_ascii=False)
+
+
+class _FileIndex:
+    """The sequence numbers at offsets spread through a JSON-lines file, built incrementally as the file grows."""
+    def __init__(self):
+        self.scanned = 0  # the end of the last complete line read
+        self.complete = False  # compressed files do not change once indexed
+        self.offsets = []
+        self.seqs = []
+
+    def update(self, f, size: Optional[int]):
+        """Index the lines added since the last update, up to the end of a compressed file if ``size`` is ``None``."""
+        if size is None:
+            if self.complete:
+                return
+        elif size < self.scanned:  # truncated
+            self.__init__()
+        elif size == self.scanned:
+            return
+
+        f.seek(self.scanned)
+        offset = self.scanned
+        last = self.offsets[-1] if self.offsets else -INDEX_INTERVAL
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # being written
+            if offset - last >= INDEX_INTERVAL:
+                seq = _seq(line=line)
+                if seq is not None and (not self.seqs or seq > self.seqs[-1]):
+                    self.offsets.append(offset)
+                    self.seqs.append(seq)
+                    last = offset
+            offset += len(line)
+        self.scanned = offset
+        self.complete = size is None
+
+    def offset(self, seq: int) -> int:
+        """Get an offset before which every line has a lower sequence number, and after which every line has a
+        higher one, give or take ``INDEX_INTERVAL`` bytes."""
+        index = bisect.bisect_left(self.seqs, seq)
+        return self.offsets[index] if index < len(self.offsets) else self.scanned
+
+
+_index_lock = threading.Lock()
+_indexes = {}  # (device, inode) -> _FileIndex, so rotating a file does not invalidate its index
+
+
+def _seq(line: bytes) -> Optional[int]:
+    """Get the sequence number of a JSON line, ``None`` if it is not valid."""
+    try:
+        seq = json.loads(line).get('seq')
+    except (ValueError, AttributeError):
+        return None
+    return seq if isinstance(seq, int) else None
+
+
+def _paths(path: str) -> List[str]:
+    """Get the paths of a file and its rotated files, newest first."""
+    directory, name = os.path.split(path)
+    try:
+        names = set(os.listdir(directory or '.'))
+    except OSError:
+        return [path]
+
+    # rotated files are named after the time of the rotation, e.g. pyra.jsonl.20220410-223005.gz
+    segments = {}
+    for segment in names:
+        if segment.startswith(f'{name}.') and segment[len(name) + 1:len(name) + 2].isdigit():
+            stem = segment[:-3] if segment.endswith('.gz') else segment
+            if stem == segment or stem not in names:  # being compressed
+                segments[stem] = segment
+
+    return [path] + [os.path.join(directory, segments[stem]) for stem in sorted(segments, reverse=True)]
+
+
+def _reverse_lines(f, end: int) -> Iterator[bytes]:
+    """Read the lines of a file before an offset, last line first."""
+    buffer = b''
+    position = end
+    while position > 0:
+        size = min(BLOCK_SIZE, position)
+        position -= size
+        f.seek(position)
+        lines = (f.read(size) + buffer).split(b'\n')
+        buffer = lines.pop(0)  # may continue in the previous block
+        for line in reversed(lines):
+            if line:
+                yield line
+    if buffer:
+        yield buffer
+
+
+def _forward_lines(f, start: int, end: int) -> Iterator[bytes]:
+    """Read the complete lines of a file between two offsets."""
+    f.seek(start)
+    position = start
+    for line in f:
+        position += len(line)
+        if position > end or not line.endswith(b'\n'):
+            break
+        yield line
+
+
+def _index(f, compressed: bool) -> _FileIndex:
+    """Get the up to date index of an open file."""
+    stat = os.fstat(f.fileno())
+    with _index_lock:
+        if len(_indexes) > 32:  # forget the files removed by rotation
+            _indexes.clear()
+        file_index = _indexes.setdefault((stat.st_dev, stat.st_ino), _FileIndex())
+        file_index.update(f=f, size=None if compressed else stat.st_size)
+    return file_index
+
+
+def read_file_logs(path: str, level: int = logging.NOTSET, module: Optional[str] = None, after: Optional[int] = None,
+                   before: Optional[int] = None, limit: int = 100) -> List[dict]:
+    """
+    Get the records matching a query from a JSON-lines file and its rotated files.
+
+    Only the parts of the files around the requested sequence numbers are read. Compressed files can only be read
+    forwards, so reading them backwards keeps the last matching records while reading.
+
+    Parameters
+    ----------
+    path : str
+        The path of the JSON-lines file.
+    level : int, default = logging.NOTSET
+        The minimum level.
+    module : Optional[str]
+        The name of the logger, its child loggers also match.
+    after : Optional[int]
+        Get the oldest records with a sequence number greater than this.
+    before : Optional[int]
+        Get the newest records with a sequence number less than this. Also limits the records after ``after``.
+    limit : int, default = 100
+        The maximum number of records.
+
+    Returns
+    -------
+    List[dict]
+        The records, oldest first.
+
+    Examples
+    --------
+    >>> read_file_logs(path='logs/pyra.jsonl', level=logging.ERROR, limit=10)
+    [...]
+    """
+    past_end = object()  # returned when reading forwards past ``before``
+
+    def accept(line: bytes) -> Optional[dict]:
+        """Parse a line if it matches the query."""
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        seq = entry.get('seq')
+        if not isinstance(seq, int) or (after is not None and seq <= after):
+            return None
+        if before is not None and seq >= before:
+            return past_end if after is not None else None
+        return entry if matches(entry=entry, level=level, module=module) else None
+
+    paths = _paths(path=path)
+    if after is not None:
+        paths.reverse()  # oldest first
+
+    entries = []  # oldest first when reading forwards, newest first when reading backwards
+    for file_path in paths:
+        compressed = file_path.endswith('.gz')
+        try:
+            f = gzip.open(file_path, 'rb') if compressed else open(file_path, 'rb')
+        except OSError:
+            continue
+
+        try:
+            with f:
+                file_index = _index(f=f, compressed=compressed)
+
+                if after is not None:
+                    # the line before the offset of the first greater sequence number may still be greater
+                    index = bisect.bisect_right(file_index.seqs, after)
+                    start = file_index.offsets[index - 1] if index else 0
+                    for line in _forward_lines(f=f, start=start, end=file_index.scanned):
+                        entry = accept(line=line)
+                        if entry is past_end:
+                            return entries
+                        if entry:
+                            entries.append(entry)
+                            if len(entries) >= limit:
+                                return entries
+                    continue
+
+                end = file_index.scanned if before is None else file_index.offset(seq=before)
+                if compressed:
+                    newest = collections.deque(maxlen=limit - len(entries))
+                    for line in _forward_lines(f=f, start=0, end=end):
+                        entry = accept(line=line)
+                        if entry:
+                            newest.append(entry)
+                    entries += reversed(newest)
+                else:
+                    for line in _reverse_lines(f=f, end=end):
+                        entry = accept(line=line)
+                        if entry:
+                            entries.append(entry)
+                            if len(entries) >= limit:
+                                break
+                if len(entries) >= limit:
+                    break
+        except (OSError, EOFError) as e:  # e.g. a corrupt compressed file
+            logging.getLogger(__name__).debug(f'Unable to read {file_path}: {e}')
+
+    return entries if after is not None else entries[::-1]
+
+
+def last_seq(path: str) -> int:
+    """
+    Get the sequence number of the last record in a JSON-lines file and its rotated files.
+
+    Parameters
+    ----------
+    path : str
+        The path of the JSON-lines file.
+
+    Returns
+    -------
+    int
+        The sequence number, ``0`` if there are no records.
+
+    Examples
+    --------
+    >>> last_seq(path='logs/pyra.jsonl')
+    1024
+    """
+    records = read_file_logs(path=path, limit=1)
+    return records[-1]['seq'] if records else 0
+
+
+def read_logs(level: int = logging.NOTSET, module: Optional[str] = None, after: Optional[int] = None,
+              before: Optional[int] = None, limit: int = 100, path: Optional[str] = None) -> List[dict]:
+    """
+    Get the records matching a query.
+
+    The records are read from memory, and from the JSON-lines files if memory does not hold all of them.
+
+    Parameters
+    ----------
+    level : int, default = logging.NOTSET
+        The minimum level.
+    module : Optional[str]
+        The name of the logger, its child loggers also match.
+    after : Optional[int]
+        Get the oldest records with a sequence number greater than this, e.g. the last record already read when
+        following the logs.
+    before : Optional[int]
+        Get the newest records with a sequence number less than this, e.g. the first record already read when paging
+        backwards. Ignored if ``after`` is given.
+    limit : int, default = 100
+        The maximum number of records, at most ``MAX_RECORDS``.
+    path : Optional[str]
+        The JSON-lines file, ``json_path`` by default.
+
+    Returns
+    -------
+    List[dict]
+        The records, oldest first. See ``to_entry()`` for the keys of each record.
+
+    Examples
+    --------
+    >>> read_logs(level=logging.WARNING, limit=10)
+    [{'seq': 1020, 'time': 1649631005.123, 'level': 'WARNING', 'logger': 'pyra.webapp', ...}]
+    """
+    path = path or json_path
+    limit = max(1, min(limit, MAX_RECORDS))
+
+    entries, complete = ring.query(level=level, module=module, after=after, before=before, limit=limit)
+    if not path or not os.path.isfile(path):
+        return entries
+
+    # records below the complete range of the ring are read from the files
+    entries = [entry for entry in entries if entry['seq'] >= complete]
+    if after is not None:
+        if after + 1 < complete:
+            older = read_file_logs(path=path, level=level, module=module, after=after, before=complete, limit=limit)
+            entries = (older + entries)[:limit]
+    elif len(entries) < limit:
+        end = complete if before is None else min(before, complete)
+        older = read_file_logs(path=path, level=level, module=module, before=end, limit=limit - len(entries))
+        entries = older + entries
+
+    return entries
@@ -0,0 +1,297 @@
+"""
+..
+   process_table.py
+
+Batched cpu and memory usage of the RetroArcher process tree.
+
+On Linux each tracked process is sampled by reading its ``/proc/<pid>/stat`` and ``/proc/<pid>/statm`` files once per
+sample, and the cpu percentage is computed from the difference in cpu time between samples. The descendants of the
+root process are found through ``/proc/<pid>/task/<tid>/children``, so emulators launched by a launcher (grandchildren
+of RetroArcher) are tracked as well. Processes that exit are evicted, so the number of files read per sample is bounded
+by the number of running processes in the tree.
+
+On other platforms ``psutil`` is used to sample the same process tree.
+"""
+# future imports
+from __future__ import annotations
+
+# standard imports
+import os
+import time
+from typing import Callable, List, Optional, Tuple
+
+# lib imports
+import psutil
+
+# local imports
+from pyra import logger
+
+log = logger.get_logger(name=__name__)
+
+
+def parse_stat(content: str) -> Tuple[str, int, int, int]:
+    """
+    Parse the content of a ``/proc/<pid>/stat`` file.
+
+    Parameters
+    ----------
+    content : str
+        The content of the file.
+
+    Returns
+    -------
+    Tuple[str, int, int, int]
+        The name of the process, the pid of its parent, the cpu time used in clock ticks, and the start time of the
+        process in clock ticks since boot.
+
+    Raises
+    ------
+    ValueError
+        If the content cannot be parsed.
+
+    Examples
+    --------
+    >>> parse_stat(content='42 (retro arch) S 1 42 42 0 -1 4194304 0 0 0 0 150 50 0 0 20 0 1 0 9000 0 0')
+    ('retro arch', 1, 200, 9000)
+    """
+    # the name is in parentheses and may contain spaces or parentheses itself
+    name_start = content.index('(')
+    name_end = content.rindex(')')
+    fields = content[name_end + 2:].split()  # fields start at `state`, the 3rd field of the file
+
+    name = content[name_start + 1:name_end]
+    ppid = int(fields[1])
+    cpu_ticks = int(fields[11]) + int(fields[12])  # utime + stime
+    start_time = int(fields[19])
+
+    return name, ppid, cpu_ticks, start_time
+
+
+class _Entry:
+    """The previous sample of a tracked process."""
+    __slots__ = ('name', 'start_time', 'cpu_ticks', 'sample_time', 'process')
+
+    def __init__(self, name: str, start_time: int, cpu_ticks: int, sample_time: float, process=None):
+        self.name = name
+        self.start_time = start_time
+        self.cpu_ticks = cpu_ticks
+        self.sample_time = sample_time
+        self.process = process  # `psutil.Process` when not reading `/proc` directly
+
+
+class ProcessTable:
+    """
+    Sample the cpu and memory usage of a process and all its descendants.
+
+    Parameters
+    ----------
+    root_pid : int
+        The pid of the root process.
+    root_name : Optional[str]
+        The name to report for the root process. The name of the executable is used by default.
+    proc_path : Optional[str]
+        The path of the ``proc`` filesystem. Defaults to ``/proc`` if it exists, otherwise ``psutil`` is used.
+    clock : Callable, default = time.monotonic
+        The clock used to measure the time between samples.
+
+    Attributes
+    ----------
+    clock_ticks : int
+        The number of clock ticks per second used by the ``proc`` filesystem.
+    page_size : int
+        The size of a memory page in bytes.
+    total_memory : int
+        The total physical memory in bytes.
+
+    Methods
+    -------
+    sample:
+        Sample the cpu and memory usage of each process in the tree.
+
+    Examples
+    --------
+    >>> table = ProcessTable(root_pid=os.getpid(), root_name='RetroArcher')
+    >>> table.sample()
+    [('RetroArcher', 0.0, 1.2)]
+    """
+    def __init__(self, root_pid: int, root_name: Optional[str] = None, proc_path: Optional[str] = None,
+                 clock: Callable = time.monotonic):
+        self.root_pid = root_pid
+        self.root_name = root_name
+        self.clock = clock
+
+        if proc_path is None and os.path.isdir('/proc'):
+            proc_path = '/proc'
+        self.proc_path = proc_path
+
+        if proc_path and hasattr(os, 'sysconf'):
+            self.clock_ticks = os.sysconf('SC_CLK_TCK')
+            self.page_size = os.sysconf('SC_PAGE_SIZE')
+        else:
+            self.clock_ticks = 100
+            self.page_size = 4096
+        self.total_memory = psutil.virtual_memory().total
+
+        self._entries = {}  # pid -> _Entry
+
+    @property
+    def pids(self) -> List[int]:
+        """
+        Get the pids of the tracked processes.
+
+        Returns
+        -------
+        List[int]
+            The pids sampled by the last call of ``sample()``.
+
+        Examples
+        --------
+        >>> ProcessTable(root_pid=os.getpid()).pids
+        []
+        """
+        return list(self._entries)
+
+    def sample(self) -> List[Tuple[str, float, float]]:
+        """
+        Sample the cpu and memory usage of each process in the tree.
+
+        The cpu percentage is ``0.0`` the first time a process is sampled, since there is no previous sample to compare
+        to. Processes which exited since the last sample are evicted.
+
+        Returns
+        -------
+        List[Tuple[str, float, float]]
+            A list of tuples containing the name, cpu percentage, and memory percentage of each process. The root
+            process is first. Percentages have a max of 100.
+
+        Examples
+        --------
+        >>> ProcessTable(root_pid=os.getpid()).sample()
+        [('python', 0.0, 1.2)]
+        """
+        if self.proc_path:
+            return self._sample_proc()
+        return self._sample_psutil()
+
+    def _read(self, pid: int, name: str) -> str:
+        """Read a file of the ``proc`` filesystem."""
+        with open(os.path.join(self.proc_path, str(pid), name)) as f:
+            return f.read()
+
+    def _children(self, pid: int) -> Optional[List[int]]:
+        """Get the pids of the children of a process, ``None`` if the kernel does not provide them."""
+        task_path = os.path.join(self.proc_path, str(pid), 'task')
+        try:
+            tids = os.listdir(task_path)
+        except OSError:
+            return []
+
+        children = []
+        for tid in tids:
+            try:
+                with open(os.path.join(task_path, tid, 'children')) as f:
+                    children.extend(int(child) for child in f.read().split())
+            except FileNotFoundError:
+                if not os.path.isdir(os.path.join(task_path, tid)):
+                    continue  # the thread exited
+                return None  # kernel built without `CONFIG_PROC_CHILDREN`
+            except OSError:
+                continue
+        return children
+
+    def _tree(self) -> List[int]:
+        """Get the pids of the root process and all its descendants, the root process first."""
+        pids = [self.root_pid]
+        index = 0
+        while index < len(pids):
+            children = self._children(pid=pids[index])
+            if children is None:
+                try:
+                    descendants = psutil.Process(self.root_pid).children(recursive=True)
+                except psutil.Error:
+                    return [self.root_pid]
+                return [self.root_pid] + [child.pid for child in descendants]
+
+            for child in children:
+                if child not in pids:
+                    pids.append(child)
+            index += 1
+
+        return pids
+
+    def _cpu_percent(self, entry: _Entry, cpu_ticks: int, now: float, first: bool) -> float:
+        """Get the cpu percentage from the cpu time used since the previous sample."""
+        elapsed = now - entry.sample_time
+        if first or elapsed <= 0:
+            return 0.0
+        cpu_seconds = (cpu_ticks - entry.cpu_ticks) / self.clock_ticks
+        return min(100.0, max(0.0, cpu_seconds / elapsed * 100))
+
+    def _sample_proc(self) -> List[Tuple[str, float, float]]:
+        """Sample the process tree by reading the ``proc`` filesystem."""
+        now = self.clock()
+        entries = {}
+        process_stats = []
+
+        for pid in self._tree():
+            try:
+                name, _ppid, cpu_ticks, start_time = parse_stat(content=self._read(pid=pid, name='stat'))
+                resident_pages = int(self._read(pid=pid, name='statm').split()[1])
+            except (OSError, ValueError, IndexError):
+                continue  # the process exited, it is evicted by not adding it to `entries`
+
+            entry = self._entries.get(pid)
+            first = entry is None or entry.start_time != start_time  # pids may be reused
+            if first:
+                entry = _Entry(name=name, start_time=start_time, cpu_ticks=cpu_ticks, sample_time=now)
+
+            cpu_percent = self._cpu_percent(entry=entry, cpu_ticks=cpu_ticks, now=now, first=first)
+            memory_percent = min(100.0, resident_pages * self.page_size / self.total_memory * 100)
+
+            entry.cpu_ticks = cpu_ticks
+            entry.sample_time = now
+            entries[pid] = entry
+
+            process_stats.append((self._name(pid=pid, name=name), cpu_percent, memory_percent))
+
+        self._entries = entries
+        return process_stats
+
+    def _sample_psutil(self) -> List[Tuple[str, float, float]]:
+        """Sample the process tree using ``psutil``."""
+        try:
+            root = self._entries[self.root_pid].process
+        except KeyError:
+            root = psutil.Process(self.root_pid)
+
+        try:
+            tree = [root] + root.children(recursive=True)
+        except psutil.Error:
+            tree = [root]
+
+        entries = {}
+        process_stats = []
+        for process in tree:
+            entry = self._entries.get(process.pid)
+            if entry is None or entry.process != process:  # `psutil.Process` equality checks the creation time
+                entry = _Entry(name='', start_time=0, cpu_ticks=0, sample_time=0, process=process)
+
+            try:
+                with process.oneshot():
+                    entry.name = entry.name or process.name()
+                    cpu_percent = min(100.0, process.cpu_percent())  # the first call returns 0.0
+                    memory_percent = min(100.0, process.memory_percent(memtype='rss'))
+            except psutil.Error:
+                continue  # the process exited, it is evicted by not adding it to `entries`
+
+            entries[process.pid] = entry
+            process_stats.append((self._name(pid=process.pid, name=entry.name), cpu_percent, memory_percent))
+
+        self._entries = entries
+        return process_stats
+
+    def _name(self, pid: int, name: str) -> str:
+        """Get the name to report for a process."""
+        if pid == self.root_pid and self.root_name:
+            return self.root_name
+        return name
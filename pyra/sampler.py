@@ -0,0 +1,297 @@
+"""
+..
+   sampler.py
+
+Periodic task scheduler used to sample hardware stats.
+
+Tasks run on a single background thread at fixed deadlines measured with a monotonic clock. The next deadline of a task
+is its previous deadline plus its interval, so the time spent running the task does not accumulate as drift. If a task
+takes longer than its interval, the missed deadlines are skipped and counted as an overrun instead of running the task
+several times in a row.
+"""
+# future imports
+from __future__ import annotations
+
+# standard imports
+import math
+import threading
+import time
+from typing import Callable, Optional
+
+# local imports
+from pyra import logger
+from pyra import threads
+
+log = logger.get_logger(name=__name__)
+
+
+class Task:
+    """
+    A periodic task and its timing statistics.
+
+    Parameters
+    ----------
+    name : str
+        The name of the task.
+    interval : float
+        Seconds between the deadlines of the task.
+    target : Callable
+        The function to call.
+
+    Attributes
+    ----------
+    deadline : float
+        The next deadline, as a ``time.monotonic()`` value.
+    runs : int
+        The number of times the task has run.
+    overruns : int
+        The number of times the task finished after its next deadline.
+    skipped : int
+        The number of deadlines skipped because of overruns.
+    errors : int
+        The number of times the task raised an exception.
+    last_jitter : float
+        Seconds between the last deadline and the time the task actually started.
+    max_jitter : float
+        The largest value of ``last_jitter``.
+    last_duration : float
+        Seconds the task took to run the last time.
+
+    Examples
+    --------
+    >>> Task(name='cpu', interval=1, target=print)
+    <pyra.sampler.Task object at 0x...>
+    """
+    def __init__(self, name: str, interval: float, target: Callable):
+        self.name = name
+        self.interval = interval
+        self.target = target
+
+        self.deadline = 0.0
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_jitter = 0.0
+        self.max_jitter = 0.0
+        self.last_duration = 0.0
+
+    def stats(self) -> dict:
+        """
+        Get the timing statistics of the task.
+
+        Returns
+        -------
+        dict
+            A dictionary of the statistics.
+
+        Examples
+        --------
+        >>> Task(name='cpu', interval=1, target=print).stats()
+        {'interval': 1, 'runs': 0, 'overruns': 0, 'skipped': 0, 'errors': 0, 'last_jitter': 0.0, ...}
+        """
+        return dict(
+            interval=self.interval,
+            runs=self.runs,
+            overruns=self.overruns,
+            skipped=self.skipped,
+            errors=self.errors,
+            last_jitter=self.last_jitter,
+            max_jitter=self.max_jitter,
+            last_duration=self.last_duration,
+        )
+
+
+class Sampler:
+    """
+    Run periodic tasks on a background thread.
+
+    Parameters
+    ----------
+    name : str, default = 'Sampler'
+        The name of the thread.
+
+    Attributes
+    ----------
+    tasks : list
+        The scheduled ``Task`` objects.
+
+    Methods
+    -------
+    add_task:
+        Schedule a periodic task.
+    start:
+        Start running the tasks.
+    stop:
+        Stop running the tasks.
+    stats:
+        Get the timing statistics of all tasks.
+
+    Examples
+    --------
+    >>> sampler = Sampler()
+    >>> sampler.add_task(name='cpu', interval=1, target=print)
+    >>> sampler.start()
+    >>> sampler.stop()
+    """
+    def __init__(self, name: str = 'Sampler'):
+        self.name = name
+        self.tasks = []
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add_task(self, name: str, interval: float, target: Callable):
+        """
+        Schedule a periodic task.
+
+        Tasks with the same deadline run in the order they were added. The first run of each task is due as soon as
+        the sampler starts.
+
+        Parameters
+        ----------
+        name : str
+            The name of the task.
+        interval : float
+            Seconds between the deadlines of the task.
+        target : Callable
+            The function to call.
+
+        Raises
+        ------
+        ValueError
+            If the interval is not positive.
+
+        Examples
+        --------
+        >>> Sampler().add_task(name='cpu', interval=1, target=print)
+        """
+        if interval <= 0:
+            raise ValueError(f'Sampler interval must be positive, got {interval} for {name}')
+
+        self.tasks.append(Task(name=name, interval=interval, target=target))
+
+    def set_interval(self, name: str, interval: float):
+        """
+        Change the interval of a task.
+
+        The new interval applies from the next deadline of the task.
+
+        Parameters
+        ----------
+        name : str
+            The name of the task.
+        interval : float
+            Seconds between the deadlines of the task.
+
+        Raises
+        ------
+        KeyError
+            If there is no task with the given name.
+        ValueError
+            If the interval is not positive.
+
+        Examples
+        --------
+        >>> sampler = Sampler()
+        >>> sampler.add_task(name='cpu', interval=1, target=print)
+        >>> sampler.set_interval(name='cpu', interval=2)
+        """
+        if interval <= 0:
+            raise ValueError(f'Sampler interval must be positive, got {interval} for {name}')
+
+        for task in self.tasks:
+            if task.name == name:
+                task.interval = interval
+                return
+
+        raise KeyError(name)
+
+    def start(self):
+        """
+        Start running the tasks.
+
+        Examples
+        --------
+        >>> Sampler().start()
+        """
+        now = time.monotonic()
+        for task in self.tasks:
+            task.deadline = now
+
+        self._stop_event.clear()
+        self._thread = threads.run_in_thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5):
+        """
+        Stop running the tasks.
+
+        A task that is currently running is allowed to finish.
+
+        Parameters
+        ----------
+        timeout : Optional[float], default = 5
+            Seconds to wait for the thread to finish.
+
+        Examples
+        --------
+        >>> Sampler().stop()
+        """
+        self._stop_event.set()
+
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        """
+        Get the timing statistics of all tasks.
+
+        Returns
+        -------
+        dict
+            A dictionary of task names and their statistics.
+
+        Examples
+        --------
+        >>> Sampler().stats()
+        {}
+        """
+        return {task.name: task.stats() for task in self.tasks}
+
+    def _run(self):
+        """Run the due tasks, then sleep until the next deadline."""
+        while self.tasks and not self._stop_event.is_set():
+            task = min(self.tasks, key=lambda t: t.deadline)  # ties keep the order the tasks were added
+
+            delay = task.deadline - time.monotonic()
+            if delay > 0 and self._stop_event.wait(timeout=delay):
+                break
+
+            self._run_task(task=task)
+
+    def _run_task(self, task: Task):
+        """Run a single task and schedule its next deadline."""
+        start = time.monotonic()
+        task.last_jitter = start - task.deadline
+        task.max_jitter = max(task.max_jitter, task.last_jitter)
+
+        try:
+            task.target()
+        except Exception as e:
+            task.errors += 1
+            log.exception(msg=f"Sampler task '{task.name}' failed: {e}")
+
+        end = time.monotonic()
+        task.runs += 1
+        task.last_duration = end - start
+
+        # fixed deadlines, so the time spent running the task does not cause drift
+        task.deadline += task.interval
+
+        if end > task.deadline:
+            # skip the deadlines that were missed instead of running the task repeatedly to catch up
+            missed = math.floor((end - task.deadline) / task.interval) + 1
+            task.deadline += missed * task.interval
+            task.overruns += 1
+            task.skipped += missed
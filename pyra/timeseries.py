@@ -0,0 +1,696 @@
+"""
+..
+   timeseries.py
+
+Fixed capacity time series storage used by the dashboard.
+
+Values are stored in preallocated ``numpy`` arrays which are used as ring buffers. All series in a store share a single
+timestamp column and a single set of head/length indices, so appending a sample never reallocates memory.
+
+A ``MappedTimeSeriesStore`` keeps the same arrays in a fixed size memory-mapped file, so the history survives a restart.
+The file can be read by other tools without going through the webapp. All numbers are little endian, the layout is:
+
+- Header of ``HEADER_SIZE`` bytes: the magic bytes ``PYRATS`` followed by the format version as 2 bytes, then the
+  ``capacity``, ``max_series``, ``head``, ``length``, ``seq``, and ``structure_seq`` as 64 bit integers. ``head`` is the
+  write cursor, i.e. the index of the newest row.
+- Name table of ``max_series`` slots of ``NAME_SIZE`` bytes: the UTF-8 encoded group and key of the series using the
+  slot, separated by a null byte and padded with null bytes. Unused slots are all null bytes.
+- Timestamps: ``capacity`` 64 bit floats.
+- Values: ``capacity`` 64 bit floats for each slot, in slot order. Missing values are ``NaN``.
+
+Rows are stored in ring buffer order, the oldest row is at index ``(head - length + 1) % capacity``.
+"""
+# future imports
+from __future__ import annotations
+
+# standard imports
+import os
+from typing import Iterator, Optional, Tuple
+
+# lib imports
+import numpy as np
+
+# local imports
+from pyra import logger
+
+log = logger.get_logger(name=__name__)
+
+MAGIC = b'PYRATS\x00\x01'
+HEADER_SIZE = 64
+NAME_SIZE = 128
+_header_fields = ('capacity', 'max_series', 'head', 'length', 'seq', 'structure_seq')
+
+
+def to_list(values: np.ndarray) -> list:
+    """
+    Convert an array of floats to a list.
+
+    ``NaN`` values are converted to ``None``, this allows the list to be serialized as valid JSON.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        The array to convert.
+
+    Returns
+    -------
+    list
+        The converted list.
+
+    Examples
+    --------
+    >>> to_list(values=np.array([1.0, np.nan]))
+    [1.0, None]
+    """
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+class SeriesView:
+    """
+    Read only view of a single series within a ``TimeSeriesStore``.
+
+    Parameters
+    ----------
+    store : TimeSeriesStore
+        The store holding the series.
+    name : Tuple[str, str]
+        The group and key of the series.
+
+    Methods
+    -------
+    values:
+        Get the values of the series ordered from oldest to newest.
+
+    Examples
+    --------
+    >>> store = TimeSeriesStore(capacity=10)
+    >>> store.advance(timestamp=1)
+    >>> store.record(group='cpu', key='system', value=5.0)
+    >>> store['cpu']['system'][-1]
+    5.0
+    """
+    def __init__(self, store: TimeSeriesStore, name: Tuple[str, str]):
+        self._store = store
+        self._name = name
+
+    def __len__(self) -> int:
+        return self._store.length
+
+    def __getitem__(self, index: int) -> Optional[float]:
+        value = self._store.get(group=self._name[0], key=self._name[1], index=index)
+        return None if np.isnan(value) else float(value)
+
+    def values(self, count: Optional[int] = None) -> np.ndarray:
+        """
+        Get the values of the series.
+
+        Parameters
+        ----------
+        count : Optional[int]
+            Only return the newest ``count`` values. All values are returned by default.
+
+        Returns
+        -------
+        np.ndarray
+            A copy of the values ordered from oldest to newest. Missing values are ``NaN``.
+
+        Examples
+        --------
+        >>> SeriesView(store=TimeSeriesStore(capacity=10), name=('cpu', 'system')).values()
+        array([], dtype=float64)
+        """
+        return self._store.values(group=self._name[0], key=self._name[1], count=count)
+
+
+class SeriesGroup:
+    """
+    Read only mapping of the series within a group of a ``TimeSeriesStore``.
+
+    Parameters
+    ----------
+    store : TimeSeriesStore
+        The store holding the group.
+    group : str
+        The name of the group.
+
+    Examples
+    --------
+    >>> store = TimeSeriesStore(capacity=10, series=dict(cpu=['system']))
+    >>> list(store['cpu'])
+    ['system']
+    """
+    def __init__(self, store: TimeSeriesStore, group: str):
+        self._store = store
+        self._group = group
+        self._keys = []
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __getitem__(self, key: str) -> SeriesView:
+        if key not in self._keys:
+            raise KeyError(key)
+        return SeriesView(store=self._store, name=(self._group, key))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def items(self) -> Iterator[Tuple[str, SeriesView]]:
+        """
+        Iterate over the series in this group.
+
+        Yields
+        ------
+        Tuple[str, SeriesView]
+            The key and view of each series, in the order they were created.
+
+        Examples
+        --------
+        >>> list(SeriesGroup(store=TimeSeriesStore(capacity=10), group='cpu').items())
+        []
+        """
+        for key in self._keys:
+            yield key, SeriesView(store=self._store, name=(self._group, key))
+
+
+class TimeSeriesStore:
+    """
+    Fixed capacity store of time series.
+
+    Each series is a preallocated ``numpy`` float array of length ``capacity``. A shared timestamp column and
+    head/length indices describe which rows are in use. Appending a row moves the head forward and overwrites the
+    oldest row once the store is full, so every update is constant time and no memory is reallocated.
+
+    Rows which do not have a value for a series (e.g. a process that was not running yet) hold ``NaN``.
+
+    Parameters
+    ----------
+    capacity : int
+        The maximum number of rows to keep.
+    series : Optional[dict]
+        Groups and series to create up front, mapping group names to lists of keys. Groups and series are created on
+        demand when recording values otherwise.
+
+    Attributes
+    ----------
+    capacity : int
+        The maximum number of rows to keep.
+    head : int
+        Index of the newest row, ``-1`` if the store is empty.
+    length : int
+        The number of rows in use.
+    seq : int
+        The total number of rows ever appended. This never wraps, so it can be used to identify a row.
+    structure_seq : int
+        The value of ``seq`` when the most recent series was created.
+    timestamps : np.ndarray
+        The shared timestamp column.
+
+    Methods
+    -------
+    advance:
+        Append a new row.
+    record:
+        Record a value in the newest row.
+    get:
+        Get a single value.
+    values:
+        Get the ordered values of a series.
+    times:
+        Get the ordered timestamps.
+    rows_since:
+        Get the number of rows appended since a given sequence number.
+    items:
+        Iterate over the groups in the store.
+
+    Examples
+    --------
+    >>> store = TimeSeriesStore(capacity=120, series=dict(cpu=['system'], memory=['system']))
+    >>> store.advance(timestamp=1649631005)
+    >>> store.record(group='cpu', key='system', value=12.5)
+    >>> store.values(group='cpu', key='system')
+    array([12.5])
+    """
+    def __init__(self, capacity: int, series: Optional[dict] = None):
+        self.capacity = capacity
+
+        self._series = {}  # (group, key) -> np.ndarray
+        self._groups = {}  # group -> SeriesGroup
+
+        self._init_rows()
+
+        for group, keys in (series or {}).items():
+            self._get_group(group=group)
+            for key in keys:
+                self._get_series(group=group, key=key)
+
+    def __contains__(self, group: str) -> bool:
+        return group in self._groups
+
+    def __getitem__(self, group: str) -> SeriesGroup:
+        return self._groups[group]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._groups)
+
+    def items(self) -> Iterator[Tuple[str, SeriesGroup]]:
+        """
+        Iterate over the groups in the store.
+
+        Yields
+        ------
+        Tuple[str, SeriesGroup]
+            The name and mapping of each group.
+
+        Examples
+        --------
+        >>> list(TimeSeriesStore(capacity=10).items())
+        []
+        """
+        return iter(self._groups.items())
+
+    def _init_rows(self):
+        """Allocate the timestamp column and set the indices of an empty store."""
+        self.head = -1
+        self.length = 0
+        self.seq = 0
+        self.structure_seq = 0
+        self.timestamps = np.full(shape=self.capacity, fill_value=np.nan)
+
+    def _allocate(self, group: str, key: str) -> np.ndarray:
+        """Allocate the values of a new series."""
+        # new series have no values for the rows already in the store
+        return np.full(shape=self.capacity, fill_value=np.nan)
+
+    def _get_group(self, group: str) -> SeriesGroup:
+        try:
+            return self._groups[group]
+        except KeyError:
+            self._groups[group] = SeriesGroup(store=self, group=group)
+            return self._groups[group]
+
+    def _get_series(self, group: str, key: str) -> np.ndarray:
+        try:
+            return self._series[(group, key)]
+        except KeyError:
+            self._series[(group, key)] = self._allocate(group=group, key=key)
+            self._get_group(group=group)._keys.append(key)
+            self.structure_seq = self.seq
+            return self._series[(group, key)]
+
+    def _index(self, index: int) -> int:
+        """Convert a logical index (0 is the oldest row) into an index of the underlying arrays."""
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('time series index out of range')
+        return (self.head - self.length + 1 + index) % self.capacity
+
+    def _ordered(self, array: np.ndarray, count: Optional[int] = None) -> np.ndarray:
+        """Return a copy of the newest ``count`` rows (all rows in use by default), ordered from oldest to newest."""
+        count = self.length if count is None else max(0, min(count, self.length))
+        start = self.head - count + 1
+        if start >= 0:
+            return array[start:self.head + 1].copy()
+        return np.concatenate((array[start:], array[:self.head + 1]))
+
+    def advance(self, timestamp: float):
+        """
+        Append a new row.
+
+        The oldest row is overwritten once the store is full. Every series is set to ``NaN`` for the new row until a
+        value is recorded.
+
+        Parameters
+        ----------
+        timestamp : float
+            The timestamp of the new row.
+
+        Examples
+        --------
+        >>> TimeSeriesStore(capacity=10).advance(timestamp=1649631005)
+        """
+        self.head = (self.head + 1) % self.capacity
+        self.length = min(self.length + 1, self.capacity)
+        self.seq += 1
+
+        self.timestamps[self.head] = timestamp
+        for array in self._series.values():
+            array[self.head] = np.nan
+
+    def record(self, group: str, key: str, value: Optional[float]):
+        """
+        Record a value in the newest row.
+
+        The series is created if it does not exist. Nothing is recorded if no row has been appended yet.
+
+        Parameters
+        ----------
+        group : str
+            The group of the series, e.g. ``cpu``.
+        key : str
+            The key of the series, e.g. ``system``.
+        value : Optional[float]
+            The value to record. ``None`` is stored as a missing value.
+
+        Examples
+        --------
+        >>> store = TimeSeriesStore(capacity=10)
+        >>> store.advance(timestamp=1649631005)
+        >>> store.record(group='cpu', key='system', value=12.5)
+        """
+        array = self._get_series(group=group, key=key)
+
+        if self.length:
+            array[self.head] = np.nan if value is None else value
+
+    def get(self, group: str, key: str, index: int = -1) -> float:
+        """
+        Get a single value.
+
+        Parameters
+        ----------
+        group : str
+            The group of the series.
+        key : str
+            The key of the series.
+        index : int, default = -1
+            The logical index of the row, ``0`` is the oldest row and ``-1`` is the newest row.
+
+        Returns
+        -------
+        float
+            The value, ``NaN`` if there is no value for the row.
+
+        Raises
+        ------
+        KeyError
+            If the series does not exist.
+        IndexError
+            If the index is out of range.
+
+        Examples
+        --------
+        >>> store = TimeSeriesStore(capacity=10)
+        >>> store.advance(timestamp=1649631005)
+        >>> store.record(group='cpu', key='system', value=12.5)
+        >>> store.get(group='cpu', key='system')
+        12.5
+        """
+        return float(self._series[(group, key)][self._index(index=index)])
+
+    def values(self, group: str, key: str, count: Optional[int] = None) -> np.ndarray:
+        """
+        Get the values of a series.
+
+        Parameters
+        ----------
+        group : str
+            The group of the series.
+        key : str
+            The key of the series.
+        count : Optional[int]
+            Only return the newest ``count`` values. All values are returned by default.
+
+        Returns
+        -------
+        np.ndarray
+            A copy of the values ordered from oldest to newest.
+
+        Raises
+        ------
+        KeyError
+            If the series does not exist.
+
+        Examples
+        --------
+        >>> TimeSeriesStore(capacity=10).values(group='cpu', key='system')
+        Traceback (most recent call last):
+            ...
+        KeyError: ('cpu', 'system')
+        """
+        return self._ordered(array=self._series[(group, key)], count=count)
+
+    def times(self, count: Optional[int] = None) -> np.ndarray:
+        """
+        Get the timestamps of the rows in use.
+
+        Parameters
+        ----------
+        count : Optional[int]
+            Only return the newest ``count`` timestamps. All timestamps are returned by default.
+
+        Returns
+        -------
+        np.ndarray
+            A copy of the timestamps ordered from oldest to newest.
+
+        Examples
+        --------
+        >>> TimeSeriesStore(capacity=10).times()
+        array([], dtype=float64)
+        """
+        return self._ordered(array=self.timestamps, count=count)
+
+    def rows_since(self, seq: int) -> Optional[int]:
+        """
+        Get the number of rows appended since a given sequence number.
+
+        Parameters
+        ----------
+        seq : int
+            A value of ``seq`` previously read from this store.
+
+        Returns
+        -------
+        Optional[int]
+            The number of rows appended after ``seq``. ``None`` if some of those rows were already overwritten or if
+            ``seq`` is newer than the store.
+
+        Examples
+        --------
+        >>> store = TimeSeriesStore(capacity=10)
+        >>> store.advance(timestamp=1)
+        >>> store.advance(timestamp=2)
+        >>> store.rows_since(seq=1)
+        1
+        """
+        count = self.seq - seq
+        if count < 0 or count > self.length:
+            return None
+        return count
+
+
+def read_header(path: str) -> dict:
+    """
+    Read the header of a memory-mapped time series file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+
+    Returns
+    -------
+    dict
+        The ``capacity``, ``max_series``, ``head``, ``length``, ``seq``, and ``structure_seq`` of the file.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a time series file.
+
+    Examples
+    --------
+    >>> read_header(path='metrics/dashboard.dat')
+    {'capacity': 121, 'max_series': 64, 'head': 20, 'length': 121, 'seq': 1042, 'structure_seq': 0}
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+
+    if len(header) != HEADER_SIZE or not header.startswith(MAGIC):
+        raise ValueError(f'{path} is not a time series file')
+
+    values = np.frombuffer(header, dtype='<i8', count=len(_header_fields), offset=len(MAGIC))
+    return {field: int(value) for field, value in zip(_header_fields, values)}
+
+
+class _HeaderField:
+    """An attribute of a ``MappedTimeSeriesStore`` that is stored in the header of the file."""
+    def __init__(self, index: int):
+        self.index = index
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return int(instance._header[self.index])
+
+    def __set__(self, instance, value: int):
+        instance._header[self.index] = value
+
+
+class MappedTimeSeriesStore(TimeSeriesStore):
+    """
+    Fixed capacity store of time series, backed by a memory-mapped file.
+
+    The arrays of the store are views of a fixed size file, so appending a row is just a few memory stores and the
+    operating system writes the changes to disk. If the file already exists with the same ``capacity`` and
+    ``max_series``, the store resumes with the rows and series in the file. Otherwise a new file is created.
+
+    Each series uses one of ``max_series`` slots of the file. When all slots are used, the slot of a series without any
+    values in the store is reused. If there is no such series, the new series is kept in memory only.
+
+    See the module documentation for the layout of the file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+    capacity : Optional[int]
+        The maximum number of rows to keep. Only optional if ``readonly`` is ``True``, then the value from the file is
+        used.
+    series : Optional[dict]
+        Groups and series to create up front, mapping group names to lists of keys.
+    max_series : int, default = 64
+        The number of series the file can hold.
+    readonly : bool, default = False
+        ``True`` to open an existing file without modifying it.
+
+    Methods
+    -------
+    flush:
+        Write the changes to disk.
+
+    Examples
+    --------
+    >>> store = MappedTimeSeriesStore(path='metrics/dashboard.dat', capacity=121, series=dict(cpu=['system']))
+    >>> store.advance(timestamp=1649631005)
+    >>> store.record(group='cpu', key='system', value=12.5)
+    >>> store.flush()
+    """
+    head = _HeaderField(index=2)
+    length = _HeaderField(index=3)
+    seq = _HeaderField(index=4)
+    structure_seq = _HeaderField(index=5)
+
+    def __init__(self, path: str, capacity: Optional[int] = None, series: Optional[dict] = None,
+                 max_series: int = 64, readonly: bool = False):
+        self.path = path
+        self.readonly = readonly
+
+        if readonly:
+            header = read_header(path=path)
+            capacity = header['capacity']
+            max_series = header['max_series']
+        elif capacity is None:
+            raise ValueError('capacity is required unless the store is opened read only')
+
+        self.max_series = max_series
+        self._slots = {}  # (group, key) -> slot index
+
+        super().__init__(capacity=capacity, series=None if readonly else series)
+
+    @property
+    def _size(self) -> int:
+        """The size of the file in bytes."""
+        return HEADER_SIZE + self.max_series * NAME_SIZE + (self.max_series + 1) * self.capacity * 8
+
+    def _compatible(self) -> bool:
+        """Check if the existing file can be reused."""
+        try:
+            if os.path.getsize(self.path) != self._size:
+                return False
+            header = read_header(path=self.path)
+        except (OSError, ValueError):
+            return False
+        return header['capacity'] == self.capacity and header['max_series'] == self.max_series
+
+    def _init_rows(self):
+        """Map the file, creating it if required, then load the series it contains."""
+        if self.readonly:
+            self._map = np.memmap(self.path, dtype=np.uint8, mode='r', shape=self._size)
+        elif self._compatible():
+            self._map = np.memmap(self.path, dtype=np.uint8, mode='r+', shape=self._size)
+        else:
+            if os.path.exists(self.path):
+                log.info(msg=f'Replacing incompatible time series file: {self.path}')
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._map = np.memmap(self.path, dtype=np.uint8, mode='w+', shape=self._size)
+            self._map[:len(MAGIC)] = np.frombuffer(MAGIC, dtype=np.uint8)
+
+        names_offset = HEADER_SIZE
+        timestamps_offset = names_offset + self.max_series * NAME_SIZE
+        values_offset = timestamps_offset + self.capacity * 8
+
+        self._header = self._map[len(MAGIC):HEADER_SIZE].view('<i8')
+        self._names = self._map[names_offset:timestamps_offset].reshape(self.max_series, NAME_SIZE)
+        self.timestamps = self._map[timestamps_offset:values_offset].view('<f8')
+        self._values = self._map[values_offset:].view('<f8').reshape(self.max_series, self.capacity)
+
+        if not self.readonly and self._header[0] == 0:  # new file
+            self._header[0] = self.capacity
+            self._header[1] = self.max_series
+            self.head = -1
+            self.timestamps[:] = np.nan
+
+        for slot in range(self.max_series):
+            name = self._names[slot].tobytes().rstrip(b'\x00')
+            if name:
+                group, _sep, key = name.decode('utf-8').partition('\x00')
+                self._slots[(group, key)] = slot
+                self._series[(group, key)] = self._values[slot]
+                self._get_group(group=group)._keys.append(key)
+
+    def _allocate(self, group: str, key: str) -> np.ndarray:
+        """Allocate a slot of the file for a new series."""
+        name = f'{group}\x00{key}'.encode('utf-8')
+        if len(name) > NAME_SIZE:
+            log.warning(msg=f'The name of the series {group}/{key} is too long to be saved, keeping it in memory only')
+            return super()._allocate(group=group, key=key)
+
+        slot = self._free_slot()
+        if slot is None:
+            log.warning(msg=f'No free slot for the series {group}/{key}, keeping it in memory only')
+            return super()._allocate(group=group, key=key)
+
+        self._names[slot] = 0
+        self._names[slot][:len(name)] = np.frombuffer(name, dtype=np.uint8)
+        self._values[slot] = np.nan
+        self._slots[(group, key)] = slot
+
+        return self._values[slot]
+
+    def _free_slot(self) -> Optional[int]:
+        """Get an unused slot, removing a series without any values in the store if all slots are used."""
+        used = set(self._slots.values())
+        for slot in range(self.max_series):
+            if slot not in used:
+                return slot
+
+        for (group, key), slot in self._slots.items():
+            if np.isnan(self.values(group=group, key=key)).all():
+                del self._slots[(group, key)]
+                del self._series[(group, key)]
+                self._groups[group]._keys.remove(key)
+                return slot
+
+        return None
+
+    def flush(self):
+        """
+        Write the changes to disk.
+
+        The operating system writes the changes eventually, this forces it to happen immediately, e.g. when shutting
+        down.
+
+        Examples
+        --------
+        >>> MappedTimeSeriesStore(path='metrics/dashboard.dat', capacity=121).flush()
+        """
+        if not self.readonly:
+            self._map.flush()
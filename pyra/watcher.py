@@ -0,0 +1,230 @@
+"""
+..
+   watcher.py
+
+Watch a file for changes made by other programs.
+
+On Linux, changes are detected with ``inotify``, using the C library directly so no extra dependency is needed. The
+directory of the file is watched rather than the file itself, so the file being replaced by a rename (as editors and
+``pyra.config`` do) is detected. On other platforms, or if ``inotify`` is not available, the modification time and
+size of the file are polled.
+
+In both cases the callback is only called if the file actually differs from the last time it was seen, and only once
+the file has stopped changing for a short time, so an editor writing a file in several steps triggers a single call.
+"""
+# future imports
+from __future__ import annotations
+
+# standard imports
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+from typing import Callable, Optional, Tuple
+
+# local imports
+from pyra import logger
+from pyra import threads
+
+log = logger.get_logger(name=__name__)
+
+# inotify constants, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_event_header = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    """Get the C library if it provides ``inotify``."""
+    if not sys.platform.startswith('linux'):
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, 'inotify_init1') else None
+
+
+_libc = _load_libc()
+
+
+def _signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Get the inode, size, and modification time of a file, ``None`` if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class FileWatcher:
+    """
+    Call a function when a file is changed.
+
+    Parameters
+    ----------
+    path : str
+        The file to watch.
+    callback : Callable
+        The function to call, without arguments, after the file changes.
+    interval : float, default = 2
+        Seconds between checks of the file when polling. The file is also checked at this interval when using
+        ``inotify``, in case an event is missed.
+    settle : float, default = 0.5
+        Seconds the file must stay unchanged before ``callback`` is called.
+    use_inotify : bool, default = True
+        ``False`` to always poll the file.
+
+    Attributes
+    ----------
+    backend : str
+        ``inotify`` or ``polling``, set when the watcher is started.
+
+    Methods
+    -------
+    start:
+        Start watching the file on a background thread.
+    stop:
+        Stop watching the file.
+
+    Examples
+    --------
+    >>> watcher = FileWatcher(path='config.ini', callback=print)
+    >>> watcher.start()
+    >>> watcher.backend
+    'inotify'
+    """
+    def __init__(self, path: str, callback: Callable, interval: float = 2, settle: float = 0.5,
+                 use_inotify: bool = True):
+        self.path = os.path.abspath(path)
+        self.callback = callback
+        self.interval = interval
+        self.settle = settle
+        self.use_inotify = use_inotify
+
+        self.backend = None
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._fd = None
+        self._signature = _signature(self.path)
+
+    def start(self):
+        """
+        Start watching the file on a background thread.
+
+        Examples
+        --------
+        >>> FileWatcher(path='config.ini', callback=print).start()
+        """
+        self._stop_event.clear()
+        self._signature = _signature(self.path)
+
+        self._fd = self._open_inotify() if self.use_inotify else None
+        self.backend = 'polling' if self._fd is None else 'inotify'
+
+        self._thread = threads.run_in_thread(target=self._run, name='FileWatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop watching the file.
+
+        Parameters
+        ----------
+        timeout : Optional[float]
+            Seconds to wait for the watcher thread to stop, wait forever by default.
+
+        Examples
+        --------
+        >>> FileWatcher(path='config.ini', callback=print).stop()
+        """
+        self._stop_event.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _open_inotify(self) -> Optional[int]:
+        """Watch the directory of the file with ``inotify``, ``None`` if it is not available."""
+        if not _libc:
+            return None
+
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            log.debug(msg=f'inotify is not available: {os.strerror(ctypes.get_errno())}')
+            return None
+
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if _libc.inotify_add_watch(fd, os.fsencode(os.path.dirname(self.path)), mask) < 0:
+            log.debug(msg=f'Unable to watch {self.path} with inotify: {os.strerror(ctypes.get_errno())}')
+            os.close(fd)
+            return None
+
+        return fd
+
+    def _run(self):
+        """Wait for the file to change, then call the callback once it settles."""
+        try:
+            while not self._stop_event.is_set():
+                # the file is also checked when no event arrives, since some filesystems (e.g. network shares or
+                # docker volumes on some hosts) do not report changes made by other machines
+                if self._fd is None:
+                    self._stop_event.wait(timeout=self.interval)
+                else:
+                    self._wait_inotify(timeout=self.interval)
+
+                if self._stop_event.is_set() or _signature(self.path) == self._signature:
+                    continue
+
+                # wait for the file to stop changing
+                signature = _signature(self.path)
+                while not self._stop_event.wait(timeout=self.settle):
+                    if _signature(self.path) == signature:
+                        break
+                    signature = _signature(self.path)
+
+                if self._stop_event.is_set() or signature == self._signature:
+                    continue
+                self._signature = signature
+
+                try:
+                    self.callback()
+                except Exception as e:
+                    log.exception(msg=f'Error handling a change of {self.path}: {e}')
+        finally:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _wait_inotify(self, timeout: float) -> bool:
+        """Wait for ``inotify`` events, ``True`` if any event is for the watched file."""
+        readable, _writable, _errored = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+
+        name = os.fsencode(os.path.basename(self.path))
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, 4096)
+            except BlockingIOError:
+                break
+
+            offset = 0
+            while offset + _event_header.size <= len(data):
+                _wd, _mask, _cookie, length = _event_header.unpack_from(data, offset)
+                offset += _event_header.size
+                if data[offset:offset + length].rstrip(b'\0') == name:
+                    changed = True
+                offset += length
+
+        return changed
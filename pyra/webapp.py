@@ -5,21 +5,35 @@
 Responsible for serving the webapp.
 """
 # standard imports
+import functools
+import hashlib
+import json
+import logging
 import os
-from typing import Optional
+import queue
+import threading
+from typing import Callable, Iterator, Optional
 
 # lib imports
 from flask import Flask, Response
 from flask import jsonify, render_template as flask_render_template, request, send_from_directory
 from flask_babel import Babel
+import waitress
+from waitress import wasyncore
+from werkzeug import serving
 
 # local imports
 import pyra
+from pyra import assets
+from pyra import bundle
 from pyra import config
+from pyra import definitions
 from pyra import hardware
+from pyra import history
 from pyra.definitions import Paths
 from pyra import locales
 from pyra import logger
+from pyra import logview
 
 # localization
 _ = locales.get_text()
@@ -43,6 +57,64 @@ jinja_functions = dict(
 )
 app.jinja_env.globals.update(jinja_functions)
 
+
+@app.url_defaults
+def static_version(endpoint: str, values: dict):
+    """
+    Add the content hash of static assets to their URLs.
+
+    This is called by ``url_for``. The hash changes when the content of the asset changes, which allows the asset to be
+    cached by browsers indefinitely.
+
+    Parameters
+    ----------
+    endpoint : str
+        The endpoint of the URL.
+    values : dict
+        The values used to build the URL.
+
+    Examples
+    --------
+    >>> with app.test_request_context():
+    ...     url_for('static', filename='css/custom.css')
+    '/web/css/custom.css?v=3f1c0a2b9d8e7f65'
+    """
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        asset_version = assets.version(directory=app.static_folder, filename=values['filename'])
+        if asset_version:
+            values['v'] = asset_version
+
+
+def static(filename: str) -> Response:
+    """
+    Serve a static asset.
+
+    This replaces the default static view of flask, adding compression, strong ETags, and long-lived caching.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the file within the static directory.
+
+    Returns
+    -------
+    Response
+        The asset.
+
+    See Also
+    --------
+    pyra.assets.send_asset : This function sets up the response.
+
+    Examples
+    --------
+    >>> static(filename='css/custom.css')
+    <Response ... [200 OK]>
+    """
+    return assets.send_asset(directory=app.static_folder, filename=filename)
+
+
+app.view_functions['static'] = static
+
 # localization
 babel = Babel(
     app=app,
@@ -54,11 +126,299 @@ babel = Babel(
     locale_selector=locales.get_locale
 )
 
-# setup logging for flask
-log_handlers = logger.get_logger(name=__name__).handlers
+# app.logger is this logger, its records are written by the handlers of the 'pyra' logger
+log = logger.get_logger(name=__name__)
+
+# json responses smaller than this are not worth compressing
+min_compress_size = 1024
+
+# dynamic responses are compressed on every request, so favor speed over ratio
+compress_level = 5
+
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """
+    Compress json responses.
+
+    Responses are compressed with brotli or gzip, depending on what the client accepts, if they are at least
+    ``min_compress_size`` bytes.
+
+    Parameters
+    ----------
+    response : Response
+        The response of the view.
+
+    Returns
+    -------
+    Response
+        The response, compressed if possible.
+
+    Examples
+    --------
+    >>> compress_response(response=jsonify(status='OK'))
+    <Response ... bytes [200 OK]>
+    """
+    if response.mimetype != 'application/json' or response.status_code != 200 or response.direct_passthrough or \
+            response.is_streamed or response.content_encoding:
+        return response
+
+    data = response.get_data()
+    if len(data) < min_compress_size:
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    encoding = assets.choose_encoding()
+    if encoding:
+        response.set_data(assets.compress(data=data, encoding=encoding, level=compress_level))
+        response.content_encoding = encoding
+
+    return response
+
+
+def conditional(version: Callable[[], object]) -> Callable:
+    """
+    Support conditional requests of a view, using a version counter.
+
+    The ETag of the response is derived from the version and the requested url. If the client already has the current
+    version, ``304 Not Modified`` is returned without calling the view, so the data is not serialized again.
+
+    ETags are weak, since the same data may be sent with different compression.
+
+    Parameters
+    ----------
+    version : Callable[[], object]
+        Get the current version of the data returned by the view. The version must change whenever the data changes.
+
+    Returns
+    -------
+    Callable
+        The decorator.
+
+    Examples
+    --------
+    >>> @conditional(version=lambda: config.REVISION)
+    ... def view():
+    ...     return config.CONFIG
+    """
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+
+            # read the version before building the data, so a change while building is not missed
+            etag = hashlib.blake2b(f'{request.full_path}|{version()}'.encode('utf-8'), digest_size=8).hexdigest()
+
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.cache_control.no_cache = True  # revalidate with the etag
+            return response
+        return wrapper
+    return decorator
+
+
+def _dashboard_version() -> str:
+    """Get the version of the dashboard data, the charts are translated so the locale is included."""
+    return f'{hardware.dash_stats.seq}-{locales.get_locale()}'
+
+
+def _config_version() -> int:
+    """Get the version of the config."""
+    return config.REVISION
+
+
+class EventStream:
+    """
+    Fan out server-sent events to all subscribers.
+
+    Each published event is encoded once, then the encoded bytes are placed on the queue of every subscriber.
+    Subscribers that do not keep up are disconnected instead of blocking the publisher, publishing never blocks.
+
+    Parameters
+    ----------
+    max_queued : int, default = 10
+        The number of events to queue for a subscriber before it is disconnected.
+    keep_alive : float, default = 15
+        Seconds without events before sending a comment to keep the connection open.
+    retry : int, default = 3000
+        Milliseconds the client should wait before reconnecting. This is sent as soon as a client subscribes.
+
+    Methods
+    -------
+    publish:
+        Publish an event to all subscribers.
+    listen:
+        Subscribe to the stream.
+    close:
+        End the stream of all subscribers.
+
+    Examples
+    --------
+    >>> EventStream()
+    <pyra.webapp.EventStream object at 0x...>
+    """
+    def __init__(self, max_queued: int = 10, keep_alive: float = 15, retry: int = 3000):
+        self.max_queued = max_queued
+        self.keep_alive = keep_alive
+        self.retry = retry
+
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    @property
+    def subscribers(self) -> int:
+        """The number of subscribers."""
+        return len(self._subscribers)
+
+    def publish(self, data: dict, event: Optional[str] = None):
+        """
+        Publish an event to all subscribers.
+
+        Parameters
+        ----------
+        data : dict
+            The data to send, this is encoded as JSON.
+        event : Optional[str]
+            The event type. Clients receive this as a ``message`` event if not provided.
+
+        Examples
+        --------
+        >>> EventStream().publish(data={'test': True})
+        """
+        message = f'data: {json.dumps(data, separators=(",", ":"))}\n\n'
+        if event:
+            message = f'event: {event}\n{message}'
+        message = message.encode('utf-8')
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                self._unsubscribe(subscriber=subscriber)
+                self._close(subscriber=subscriber)
+
+    def listen(self) -> Iterator[bytes]:
+        """
+        Subscribe to the stream.
+
+        The subscription is created immediately, so no events are missed before iteration starts.
+
+        Returns
+        -------
+        Iterator[bytes]
+            The encoded events, suitable for a ``text/event-stream`` response.
+
+        Examples
+        --------
+        >>> EventStream().listen()
+        <generator object EventStream._iterate at 0x...>
+        """
+        subscriber = queue.Queue(maxsize=self.max_queued)
+
+        with self._lock:
+            self._subscribers.append(subscriber)
+
+        return self._iterate(subscriber=subscriber)
+
+    def _iterate(self, subscriber: queue.Queue) -> Iterator[bytes]:
+        try:
+            # sent immediately, so the response starts without waiting for the first event
+            yield f'retry: {self.retry}\n\n'.encode('utf-8')
+
+            while True:
+                try:
+                    message = subscriber.get(timeout=self.keep_alive)
+                except queue.Empty:
+                    yield b': keep-alive\n\n'
+                else:
+                    if message is None:
+                        break
+                    yield message
+        finally:  # the client disconnected
+            self._unsubscribe(subscriber=subscriber)
+
+    def close(self):
+        """
+        End the stream of all subscribers.
+
+        Examples
+        --------
+        >>> EventStream().close()
+        """
+        with self._lock:
+            subscribers = self._subscribers
+            self._subscribers = []
+
+        for subscriber in subscribers:
+            self._close(subscriber=subscriber)
+
+    @staticmethod
+    def _close(subscriber: queue.Queue):
+        """End the stream of a subscriber without blocking, the client will reconnect."""
+        # the queue is full, drop the pending events to make room for the end marker
+        while True:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                break
+        try:
+            subscriber.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            try:
+                self._subscribers.remove(subscriber)
+            except ValueError:
+                pass
+
+
+dashboard_stream = EventStream()
+_dashboard_seq = 0
+
+server = None  # set by `start_webapp()`
+
+docs_bundle = bundle.Bundle(path=Paths.DOCS_BUNDLE)  # opened on the first docs request
+
+
+def publish_dashboard():
+    """
+    Publish the latest dashboard data to the dashboard stream.
+
+    This should be called after each ``pyra.hardware.update()``. The data is only built and encoded if there are
+    subscribers, and it is encoded once regardless of the number of subscribers.
+
+    See Also
+    --------
+    pyra.hardware.chart_delta : This function sets up the data in the proper format.
+    stream_dashboard : The endpoint serving the stream.
+
+    Examples
+    --------
+    >>> publish_dashboard()
+    """
+    global _dashboard_seq
 
-for handler in log_handlers:
-    app.logger.addHandler(handler)
+    if not dashboard_stream.subscribers:
+        _dashboard_seq = 0  # the next subscriber will get the full charts
+        return
+
+    data = hardware.chart_delta(since=_dashboard_seq)
+    _dashboard_seq = data['seq']
+
+    dashboard_stream.publish(data=data)
 
 
 def render_template(template_name_or_list, **context):
@@ -121,12 +481,16 @@ def home() -> render_template:
 
 
 @app.route('/callback/dashboard', methods=['GET'])
+@conditional(version=_dashboard_version)
 def callback_dashboard() -> Response:
     """
     Get dashboard data.
 
     This should be used in a callback in order to update charts in the web app.
 
+    If the ``since`` query parameter is provided, only the values recorded after that sequence number are returned.
+    Use ``since=0`` for the first request, then pass the ``seq`` value of each response to the next request.
+
     Returns
     -------
     Response
@@ -134,20 +498,145 @@ def callback_dashboard() -> Response:
 
     See Also
     --------
-    pyra.hardware.chart_data : This function sets up the data in the proper format.
+    pyra.hardware.chart_data_json : This function sets up the data in the proper format.
+    pyra.hardware.chart_delta : This function sets up the data when the ``since`` query parameter is used.
 
     Examples
     --------
     >>> callback_dashboard()
     <Response ... bytes [200 OK]>
     """
-    graphs = hardware.chart_data()
+    since = request.args.get('since', type=int)
 
-    data = jsonify(graphs)
+    if since is None:
+        # the static parts of the charts are cached as encoded json
+        return Response(response=hardware.chart_data_json(), mimetype='application/json')
+
+    data = jsonify(hardware.chart_delta(since=since))
 
     return data
 
 
+@app.route('/stream/dashboard', methods=['GET'])
+def stream_dashboard() -> Response:
+    """
+    Stream dashboard data.
+
+    Server-sent events endpoint, an event is sent each time the hardware stats are updated. Each event contains the
+    data from ``pyra.hardware.chart_delta``. If the ``since`` value of an event does not match the ``seq`` value of the
+    previous event received by the client, the client missed some data and should request it from
+    ``/callback/dashboard``.
+
+    Returns
+    -------
+    Response
+        A ``text/event-stream`` response.
+
+    See Also
+    --------
+    publish_dashboard : Publish the data to this stream.
+
+    Examples
+    --------
+    >>> stream_dashboard()
+    <Response streamed [200 OK]>
+    """
+    return Response(
+        response=dashboard_stream.listen(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # disable buffering by reverse proxies
+        }
+    )
+
+
+@app.route('/api/metrics/history', methods=['GET'])
+def api_metrics_history() -> Response:
+    """
+    Get the long-term history of a metric.
+
+    The ``metric`` query parameter is the group and key of the metric separated by a dot, e.g. ``cpu.system``. The
+    ``range`` query parameter is the period of time to return, as a number of seconds optionally followed by a unit of
+    ``s``, ``m``, ``h``, ``d``, or ``w``, e.g. ``12h``. The range defaults to ``1h``.
+
+    Returns
+    -------
+    Response
+        A response formatted as ``flask.jsonify``. The status code is 400 if the range is invalid, and 404 if the
+        metric has not been recorded.
+
+    See Also
+    --------
+    pyra.hardware.history_data : This function sets up the data.
+
+    Examples
+    --------
+    >>> api_metrics_history()
+    <Response ... bytes [200 OK]>
+    """
+    metric = request.args.get('metric', default='')
+
+    try:
+        duration = history.parse_duration(duration=request.args.get('range', default='1h'))
+    except ValueError as e:
+        return jsonify({'status': 'ERROR', 'message': f'{e}'}), 400
+
+    try:
+        data = hardware.history_data(metric=metric, duration=duration)
+    except KeyError:
+        return jsonify({'status': 'ERROR', 'message': f'Unknown metric: {metric}'}), 404
+
+    return jsonify(data)
+
+
+@app.route('/api/logs', methods=['GET'])
+def api_logs() -> Response:
+    """
+    Get the log records.
+
+    The ``level`` query parameter is the minimum level, e.g. ``WARNING``. The ``module`` query parameter is the name
+    of a logger, e.g. ``pyra.webapp``, its child loggers are included. To follow the logs, pass the sequence number of
+    the last record received as ``after``. To page backwards, pass the sequence number of the first record received
+    as ``before``. The number of records is limited by ``limit``, which defaults to 100.
+
+    Returns
+    -------
+    Response
+        A response formatted as ``flask.jsonify``, with the ``records`` oldest first, and the sequence numbers of the
+        ``first`` and ``last`` record. The status code is 400 if a parameter is invalid.
+
+    See Also
+    --------
+    pyra.logview.read_logs : This function gets the records.
+
+    Examples
+    --------
+    >>> api_logs()
+    <Response ... bytes [200 OK]>
+    """
+    level = request.args.get('level', default='')
+    levelno = logging.getLevelName(level.upper()) if not level.isdigit() else int(level)
+    if level and not isinstance(levelno, int):
+        return jsonify({'status': 'ERROR', 'message': f'Unknown level: {level}'}), 400
+
+    try:
+        after = int(request.args['after']) if request.args.get('after') else None
+        before = int(request.args['before']) if request.args.get('before') else None
+        limit = int(request.args.get('limit', default=100))
+    except ValueError as e:
+        return jsonify({'status': 'ERROR', 'message': f'{e}'}), 400
+
+    records = logview.read_logs(level=levelno if level else logging.NOTSET, module=request.args.get('module'),
+                                after=after, before=before, limit=limit)
+
+    return jsonify(dict(
+        records=records,
+        first=records[0]['seq'] if records else None,
+        last=records[-1]['seq'] if records else None,
+    ))
+
+
 @app.route('/settings/', defaults={'configuration_spec': None})
 @app.route('/settings/<path:configuration_spec>')
 def settings(configuration_spec: Optional[str]) -> render_template:
@@ -194,7 +683,7 @@ def docs(filename) -> send_from_directory:
     """
     Serve the Sphinx html documentation.
 
-    .. todo:: This documentation needs to be improved.
+    The documentation is served from ``Paths.DOCS_BUNDLE`` if it exists, otherwise from ``Paths.DOCS_DIR``.
 
     Parameters
     ----------
@@ -206,6 +695,10 @@ def docs(filename) -> send_from_directory:
     flask.send_from_directory
         The requested documentation page.
 
+    See Also
+    --------
+    pyra.bundle.send_bundled : This function serves the page from the bundle.
+
     Notes
     -----
     The following routes trigger this function.
@@ -217,6 +710,8 @@ def docs(filename) -> send_from_directory:
     --------
     >>> docs(filename='index.html')
     """
+    if docs_bundle.available:
+        return bundle.send_bundled(bundle=docs_bundle, filename=filename)
 
     return send_from_directory(directory=os.path.join(Paths.DOCS_DIR), path=filename)
 
@@ -248,6 +743,7 @@ def favicon() -> send_from_directory:
 
 
 @app.route('/status')
+@conditional(version=lambda: definitions.Names.name)
 def status() -> dict:
     """
     Check the status of RetroArcher.
@@ -268,6 +764,30 @@ def status() -> dict:
     return web_status
 
 
+@app.route('/metrics')
+def metrics() -> Response:
+    """
+    Get the latest hardware metrics for Prometheus.
+
+    The metrics are rendered from the values of the latest sample, so scraping does not take any new samples.
+
+    Returns
+    -------
+    Response
+        The metrics in the Prometheus text exposition format.
+
+    See Also
+    --------
+    pyra.hardware.prometheus_metrics : This function sets up the data.
+
+    Examples
+    --------
+    >>> metrics()
+    <Response ... bytes [200 OK]>
+    """
+    return Response(response=hardware.prometheus_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.route('/test_logger')
 def test_logger() -> str:
     """
@@ -300,6 +820,7 @@ def test_logger() -> str:
 
 @app.route('/api/settings', methods=['GET', 'POST'], defaults={'configuration_spec': None})
 @app.route('/api/settings/<path:configuration_spec>')
+@conditional(version=_config_version)
 def api_settings(configuration_spec: Optional[str]) -> Response:
     """
     Get current settings or save changes to settings from web ui.
@@ -324,7 +845,7 @@ def api_settings(configuration_spec: Optional[str]) -> Response:
     <Response ... bytes [200 OK]>
     """
     if not configuration_spec:
-        config_spec = config._CONFIG_SPEC_DICT
+        config_spec = config.compile_spec()
     else:
         # todo - handle plugin configs
         config_spec = None
@@ -336,51 +857,28 @@ def api_settings(configuration_spec: Optional[str]) -> Response:
         message = ''  # this will be populated as we progress
         result_status = 'OK'
 
-        boolean_dict = {
-            'true': True,
-            'false': False,
-        }
+        # only the posted settings are validated, and the config is only changed if all of them are valid
+        transaction = config.Transaction(spec=config_spec)
 
         data = request.form
         for option, value in data.items():
-            split_option = option.split('|', 1)
-            key = split_option[0]
-            setting = split_option[1]
-
-            setting_type = config_spec[key][setting]['type']
-
-            # get the original value
-            try:
-                og_value = config.CONFIG[key][setting]
-            except KeyError:
-                og_value = ''
-            finally:
-                if setting_type == 'boolean':
-                    value = boolean_dict[value.lower()]  # using eval could allow code injection, so use dictionary
-                if setting_type == 'float':
-                    value = float(value)
-                if setting_type == 'integer':
-                    value = int(value)
-
-            if og_value != value:
-                # setting changed, get the on change command
-                try:
-                    setting_change_method = config_spec[key][setting]['on_change']
-                except KeyError:
-                    pass
-                else:
-                    setting_change_method()
-
-            config.CONFIG[key][setting] = value
+            key, _sep, setting = option.partition('|')
 
-        valid = config.validate_config(config=config.CONFIG)
+            transaction.set(section=key, key=setting, value=value)
 
-        if valid:
-            message += 'Selected settings are valid.'
-            config.save_config(config=config.CONFIG)
-
-        else:
+        if transaction.errors:
             message += 'Selected settings are not valid.'
+            for error in transaction.errors.values():
+                log.warning(msg=f'Invalid setting: {error}')
+        else:
+            try:
+                transaction.commit()
+            except OSError as e:
+                result_status = 'ERROR'
+                message += f'Unable to save settings: {e}'
+            else:
+                # the `on_change` functions and other subscribers are run on the config bus, not in this request
+                message += 'Selected settings are valid.'
 
         return jsonify({'status': f'{result_status}', 'message': f'{message}'})
 
@@ -390,7 +888,11 @@ def start_webapp():
     Start the webapp.
 
     Start the flask webapp. This is placed in it's own function to allow the ability to start the webapp within a
-    thread in a simple way.
+    thread in a simple way. This function blocks until ``stop_webapp()`` is called.
+
+    The server is selected by the ``HTTP_SERVER`` option of the ``Network`` config section. ``waitress`` runs the app
+    on a production server with a pool of ``HTTP_THREADS`` threads, ``development`` runs it on the Werkzeug development
+    server.
 
     Examples
     --------
@@ -405,9 +907,64 @@ def start_webapp():
     ...
      * Running on http://.../ (Press CTRL+C to quit)
     """
-    app.run(
-        host=config.CONFIG['Network']['HTTP_HOST'],
-        port=config.CONFIG['Network']['HTTP_PORT'],
-        debug=pyra.DEV,
-        use_reloader=False  # reloader doesn't work when running in a separate thread
-    )
+    global server
+
+    network = config.CONFIG['Network']
+
+    if network['HTTP_SERVER'] == 'waitress' and not pyra.DEV:
+        server = waitress.create_server(
+            application=app,
+            host=network['HTTP_HOST'],
+            port=network['HTTP_PORT'],
+            threads=network['HTTP_THREADS'],
+            backlog=network['HTTP_BACKLOG'],
+            channel_timeout=network['HTTP_KEEP_ALIVE'],
+            ident=definitions.Names.name,
+        )
+        log.info(msg=f"Serving on http://{network['HTTP_HOST']}:{network['HTTP_PORT']} with waitress")
+
+        server.run()
+    else:
+        app.debug = pyra.DEV
+        server = serving.make_server(
+            host=network['HTTP_HOST'],
+            port=network['HTTP_PORT'],
+            app=app,
+            threaded=True,
+        )
+        server.request_queue_size = network['HTTP_BACKLOG']
+        log.info(msg=f"Serving on http://{network['HTTP_HOST']}:{network['HTTP_PORT']} with the development server")
+
+        server.serve_forever()
+
+
+def stop_webapp():
+    """
+    Stop the webapp.
+
+    New connections are refused, then requests in progress are given up to ``HTTP_DRAIN_TIMEOUT`` seconds to finish
+    before the remaining connections are closed. Open dashboard streams are closed first, since they never finish on
+    their own. The development server does not wait for requests in progress.
+
+    Examples
+    --------
+    >>> stop_webapp()
+    """
+    global server
+
+    if not server:
+        return
+
+    stopping_server = server
+    server = None
+
+    dashboard_stream.close()
+
+    timeout = config.CONFIG['Network']['HTTP_DRAIN_TIMEOUT']
+    if isinstance(stopping_server, serving.BaseWSGIServer):
+        stopping_server.shutdown()
+        stopping_server.server_close()
+    else:
+        stopping_server.close()  # stop accepting connections
+        stopping_server.task_dispatcher.shutdown(cancel_pending=False, timeout=timeout)
+        wasyncore.close_all(map=stopping_server._map)  # remaining connections, this ends `server.run()`
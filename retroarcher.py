@@ -23,6 +23,7 @@ from pyra import helpers
 from pyra import locales
 from pyra import logger
 from pyra import threads
+from pyra import watcher
 
 py_name = 'pyra'
 
@@ -212,12 +213,21 @@ def wait():
     >>> wait()
     """
     from pyra import hardware  # submodule requires translations so importing after initialization
+    from pyra import webapp
 
     log.info("RetroArcher is ready!")
 
+    hardware.load_history()  # resume the dashboard history of the previous run
+
+    # sample dashboard resource values and push them to connected dashboards
+    hardware.start_sampler(on_update=webapp.publish_dashboard)
+
+    # apply changes made to the config file by other programs, e.g. docker users editing it on the host
+    config_watcher = watcher.FileWatcher(path=pyra.CONFIG_FILE, callback=config.reload_config)
+    config_watcher.start()
+
     while True:  # wait endlessly for a signal
         if not pyra.SIGNAL:
-            hardware.update()  # update dashboard resource values
             try:
                 time.sleep(1)
             except KeyboardInterrupt:
@@ -225,6 +235,11 @@ def wait():
         else:
             log.info(f'Received signal: {pyra.SIGNAL}')
 
+            config_watcher.stop(timeout=5)
+            hardware.hardware_sampler.stop()
+            hardware.gpu_collector.close()
+            hardware.save_history()
+
             if pyra.SIGNAL == 'shutdown':
                 pyra.stop()
             elif pyra.SIGNAL == 'restart':
@@ -0,0 +1,67 @@
+"""
+..
+   _benchmark_logging.py
+
+Measure the number of log records written per second, with and without redaction of sensitive values.
+
+Records are handled synchronously by a handler writing to memory, so only the cost of filtering and formatting is
+measured. This is not intended to be run by the end user, but is useful when changing the log filters.
+"""
+# standard imports
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(script_dir)
+
+sys.path.insert(0, root_dir)
+
+# local imports
+from pyra import logger  # noqa: E402
+
+messages = [
+    ('Requesting %s', ('/callback/dashboard',)),
+    ('Connected to 172.1.7.5 and 192.168.1.10', ()),
+    ('Sending notification to %s', ('example@example.com',)),
+    ('GET https://172-1-7-5.abcdef.plex.direct:32400/library?X-Plex-Token=5FBCvHo9vFf9erz8ssLQ', ()),
+    ('Loaded %d settings from %s', (42, 'config.ini')),
+]
+
+
+def benchmark(redact: bool, records: int, words: int) -> float:
+    """Get the number of records written per second."""
+    handler = logging.StreamHandler(io.StringIO())
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)-7s :: %(threadName)s : %(message)s'))
+    if redact:
+        handler.addFilter(logger.RedactionFilter())
+
+    logger._BLACKLIST_WORDS.clear()
+    logger._BLACKLIST_WORDS.update(f'secret-value-{index:04d}' for index in range(words))
+    logger._redactor = logger.Redactor(words=logger._BLACKLIST_WORDS)
+    logger.LOG_BLACKLIST[:] = [True] if redact else []
+
+    start = time.perf_counter()
+    for index in range(records):
+        msg, args = messages[index % len(messages)]
+        handler.handle(logging.makeLogRecord(dict(msg=msg, args=args, levelno=logging.INFO, levelname='INFO')))
+
+    return records / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    # Set up and gather command line arguments
+    parser = argparse.ArgumentParser(description='Script benchmarks the redaction of log records.')
+
+    parser.add_argument('--records', type=int, default=50000, help='Records to write per run.')
+    parser.add_argument('--words', type=int, default=20, help='Blacklisted words.')
+
+    args = parser.parse_args()
+
+    print(f"{'redaction':<12}{'records/s':>12}")
+    for redact in (False, True):
+        rate = benchmark(redact=redact, records=args.records, words=args.words)
+        print(f"{'on' if redact else 'off':<12}{rate:>12.0f}")
@@ -0,0 +1,73 @@
+"""
+..
+   _benchmark_webapp.py
+
+Measure the bytes sent and cpu time used per request by the json endpoints of the webapp.
+
+Each endpoint is requested as a client without compression or caching would (before), as a client accepting compressed
+responses, and as a client revalidating its cached copy with ``If-None-Match``. This is not intended to be run by the
+end user, but is useful when changing how responses are built.
+"""
+# standard imports
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(script_dir)
+
+sys.path.insert(0, root_dir)
+
+# local imports
+import pyra  # noqa: E402
+from pyra import hardware  # noqa: E402
+from pyra import webapp  # noqa: E402
+
+endpoints = [
+    '/callback/dashboard',
+    '/callback/dashboard?since=1',
+    '/api/settings',
+    '/status',
+]
+
+
+def benchmark(client, url: str, headers: dict, requests: int) -> tuple:
+    """Get the average bytes and cpu microseconds per request."""
+    size = 0
+    start = time.process_time()
+    for _ in range(requests):
+        size += len(client.get(url, headers=headers).data)
+    cpu = time.process_time() - start
+
+    return size / requests, cpu / requests * 1000000
+
+
+if __name__ == '__main__':
+    # Set up and gather command line arguments
+    parser = argparse.ArgumentParser(description='Script benchmarks the json endpoints of the webapp.')
+
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and client.')
+    parser.add_argument('--samples', type=int, default=120, help='Hardware samples to record before benchmarking.')
+
+    args = parser.parse_args()
+
+    pyra.initialize(config_file=os.path.join(tempfile.mkdtemp(), 'config.ini'))
+    for _ in range(args.samples):
+        hardware.update()
+
+    client = webapp.app.test_client()
+
+    print(f"{'endpoint':<30}{'client':<14}{'bytes':>10}{'cpu (us)':>12}")
+    for url in endpoints:
+        etag = client.get(url).headers.get('ETag', '')
+        clients = dict(
+            plain={},
+            compressed={'Accept-Encoding': 'br, gzip'},
+            revalidated={'Accept-Encoding': 'br, gzip', 'If-None-Match': etag},
+        )
+
+        for name, headers in clients.items():
+            size, cpu = benchmark(client=client, url=url, headers=headers, requests=args.requests)
+            print(f'{url:<30}{name:<14}{size:>10.0f}{cpu:>12.0f}')
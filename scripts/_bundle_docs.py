@@ -0,0 +1,38 @@
+"""
+..
+   _bundle_docs.py
+
+Pack the compiled html documentation into a single bundle.
+
+The webapp serves the documentation from the bundle instead of the ``./docs/build/html`` directory if it exists. This
+should be run after the docs are compiled.
+"""
+# standard imports
+import argparse
+import os
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(script_dir)
+
+sys.path.insert(0, root_dir)
+
+# local imports
+from pyra import bundle  # noqa: E402
+from pyra.definitions import Paths  # noqa: E402
+
+
+if __name__ == '__main__':
+    # Set up and gather command line arguments
+    parser = argparse.ArgumentParser(description='Script packs the compiled html documentation into a bundle.')
+
+    parser.add_argument('--directory', default=Paths.DOCS_DIR, help='The directory of the compiled documentation.')
+    parser.add_argument('--output', default=Paths.DOCS_BUNDLE, help='The path of the bundle to write.')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        raise SystemExit(f'{args.directory} does not exist, compile the docs first')
+
+    count = bundle.create_bundle(directory=args.directory, path=args.output)
+    print(f'Bundled {count} files into {args.output}')
@@ -0,0 +1,34 @@
+"""
+..
+   _compress_assets.py
+
+Write gzip and brotli compressed copies of the static assets of the webapp.
+
+The compressed copies are written next to each asset, e.g. ``custom.css.gz``, and are served by ``pyra.assets`` instead
+of compressing the assets on the fly. This should be run after the npm requirements are moved into ``./web``.
+"""
+# standard imports
+import argparse
+import os
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(script_dir)
+web_dir = os.path.join(root_dir, 'web')
+
+sys.path.insert(0, root_dir)
+
+# local imports
+from pyra import assets  # noqa: E402
+
+
+if __name__ == '__main__':
+    # Set up and gather command line arguments
+    parser = argparse.ArgumentParser(description='Script writes compressed copies of the static assets.')
+
+    parser.add_argument('--directory', default=web_dir, help='The directory of the static assets.')
+
+    args = parser.parse_args()
+
+    written = assets.compress_directory(directory=args.directory)
+    print(f'Compressed {len(written)} files')
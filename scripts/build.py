@@ -5,6 +5,7 @@
 Creates spec and builds binaries for RetroArcher.
 """
 # standard imports
+import os
 import sys
 
 # lib imports
@@ -18,12 +19,17 @@ def build():
         '--onefile',
         '--noconfirm',
         '--paths=./',
-        '--add-data=docs:docs',
         '--add-data=web:web',
         '--add-data=locale:locale',
         '--icon=./web/images/retroarcher.ico'
     ]
 
+    # the bundle is a single file to extract, instead of the whole docs tree
+    if os.path.isfile(os.path.join('docs', 'build', 'docs.bundle')):
+        pyinstaller_args.append('--add-data=docs/build/docs.bundle:docs/build')
+    else:
+        pyinstaller_args.append('--add-data=docs:docs')
+
     if sys.platform.lower() == 'win32':  # windows
         pyinstaller_args.append('--console')
         pyinstaller_args.append('--splash=./web/images/logo-circle.png')
@@ -5,8 +5,16 @@
 Functional tests for pyra.webapp.
 """
 # standard imports
+import gzip
 import json
 
+# lib imports
+from flask import url_for
+
+# local imports
+from pyra import bundle
+from pyra import logger
+
 
 def test_home(test_client):
     """
@@ -50,6 +58,116 @@ def test_callback_dashboard(test_client):
         assert x['config']
 
 
+def test_callback_dashboard_delta(test_client, monkeypatch):
+    """
+    WHEN the '/callback/dashboard' page is requested (GET) with a sequence number
+    THEN check that the response is valid
+    THEN check that the full charts are returned for the first request
+    THEN check that only the new values are returned for the next request
+    """
+    from pyra import hardware
+    from pyra import timeseries
+
+    store = timeseries.TimeSeriesStore(capacity=5, series=dict(cpu=['system'], gpu=[], memory=['system'],
+                                                               network=['sent', 'received']))
+    monkeypatch.setattr(hardware, 'dash_stats', store)
+
+    store.advance(timestamp=1000)
+    store.record(group='cpu', key='system', value=10)
+
+    response = test_client.get('/callback/dashboard?since=0')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+
+    assert data['reset'] is True
+    assert data['seq'] == 1
+    assert isinstance(data['graphs'], list)
+
+    store.advance(timestamp=1001)
+    store.record(group='cpu', key='system', value=20)
+
+    response = test_client.get(f'/callback/dashboard?since={data["seq"]}')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+
+    assert data['reset'] is False
+    assert data['seq'] == 2
+    assert data['updates'][0]['id'] == 'chart-cpu'
+    assert data['updates'][0]['x'] == [[1001000]]
+    assert data['updates'][0]['y'] == [[20]]
+
+
+def test_api_metrics_history(test_client, monkeypatch):
+    """
+    WHEN the '/api/metrics/history' page is requested (GET)
+    THEN check that the response is valid
+    THEN check that invalid ranges and unknown metrics are rejected
+    """
+    from pyra import hardware
+    from pyra import history
+
+    metrics_history = history.MetricsHistory()
+    monkeypatch.setattr(hardware, 'metrics_history', metrics_history)
+    monkeypatch.setattr(hardware.helpers, 'timestamp', lambda: 1100)
+
+    for timestamp in range(1000, 1100):
+        metrics_history.add(timestamp=timestamp, values={('cpu', 'system'): 25})
+
+    response = test_client.get('/api/metrics/history?metric=cpu.system&range=30m')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+
+    assert data['metric'] == 'cpu.system'
+    assert data['range'] == 1800
+    assert data['step'] == 10
+    assert data['avg'] == [25] * 9
+
+    response = test_client.get('/api/metrics/history?metric=cpu.system&range=invalid')
+    assert response.status_code == 400
+
+    response = test_client.get('/api/metrics/history?metric=cpu.invalid')
+    assert response.status_code == 404
+
+
+def test_metrics(test_client):
+    """
+    WHEN the '/metrics' page is requested (GET)
+    THEN check that the response is valid
+    THEN check that the response is in the Prometheus text exposition format
+    """
+    response = test_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+
+    for line in response.data.decode('utf-8').splitlines():
+        assert line.startswith('# ') or line.startswith('retroarcher_')
+
+
+def test_stream_dashboard(test_client, monkeypatch):
+    """
+    WHEN the '/stream/dashboard' page is requested (GET)
+    THEN check that the response is an event stream
+    THEN check that published dashboard data is received
+    """
+    from pyra import webapp
+
+    monkeypatch.setattr(webapp.dashboard_stream, 'keep_alive', 1)  # fail fast if the event never arrives
+
+    response = test_client.get('/stream/dashboard', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+
+    webapp.publish_dashboard()
+
+    # skip the reconnection delay and keep-alive comments
+    message = next(chunk for chunk in response.response if not chunk.startswith((b'retry:', b':')))
+    assert message.startswith(b'data: ')
+    data = json.loads(message[len(b'data: '):])
+    assert 'seq' in data
+
+    response.close()
+
+
 def test_docs(test_client):
     """
     WHEN the '/docs/' page is requested (GET)
@@ -59,6 +177,22 @@ def test_docs(test_client):
     assert response.status_code == 200
 
 
+def test_docs_bundle(test_client, tmp_path, monkeypatch):
+    """
+    WHEN the '/docs/' page is requested (GET) and the docs are bundled
+    THEN check that the page is served from the bundle
+    """
+    html = tmp_path / 'html'
+    html.mkdir()
+    (html / 'index.html').write_text('<html><body>RetroArcher</body></html>')
+    bundle.create_bundle(directory=str(html), path=str(tmp_path / 'docs.bundle'))
+    monkeypatch.setattr('pyra.webapp.docs_bundle', bundle.Bundle(path=str(tmp_path / 'docs.bundle')))
+
+    response = test_client.get('/docs/')
+    assert response.status_code == 200
+    assert response.data == b'<html><body>RetroArcher</body></html>'
+
+
 def test_settings(test_client):
     """
     WHEN the '/settings/' page is requested (GET)
@@ -83,7 +217,14 @@ def test_api_settings(test_client):
     assert post_response.json['status'] == 'OK'
     assert post_response.json['message'] == 'Selected settings are valid.'
 
-    # todo, test posting data (valid and invalid)
+    post_response = test_client.post('/api/settings', data={'Network|HTTP_PORT': '9697'})
+    assert post_response.json['message'] == 'Selected settings are valid.'
+    assert test_client.get('/api/settings').json['Network']['HTTP_PORT'] == 9697
+    test_client.post('/api/settings', data={'Network|HTTP_PORT': '9696'})  # restore the default
+
+    post_response = test_client.post('/api/settings', data={'Network|HTTP_PORT': '1', 'Network|HTTP_THREADS': '8'})
+    assert post_response.json['message'] == 'Selected settings are not valid.'
+    assert test_client.get('/api/settings').json['Network']['HTTP_THREADS'] == 16
 
 
 def test_status(test_client):
@@ -96,6 +237,54 @@ def test_status(test_client):
     assert response.content_type == 'application/json'
 
 
+def test_conditional_get(test_client):
+    """
+    WHEN the '/api/settings' page is requested (GET) with the ETag of a previous response
+    THEN check that the response is not modified
+    THEN check that the response is modified after the settings are changed
+    """
+    response = test_client.get('/api/settings')
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+
+    response = test_client.get('/api/settings', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    test_client.post('/api/settings')  # nothing changed
+
+    response = test_client.get('/api/settings', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    test_client.post('/api/settings', data={'Network|HTTP_THREADS': '8'})
+
+    response = test_client.get('/api/settings', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    test_client.post('/api/settings', data={'Network|HTTP_THREADS': '16'})  # restore the default
+
+
+def test_json_compression(test_client, monkeypatch):
+    """
+    WHEN a json page is requested (GET) by a client accepting gzip
+    THEN check that the response is compressed
+    THEN check that small responses are not compressed
+    """
+    monkeypatch.setattr('pyra.webapp.min_compress_size', 0)
+
+    response = test_client.get('/api/settings', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.content_encoding == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert json.loads(gzip.decompress(response.data)) == test_client.get('/api/settings').json
+
+    monkeypatch.setattr('pyra.webapp.min_compress_size', 1024)
+
+    response = test_client.get('/status', headers={'Accept-Encoding': 'gzip'})
+    assert response.content_encoding is None
+
+
 def test_test_logger(test_client):
     """
     WHEN the '/test_logger' route is requested (GET)
@@ -105,3 +294,55 @@ def test_test_logger(test_client):
     response = test_client.get('/test_logger')
     assert response.status_code == 200
     assert b'Testing complete, check "logs/' in response.data
+
+
+def test_api_logs(test_client):
+    """
+    WHEN the '/api/logs' route is requested (GET)
+    THEN check that the records are filtered by level and can be followed
+    """
+    test_client.get('/test_logger')
+    assert logger.flush()
+
+    response = test_client.get('/api/logs?level=ERROR&module=pyra.webapp&limit=1')
+    assert response.status_code == 200
+    data = response.json
+    assert len(data['records']) == 1
+    assert data['records'][0]['level'] in ('ERROR', 'CRITICAL')
+    assert data['first'] == data['last'] == data['records'][0]['seq']
+
+    response = test_client.get(f"/api/logs?after={data['last']}&module=pyra.webapp")
+    assert response.status_code == 200
+    assert all(record['seq'] > data['last'] for record in response.json['records'])
+
+    assert test_client.get('/api/logs?level=LOUD').status_code == 400
+    assert test_client.get('/api/logs?after=abc').status_code == 400
+
+
+def test_static(test_client):
+    """
+    WHEN a static asset is requested (GET) with its versioned url
+    THEN check that the response is compressed and cached indefinitely
+    THEN check that the response is not modified when requested with its ETag
+    """
+    with test_client.application.test_request_context():
+        url = url_for('static', filename='css/custom.css')
+    assert '?v=' in url
+
+    response = test_client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.content_encoding == 'gzip'
+    assert response.cache_control.immutable
+
+    response = test_client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+
+def test_static_range(test_client):
+    """
+    WHEN part of a static asset is requested (GET)
+    THEN check that only the requested range is returned
+    """
+    response = test_client.get('/web/images/logo-circle.png', headers={'Range': 'bytes=0-7'})
+    assert response.status_code == 206
+    assert response.data == b'\x89PNG\r\n\x1a\n'
@@ -0,0 +1,100 @@
+"""
+..
+   test_assets.py
+
+Unit tests for pyra.assets.
+"""
+# standard imports
+import gzip
+import os
+
+# lib imports
+from flask import Flask
+import pytest
+
+# local imports
+from pyra import assets
+
+
+@pytest.fixture(scope='function')
+def static_dir(tmp_path):
+    """Create a static directory with a text asset and a binary asset"""
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'style.css').write_text('body { color: black; }\n' * 100)
+    (tmp_path / 'video.mp4').write_bytes(bytes(range(256)) * 10)
+    return str(tmp_path)
+
+
+def test_asset(static_dir):
+    """Tests hashing an asset"""
+    asset = assets.Asset(path=os.path.join(static_dir, 'css', 'style.css'))
+    assert len(asset.digest) == 16
+    assert asset.mimetype == 'text/css'
+    assert asset.compressible
+
+    asset = assets.Asset(path=os.path.join(static_dir, 'video.mp4'))
+    assert asset.mimetype == 'video/mp4'
+    assert not asset.compressible
+
+
+def test_version(static_dir):
+    """Tests that the version changes when the content changes"""
+    version = assets.version(directory=static_dir, filename='css/style.css')
+    assert version == assets.version(directory=static_dir, filename='css/style.css')
+
+    path = os.path.join(static_dir, 'css', 'style.css')
+    with open(path, 'a') as f:
+        f.write('a { color: blue; }\n')
+    os.utime(path, (0, 0))  # make sure the modification time changes
+    assert assets.version(directory=static_dir, filename='css/style.css') != version
+
+    assert assets.version(directory=static_dir, filename='missing.css') is None
+    assert assets.version(directory=static_dir, filename='../outside.css') is None
+
+
+def test_compress():
+    """Tests that compression is deterministic"""
+    data = b'RetroArcher' * 100
+    assert assets.compress(data=data, encoding='gzip') == assets.compress(data=data, encoding='gzip')
+    assert gzip.decompress(assets.compress(data=data, encoding='gzip')) == data
+
+
+def test_compress_directory(static_dir):
+    """Tests writing sidecar files"""
+    written = assets.compress_directory(directory=static_dir)
+    path = os.path.join(static_dir, 'css', 'style.css')
+
+    assert path + '.gz' in written
+    assert os.path.join(static_dir, 'video.mp4.gz') not in written
+    with open(path + '.gz', 'rb') as f, open(path, 'rb') as original:
+        assert gzip.decompress(f.read()) == original.read()
+
+    assert assets.compress_directory(directory=static_dir) == []  # sidecars are up to date
+
+
+def test_send_asset(static_dir):
+    """Tests the headers of compressed, uncompressed, and versioned assets"""
+    app = Flask(import_name=__name__)
+    version = assets.version(directory=static_dir, filename='css/style.css')
+
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = assets.send_asset(directory=static_dir, filename='css/style.css')
+        assert response.content_encoding == 'gzip'
+        assert response.get_etag() == (f'{version}-gzip', False)
+        assert 'Accept-Encoding' in response.vary
+        assert response.cache_control.no_cache
+
+    with app.test_request_context(query_string={'v': version}):
+        response = assets.send_asset(directory=static_dir, filename='css/style.css')
+        response.direct_passthrough = False
+        assert response.content_encoding is None
+        with open(os.path.join(static_dir, 'css', 'style.css'), 'rb') as f:
+            assert response.get_data() == f.read()
+        assert response.cache_control.immutable
+        assert response.cache_control.max_age == assets.immutable_max_age
+
+    with app.test_request_context(headers={'Range': 'bytes=0-9'}):
+        response = assets.send_asset(directory=static_dir, filename='video.mp4')
+        assert response.status_code == 206
+        assert response.content_range.start == 0
+        assert response.content_range.stop == 10
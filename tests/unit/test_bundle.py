@@ -0,0 +1,83 @@
+"""
+..
+   test_bundle.py
+
+Unit tests for pyra.bundle.
+"""
+# standard imports
+import gzip
+
+# lib imports
+from flask import Flask
+import pytest
+from werkzeug.exceptions import NotFound
+
+# local imports
+from pyra import bundle
+
+
+@pytest.fixture(scope='function')
+def docs_dir(tmp_path):
+    """Create a directory of html documentation"""
+    html = tmp_path / 'html'
+    (html / '_static').mkdir(parents=True)
+    (html / 'index.html').write_text('<html><body>RetroArcher</body></html>\n' * 50)
+    (html / '_static' / 'logo.png').write_bytes(b'\x89PNG\r\n\x1a\n')
+    return html
+
+
+def test_create_bundle(docs_dir, tmp_path):
+    """Tests packing a directory and reading it back"""
+    path = str(tmp_path / 'docs.bundle')
+    assert bundle.create_bundle(directory=str(docs_dir), path=path) == 2
+
+    docs_bundle = bundle.Bundle(path=path)
+    assert docs_bundle.available
+
+    entry = docs_bundle.get(name='index.html')
+    assert entry.mimetype == 'text/html'
+    assert docs_bundle.read(entry=entry) == (docs_dir / 'index.html').read_bytes()
+    assert gzip.decompress(docs_bundle.read(entry=entry, gzip=True)) == (docs_dir / 'index.html').read_bytes()
+
+    entry = docs_bundle.get(name='_static/logo.png')
+    assert entry.gzip_length == 0
+    assert docs_bundle.read(entry=entry) == b'\x89PNG\r\n\x1a\n'
+
+    assert docs_bundle.get(name='missing.html') is None
+    docs_bundle.close()
+
+
+def test_bundle_unavailable(tmp_path):
+    """Tests that a missing or invalid bundle is unavailable"""
+    assert not bundle.Bundle(path=str(tmp_path / 'missing.bundle')).available
+
+    path = tmp_path / 'invalid.bundle'
+    path.write_bytes(b'not a bundle')
+    invalid_bundle = bundle.Bundle(path=str(path))
+    assert not invalid_bundle.available
+    assert invalid_bundle.get(name='index.html') is None
+
+
+def test_send_bundled(docs_dir, tmp_path):
+    """Tests the responses of bundled files"""
+    path = str(tmp_path / 'docs.bundle')
+    bundle.create_bundle(directory=str(docs_dir), path=path)
+    docs_bundle = bundle.Bundle(path=path)
+    app = Flask(import_name=__name__)
+
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = bundle.send_bundled(bundle=docs_bundle, filename='')
+        assert response.status_code == 200
+        assert response.content_encoding == 'gzip'
+        etag = response.get_etag()[0]
+
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{etag}"'}):
+        assert bundle.send_bundled(bundle=docs_bundle, filename='index.html').status_code == 304
+
+    with app.test_request_context():
+        response = bundle.send_bundled(bundle=docs_bundle, filename='_static/logo.png')
+        assert response.mimetype == 'image/png'
+        assert response.content_encoding is None
+
+        with pytest.raises(NotFound):
+            bundle.send_bundled(bundle=docs_bundle, filename='../config.ini')
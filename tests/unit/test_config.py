@@ -5,6 +5,7 @@
 Unit tests for pyra.config.
 """
 # standard imports
+import os
 import time
 
 # lib imports
@@ -43,6 +44,185 @@ def test_convert_config():
     assert isinstance(result, list)
 
 
+def test_compile_spec():
+    """Tests that the config spec is compiled once"""
+    compiled = config.compile_spec()
+    assert compiled is config.compile_spec()
+    assert compiled.configspec == config.convert_config()
+
+    assert 'HTTP_PORT' in compiled.sections['Network']
+    assert compiled.limits[('Network', 'HTTP_PORT')] == (21, 65535)
+    assert compiled.options[('General', 'LOCALE')] == ('en', 'es')
+    assert compiled.on_change[('General', 'SYSTEM_TRAY')] is config.on_change_tray_toggle
+
+
+def test_compiled_spec_coerce():
+    """Tests converting values from the web ui to the type of each setting"""
+    compiled = config.compile_spec()
+
+    assert compiled.coerce(section='Network', key='HTTP_PORT', value='9696') == 9696
+    assert compiled.coerce(section='General', key='LAUNCH_BROWSER', value='False') is False
+    assert compiled.coerce(section='General', key='LOCALE', value='es') == 'es'
+
+    with pytest.raises(ValueError):
+        compiled.coerce(section='General', key='LAUNCH_BROWSER', value='maybe')
+    with pytest.raises(KeyError):
+        compiled.coerce(section='General', key='UNKNOWN', value='1')
+
+
+def test_compiled_spec_validate():
+    """Tests validating the value of a single setting"""
+    compiled = config.compile_spec()
+
+    assert compiled.validate(section='Network', key='HTTP_PORT', value='80') == 80
+    assert compiled.validate(section='General', key='LOCALE', value='es') == 'es'
+
+    invalid = [('Network', 'HTTP_PORT', '1'), ('General', 'LOCALE', 'xx'), ('Network', 'HTTP_PORT', 'a')]
+    for section, key, value in invalid:
+        with pytest.raises(ValueError):
+            compiled.validate(section=section, key=key, value=value)
+
+
+@pytest.fixture(scope='function')
+def tmp_config(tmp_path):
+    """Create a config in a temporary directory"""
+    yield config.create_config(config_file=str(tmp_path / 'config.ini'), config_spec=dict(config._CONFIG_SPEC_DICT))
+
+
+def test_transaction(tmp_config):
+    """Tests committing valid changes"""
+    transaction = config.Transaction(config=tmp_config)
+    assert transaction.set(section='Network', key='HTTP_PORT', value='9697')
+    assert transaction.set(section='General', key='LOCALE', value='en')  # unchanged
+
+    assert transaction.commit() == {('Network', 'HTTP_PORT'): 9696}
+    assert tmp_config['Network']['HTTP_PORT'] == 9697
+
+    with open(tmp_config.filename) as f:
+        assert 'HTTP_PORT = 9697' in f.read()
+    assert os.listdir(os.path.dirname(tmp_config.filename)) == ['config.ini']  # no temporary files are left
+
+
+def test_transaction_unchanged(tmp_config):
+    """Tests that the config file is not written if nothing changed"""
+    os.utime(tmp_config.filename, (0, 0))
+
+    transaction = config.Transaction(config=tmp_config)
+    transaction.set(section='Network', key='HTTP_PORT', value=str(tmp_config['Network']['HTTP_PORT']))
+    assert transaction.commit() == {}
+
+    assert os.path.getmtime(tmp_config.filename) == 0
+
+
+def test_transaction_invalid(tmp_config):
+    """Tests that nothing is applied if any value is invalid"""
+    transaction = config.Transaction(config=tmp_config)
+    assert transaction.set(section='Network', key='HTTP_THREADS', value='32')
+    assert not transaction.set(section='Network', key='HTTP_PORT', value='1')
+    assert not transaction.set(section='Network', key='UNKNOWN', value='1')
+    assert set(transaction.errors) == {('Network', 'HTTP_PORT'), ('Network', 'UNKNOWN')}
+
+    with pytest.raises(ValueError):
+        transaction.commit()
+    assert tmp_config['Network']['HTTP_THREADS'] == 16
+
+
+def test_transaction_write_failure(tmp_config, monkeypatch):
+    """Tests that the config is restored if the file cannot be written"""
+    def write_atomic(config):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(config, '_write_atomic', write_atomic)
+
+    transaction = config.Transaction(config=tmp_config)
+    transaction.set(section='Network', key='HTTP_PORT', value='9697')
+    with pytest.raises(OSError):
+        transaction.commit()
+    assert tmp_config['Network']['HTTP_PORT'] == 9696
+
+
+def test_change_bus():
+    """Tests that changes are coalesced and delivered to matching subscribers"""
+    bus = config.ChangeBus()
+    received = []
+    bus.subscribe(pattern='Network.*', callback=received.append, debounce=10)
+
+    bus.publish(changes={('Network', 'HTTP_PORT'): 9697, ('Logging', 'DEBUG_LOGGING'): False})
+    bus.publish(changes={('Network', 'HTTP_PORT'): 9698, ('Network', 'HTTP_THREADS'): 8})
+    time.sleep(0.1)
+    assert received == []  # still debouncing
+
+    assert bus.flush(timeout=5)
+    assert received == [{('Network', 'HTTP_PORT'): 9698, ('Network', 'HTTP_THREADS'): 8}]
+
+    bus.stop(timeout=5)
+
+
+def test_change_bus_worker():
+    """Tests that publishing does not wait for subscribers, and that a failing subscriber does not affect others"""
+    bus = config.ChangeBus()
+    received = []
+
+    def slow(changes):
+        time.sleep(0.5)
+        received.append(changes)
+
+    def failing(changes):
+        raise RuntimeError('subscriber error')
+
+    bus.subscribe(pattern='*', callback=failing, debounce=0)
+    subscription = bus.subscribe(pattern='General.*', callback=slow, debounce=0)
+    assert bus.subscribe(pattern='General.*', callback=slow, debounce=0) is subscription
+
+    start = time.monotonic()
+    bus.publish(changes={('General', 'LOCALE'): 'es'})
+    assert time.monotonic() - start < 0.5
+
+    assert bus.flush(timeout=5)
+    assert received == [{('General', 'LOCALE'): 'es'}]
+
+    bus.unsubscribe(subscription=subscription)
+    bus.publish(changes={('General', 'LOCALE'): 'en'})
+    assert bus.flush(timeout=5)
+    assert len(received) == 1
+
+    bus.stop(timeout=5)
+
+
+def test_transaction_publish(test_config_object):
+    """Tests that committed changes of the config are published"""
+    received = []
+    subscription = config.bus.subscribe(pattern='Network.HTTP_THREADS', callback=received.append, debounce=0)
+
+    for value in ['8', '16']:
+        transaction = config.Transaction()
+        transaction.set(section='Network', key='HTTP_THREADS', value=value)
+        transaction.commit()
+        assert config.bus.flush(timeout=5)
+
+    config.bus.unsubscribe(subscription=subscription)
+    assert received == [{('Network', 'HTTP_THREADS'): 8}, {('Network', 'HTTP_THREADS'): 16}]
+
+
+def test_reload_config(tmp_config):
+    """Tests applying only the valid settings changed in the file"""
+    with open(tmp_config.filename) as f:
+        content = f.read()
+    content = content.replace('HTTP_PORT = 9696', 'HTTP_PORT = 9697').replace('HTTP_THREADS = 16', 'HTTP_THREADS = 0')
+    content = content.replace('DEBUG_LOGGING = True\n', '')  # removed settings are reset to their default
+    with open(tmp_config.filename, 'w') as f:
+        f.write(content)
+
+    tmp_config['Logging']['DEBUG_LOGGING'] = False
+
+    assert config.reload_config(config=tmp_config) == {('Logging', 'DEBUG_LOGGING'): True,
+                                                       ('Network', 'HTTP_PORT'): 9697}
+    assert tmp_config['Network']['HTTP_PORT'] == 9697
+    assert tmp_config['Network']['HTTP_THREADS'] == 16  # the invalid value is ignored
+
+    assert config.reload_config(config=tmp_config) == {}  # nothing changed since the last reload
+
+
 def test_on_change_tray_toggle():
     """Tests the on_change_tray_toggle function"""
     from pyra import tray_icon
@@ -57,5 +57,6 @@ def test_paths():
     assert paths.DATA_DIR
     assert paths.BINARY_PATH
     assert paths.DOCS_DIR
+    assert paths.DOCS_BUNDLE
     assert paths.LOCALE_DIR
     assert paths.LOG_DIR
@@ -0,0 +1,91 @@
+"""
+..
+   test_gpu.py
+
+Unit tests for pyra.gpu.
+"""
+# standard imports
+import os
+import sys
+import time
+
+# lib imports
+import pytest
+
+# local imports
+from pyra import gpu
+
+recording = [
+    '0, NVIDIA GeForce RTX 3080, 12',
+    '1, NVIDIA GeForce GTX 1080, [N/A]',
+    '0, NVIDIA GeForce RTX 3080, 55',
+    '1, NVIDIA GeForce GTX 1080, 150',
+    'invalid line',
+]
+
+
+def test_parse_smi_line():
+    """Tests parsing lines of nvidia-smi output"""
+    assert gpu.parse_smi_line(line='0, NVIDIA GeForce RTX 3080, 12\n') == (0, 'NVIDIA GeForce RTX 3080', 12.0)
+    assert gpu.parse_smi_line(line='1, Tesla T4, Rev. A, [N/A]') == (1, 'Tesla T4, Rev. A', None)
+    assert gpu.parse_smi_line(line='0, Tesla T4, 101') == (0, 'Tesla T4', 100.0)
+    assert gpu.parse_smi_line(line='invalid line') is None
+    assert gpu.parse_smi_line(line='index, name, utilization.gpu') is None
+
+
+def test_fake_backend():
+    """Tests that the fake backend replays each recorded sample, then starts over"""
+    backend = gpu.FakeBackend(lines=recording)
+
+    assert backend.read() == [('NVIDIA GeForce RTX 3080-0', 12.0), ('NVIDIA GeForce GTX 1080-1', None)]
+    assert backend.read() == [('NVIDIA GeForce RTX 3080-0', 55.0), ('NVIDIA GeForce GTX 1080-1', 100.0)]
+    assert backend.read()[0] == ('NVIDIA GeForce RTX 3080-0', 12.0)
+
+    with pytest.raises(ValueError):
+        gpu.FakeBackend(lines=['invalid line'])
+
+
+def test_collector():
+    """Tests that the collector combines all backends and skips backends that fail"""
+    class BrokenBackend(gpu.GpuBackend):
+        def read(self):
+            raise RuntimeError('test')
+
+    collector = gpu.GpuCollector(backends=[None, BrokenBackend(), gpu.FakeBackend(lines=recording[:1])])
+    assert len(collector.backends) == 2
+    assert collector.read() == [('NVIDIA GeForce RTX 3080-0', 12.0)]
+
+    collector.close()
+    assert collector.backends == []
+
+
+def test_collector_throughput():
+    """Tests that reading a sample is a cheap in-process operation"""
+    collector = gpu.GpuCollector(backends=[gpu.FakeBackend(lines=recording)])
+
+    samples = 10000
+    start = time.perf_counter()
+    for _ in range(samples):
+        collector.read()
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 5  # spawning nvidia-smi takes tens of milliseconds per sample
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='requires a shell script')
+def test_smi_backend(tmp_path):
+    """Tests that the nvidia-smi backend parses the output of a long-lived subprocess"""
+    executable = os.path.join(tmp_path, 'nvidia-smi')
+    with open(executable, 'w') as f:
+        f.write('#!/bin/sh\necho "0, NVIDIA GeForce RTX 3080, 42"\nexec sleep 30\n')
+    os.chmod(executable, 0o755)
+
+    backend = gpu.SmiBackend(executable=executable)
+    try:
+        deadline = time.monotonic() + 5
+        while not backend.read() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert backend.read() == [('NVIDIA GeForce RTX 3080-0', 42.0)]
+    finally:
+        backend.close()
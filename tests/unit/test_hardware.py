@@ -4,11 +4,19 @@
 
 Unit tests for pyra.hardware.py.
 """
+# standard imports
+import json
+import os
+import threading
+
 # lib imports
 import pytest
 
 # local imports
+from pyra import config
 from pyra import hardware
+from pyra import history
+from pyra import timeseries
 
 
 def test_update():
@@ -117,6 +125,205 @@ def test_chart_data():
         assert x['config']
 
 
+def test_chart_data_absolute_time():
+    """
+    Test the chart_data function with absolute times.
+
+    Validates that the X axis uses dates.
+    """
+    chart_data = hardware.chart_data(absolute_time=True)
+
+    for x in chart_data['graphs']:
+        assert x['layout']['xaxis']['type'] == 'date'
+
+
+@pytest.fixture(scope='function')
+def test_dash_stats(monkeypatch):
+    """Replace the dashboard store with a small store holding known values"""
+    test_dash_stats = timeseries.TimeSeriesStore(
+        capacity=5,
+        series=dict(
+            cpu=['system'],
+            gpu=[],
+            memory=['system'],
+            network=['sent', 'received'],
+        )
+    )
+    monkeypatch.setattr(hardware, 'dash_stats', test_dash_stats)
+
+    yield test_dash_stats
+
+
+def _record_row(store: timeseries.TimeSeriesStore, timestamp: int, value: float):
+    """Append a row with the same value for every series in the store"""
+    store.advance(timestamp=timestamp)
+    for group, series_group in store.items():
+        for key in series_group:
+            store.record(group=group, key=key, value=value)
+
+
+def test_chart_delta(test_dash_stats):
+    """
+    Test the chart_delta function.
+
+    Validates that the full charts are returned for the first request, and only new values after that.
+    """
+    _record_row(store=test_dash_stats, timestamp=1000, value=10)
+
+    chart_delta = hardware.chart_delta(since=0)
+    assert chart_delta['reset'] is True
+    assert chart_delta['since'] == 0
+    assert isinstance(chart_delta['graphs'], list)
+    for graph in chart_delta['graphs']:
+        for trace in graph['data']:
+            assert trace['x'] == [1000000]  # milliseconds since the epoch
+
+    seq = chart_delta['seq']
+    _record_row(store=test_dash_stats, timestamp=1001, value=20)
+
+    chart_delta = hardware.chart_delta(since=seq)
+    assert chart_delta['reset'] is False
+    assert chart_delta['since'] == seq
+    assert chart_delta['seq'] == seq + 1
+    assert chart_delta['max_points'] == 5
+
+    assert [update['id'] for update in chart_delta['updates']] == ['chart-cpu', 'chart-memory', 'chart-network']
+    for update in chart_delta['updates']:
+        assert len(update['x']) == len(update['y'])
+        for x in update['x']:
+            assert x == [1001000]
+        for y in update['y']:
+            assert y == [20]
+
+    # a sequence number from the future forces a reset
+    chart_delta = hardware.chart_delta(since=test_dash_stats.seq + 10)
+    assert chart_delta['reset'] is True
+
+    # a series created after the sequence number forces a reset
+    seq = test_dash_stats.seq
+    _record_row(store=test_dash_stats, timestamp=1002, value=30)
+    test_dash_stats.record(group='cpu', key='test-process', value=5)
+
+    chart_delta = hardware.chart_delta(since=seq)
+    assert chart_delta['reset'] is True
+
+
+def test_update_system(test_dash_stats, monkeypatch):
+    """
+    Test the update_system function.
+
+    Validates that the held process and gpu values are recorded with the system values in a single row.
+    """
+    monkeypatch.setattr(hardware, 'initialized', True)
+    monkeypatch.setattr(hardware, '_process_stats', [('test-process', 5, 10)])
+    monkeypatch.setattr(hardware, '_gpu_loads', [('test-gpu', 50)])
+
+    hardware.update_system()
+    hardware.update_system()  # held values are repeated until sampled again
+
+    assert test_dash_stats.length == 2
+    assert test_dash_stats['cpu']['test-process'].values().tolist() == [5, 5]
+    assert test_dash_stats['memory']['test-process'].values().tolist() == [10, 10]
+    assert test_dash_stats['gpu']['test-gpu'].values().tolist() == [50, 50]
+    assert test_dash_stats['cpu']['system'][-1] is not None
+
+
+def test_history_data(monkeypatch):
+    """
+    Test the history_data function.
+
+    Validates that the resolution is picked for the requested period of time.
+    """
+    metrics_history = history.MetricsHistory()
+    monkeypatch.setattr(hardware, 'metrics_history', metrics_history)
+    monkeypatch.setattr(hardware.helpers, 'timestamp', lambda: 1000)
+
+    for timestamp in range(900, 1000):
+        metrics_history.add(timestamp=timestamp, values={('cpu', 'system'): 10, ('gpu', 'test-0'): 50})
+
+    data = hardware.history_data(metric='cpu.system', duration=60)
+    assert data['metric'] == 'cpu.system'
+    assert data['range'] == 60
+    assert data['step'] == 1
+    assert len(data['x']) == 59  # the current second is still being accumulated
+
+    data = hardware.history_data(metric='gpu.test-0', duration=3600)
+    assert data['step'] == 10
+    assert data['avg'] == [50] * 9
+
+    with pytest.raises(KeyError):
+        hardware.history_data(metric='cpu', duration=60)
+
+
+def test_load_history(tmp_path, monkeypatch):
+    """
+    Test the load_history and save_history functions.
+
+    Validates that the stores are backed by files in the given directory.
+    """
+    monkeypatch.setattr(hardware, 'dash_stats', hardware.dash_stats)
+    monkeypatch.setattr(hardware, 'metrics_history', hardware.metrics_history)
+
+    hardware.load_history(directory=str(tmp_path))
+    assert isinstance(hardware.dash_stats, timeseries.MappedTimeSeriesStore)
+    assert hardware.dash_stats.capacity == hardware.history_length + 1
+    assert 'system' in hardware.dash_stats['cpu']
+
+    hardware.dash_stats.advance(timestamp=1000)
+    hardware.dash_stats.record(group='cpu', key='system', value=10)
+    hardware.save_history()
+
+    assert timeseries.read_header(path=os.path.join(tmp_path, 'dashboard.dat'))['seq'] == 1
+    assert os.path.isfile(os.path.join(tmp_path, 'history-60s-avg.dat'))
+
+
+def test_start_sampler(test_config_object, monkeypatch):
+    """
+    Test the start_sampler function.
+
+    Validates that a sampler is started with a task for each type of stat.
+    """
+    updated = threading.Event()
+    monkeypatch.setattr(hardware, 'update_system', lambda: None)
+
+    hardware_sampler = hardware.start_sampler(on_update=updated.set)
+    try:
+        assert updated.wait(timeout=5)
+    finally:
+        hardware_sampler.stop()
+
+    assert hardware.hardware_sampler is hardware_sampler
+    assert list(hardware_sampler.stats()) == ['processes', 'gpu', 'system']
+    assert hardware_sampler.stats()['system']['interval'] == test_config_object['Hardware']['CPU_INTERVAL']
+
+    # interval changes are applied without restarting the sampler
+    config.bus.publish(changes={('Hardware', 'GPU_INTERVAL'): 7})
+    assert config.bus.flush(timeout=5)
+    assert hardware_sampler.stats()['gpu']['interval'] == 7
+
+
+def test_chart_data_json(test_dash_stats):
+    """
+    Test the chart_data_json function.
+
+    Validates that the encoded data matches chart_data, and that the static parts of the charts are cached.
+    """
+    _record_row(store=test_dash_stats, timestamp=1000, value=10)
+
+    for absolute_time in [True, False]:
+        assert json.loads(hardware.chart_data_json(absolute_time=absolute_time)) == \
+               hardware.chart_data(absolute_time=absolute_time)
+
+    layout = hardware.chart_data()['graphs'][0]['layout']
+    assert hardware.chart_data()['graphs'][0]['layout'] is layout  # cached
+
+    # a new series builds a new template
+    test_dash_stats.record(group='cpu', key='test-process', value=5)
+    graph = hardware.chart_data()['graphs'][0]
+    assert [trace['name'] for trace in graph['data']][-1] == 'test-process'
+    assert json.loads(hardware.chart_data_json()) == hardware.chart_data()
+
+
 def test_chart_types():
     """
     Test the chart_types function.
@@ -131,3 +338,34 @@ def test_chart_types():
 
     if hardware.nvidia_gpus or hardware.amd_gpus:
         assert 'gpu' in chart_types
+
+
+def test_prometheus_metrics(test_dash_stats):
+    """
+    Test the prometheus_metrics function.
+
+    Validates that the newest values are exposed with escaped labels.
+    """
+    test_dash_stats.advance(timestamp=1000)
+    test_dash_stats.record(group='cpu', key='RetroArcher', value=2)
+    test_dash_stats.record(group='cpu', key='system', value=12.5)
+    test_dash_stats.record(group='gpu', key='Test "GPU"-0', value=50)
+    test_dash_stats.record(group='memory', key='system', value=40)
+    test_dash_stats.record(group='memory', key='RetroArcher', value=None)
+    test_dash_stats.record(group='network', key='received', value=1.5)
+    test_dash_stats.record(group='network', key='sent', value=0.25)
+
+    lines = hardware.prometheus_metrics().splitlines()
+
+    assert 'retroarcher_last_sample_timestamp_seconds 1000' in lines
+    assert 'retroarcher_cpu_usage_percent 12.5' in lines
+    assert 'retroarcher_memory_usage_percent 40' in lines
+    assert 'retroarcher_gpu_load_percent{gpu="Test \\"GPU\\"-0"} 50' in lines
+    assert 'retroarcher_network_received_megabytes 1.5' in lines
+    assert 'retroarcher_network_sent_megabytes 0.25' in lines
+    assert 'retroarcher_process_cpu_percent{process="RetroArcher"} 2' in lines
+    assert '# TYPE retroarcher_network_sent_bytes_total counter' in lines
+
+    # missing values are omitted
+    assert not [line for line in lines if line.startswith('retroarcher_process_memory_percent')]
+    assert not [line for line in lines if 'process="system"' in line]
@@ -0,0 +1,99 @@
+"""
+..
+   test_history.py
+
+Unit tests for pyra.history.
+"""
+# lib imports
+import pytest
+
+# local imports
+from pyra import history
+
+
+def test_parse_duration():
+    """Tests parsing durations with and without units"""
+    assert history.parse_duration(duration='90') == 90
+    assert history.parse_duration(duration='15m') == 900
+    assert history.parse_duration(duration='12H') == 43200
+    assert history.parse_duration(duration='1w') == 604800
+
+    for duration in ['', '0', '-5', '1y', 'abc']:
+        with pytest.raises(ValueError):
+            history.parse_duration(duration=duration)
+
+
+def test_archive_consolidation():
+    """Tests that each completed step is stored as its average, minimum, and maximum"""
+    archive = history.Archive(step=10, rows=3)
+
+    for timestamp, value in [(100, 10), (105, 30), (109, None), (110, 50), (125, 70)]:
+        archive.add(timestamp=timestamp, values={('cpu', 'system'): value})
+
+    data = archive.query(group='cpu', key='system')
+    assert data == dict(step=10, x=[100000, 110000], avg=[20, 50], min=[10, 50], max=[30, 50])
+
+    assert archive.query(group='cpu', key='unknown')['x'] == []
+
+
+def test_archive_constant_memory():
+    """Tests that the oldest rows are overwritten once the archive is full"""
+    archive = history.Archive(step=1, rows=3)
+
+    for timestamp in range(10):
+        archive.add(timestamp=timestamp, values={('cpu', 'system'): timestamp})
+
+    data = archive.query(group='cpu', key='system')
+    assert data['avg'] == [6, 7, 8]
+    assert archive.stores['avg'].capacity == 3
+
+    assert archive.query(group='cpu', key='system', start=8)['avg'] == [8]
+
+
+def test_history_select():
+    """Tests that the finest archive covering the requested period is used"""
+    metrics_history = history.MetricsHistory()
+    assert metrics_history.select(duration=60).step == 1
+    assert metrics_history.select(duration=120).step == 1
+    assert metrics_history.select(duration=3600).step == 10
+    assert metrics_history.select(duration=86400).step == 60
+    assert metrics_history.select(duration=10 * 604800).step == 60
+
+
+def test_history_query():
+    """Tests querying metrics at different resolutions"""
+    metrics_history = history.MetricsHistory(archives=((1, 10), (10, 100)))
+
+    for timestamp in range(1000, 1030):
+        metrics_history.add(timestamp=timestamp, values={('cpu', 'system'): timestamp % 10, ('gpu', 'test'): None})
+
+    assert metrics_history.metrics() == [('cpu', 'system')]
+
+    data = metrics_history.query(group='cpu', key='system', duration=5, now=1029)
+    assert data['step'] == 1
+    assert data['avg'] == [4, 5, 6, 7, 8]
+
+    data = metrics_history.query(group='cpu', key='system', duration=100, now=1029)
+    assert data['step'] == 10
+    assert data['x'] == [1000000, 1010000]
+    assert data['min'] == [0, 0]
+    assert data['max'] == [9, 9]
+
+    with pytest.raises(KeyError):
+        metrics_history.query(group='gpu', key='test', duration=5, now=1029)
+
+
+def test_history_directory(tmp_path):
+    """Tests that the history stored in a directory is loaded again"""
+    metrics_history = history.MetricsHistory(archives=((1, 10), (10, 100)), directory=str(tmp_path))
+
+    for timestamp in range(1000, 1030):
+        metrics_history.add(timestamp=timestamp, values={('cpu', 'system'): 5})
+    metrics_history.save()
+
+    metrics_history = history.MetricsHistory(archives=((1, 10), (10, 100)), directory=str(tmp_path))
+    assert metrics_history.metrics() == [('cpu', 'system')]
+
+    data = metrics_history.query(group='cpu', key='system', duration=100, now=1029)
+    assert data['x'] == [1000000, 1010000]
+    assert data['avg'] == [5, 5]
@@ -5,10 +5,37 @@
 Unit tests for pyra.locales.py.
 """
 # standard imports
-import inspect
+import json
+import os
+import shutil
+import time
+
+# lib imports
+import pytest
 
 # local imports
 from pyra import locales
+from pyra.definitions import Paths
+
+
+@pytest.fixture(scope='function')
+def locale_dir(tmp_path, monkeypatch):
+    """Use a copy of the spanish source catalog, without a compiled catalog"""
+    directory = os.path.join(tmp_path, 'es', 'LC_MESSAGES')
+    os.makedirs(directory)
+    shutil.copy(os.path.join(Paths.LOCALE_DIR, 'es', 'LC_MESSAGES', 'retroarcher.po'), directory)
+
+    monkeypatch.setattr(Paths, 'LOCALE_DIR', str(tmp_path))
+    monkeypatch.setattr(locales, '_catalogs', {})
+    monkeypatch.setattr(locales, '_compiling', set())
+    yield directory
+
+
+def wait_for_catalog(locale: str, timeout: float = 10):
+    """Wait for a catalog compiled in the background"""
+    end = time.monotonic() + timeout
+    while locale in locales._compiling and time.monotonic() < end:
+        time.sleep(0.05)
 
 
 def test_get_all_locales():
@@ -20,6 +47,37 @@ def test_get_all_locales():
     assert test_locales['en_US']
 
 
+def test_locale_index(tmp_path, monkeypatch):
+    """Tests that the locale names are saved to an index, then read from it"""
+    monkeypatch.setattr(Paths, 'LOCALE_DIR', str(tmp_path))
+    monkeypatch.setattr(locales, '_locale_names', None)
+
+    test_locales = locales.get_all_locales()
+    with open(os.path.join(tmp_path, 'locales.json'), encoding='utf-8') as f:
+        index = json.load(f)
+    assert index['locales'] == test_locales
+
+    index['locales'] = dict(en='English (index)')
+    with open(os.path.join(tmp_path, 'locales.json'), 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+
+    assert locales.get_all_locales() == test_locales  # kept in memory
+    monkeypatch.setattr(locales, '_locale_names', None)
+    assert locales.get_all_locales() == dict(en='English (index)')
+
+    index['babel'] = '0.0.0'  # rebuilt after babel is updated
+    with open(os.path.join(tmp_path, 'locales.json'), 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    monkeypatch.setattr(locales, '_locale_names', None)
+    assert locales.get_all_locales() == test_locales
+
+
+def test_get_installed_locales(locale_dir):
+    """Tests that only locales with a catalog are listed"""
+    os.makedirs(os.path.join(Paths.LOCALE_DIR, 'fr', 'LC_MESSAGES'))  # without a catalog
+    assert locales.get_installed_locales() == dict(es='español')
+
+
 def test_get_locale():
     locale = locales.get_locale()
     assert locale == 'en'
@@ -29,4 +87,42 @@ def test_get_text():
     get_text = locales.get_text()
     assert get_text
 
-    assert inspect.ismethod(get_text)  # ensure get_text is a method
+    assert callable(get_text)
+    assert get_text('Home') == 'Home'
+
+
+def test_get_translations(locale_dir):
+    """Tests that a missing catalog is compiled in the background, then loaded once"""
+    assert locales.translate('Home') == 'Home'
+    with locales.use_locale(locale='es'):
+        locales.translate('Home')  # starts compiling the catalog
+        wait_for_catalog(locale='es')
+
+        assert os.path.isfile(os.path.join(locale_dir, 'retroarcher.mo'))
+        assert locales.translate('Home') == 'Inicio'
+        assert locales.get_translations() is locales.get_translations(locale='es')
+
+    assert locales.get_locale() == 'en'
+    assert locales.translate('Home') == 'Home'
+
+
+def test_compile_catalog_missing(locale_dir):
+    """Tests a locale without a source catalog"""
+    assert not locales.compile_catalog(locale='fr')
+    assert locales.translate('Home') == 'Home'
+
+
+def test_lazy_gettext(locale_dir):
+    """Tests that lazy strings are translated each time they are used"""
+    locales.compile_catalog(locale='es')
+
+    home = locales.lazy_gettext('Home')
+    assert str(home) == 'Home'
+    with locales.use_locale(locale='es'):
+        assert str(home) == 'Inicio'
+        assert home == 'Inicio'
+        assert f'{home}!' == 'Inicio!'
+        assert home + '!' == 'Inicio!'
+        assert len(home) == 6
+
+    assert locales.lazy_gettext('Open %(app_name)s') % {'app_name': 'test'} == 'Open test'
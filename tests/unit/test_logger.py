@@ -5,9 +5,16 @@
 Unit tests for pyra.logger.py.
 """
 # standard imports
+import gzip
 import logging
+import os
+import queue
+
+# lib imports
+import pytest
 
 # local imports
+import pyra
 from pyra import logger
 
 
@@ -16,9 +23,40 @@ def test_blacklist_config():
     pass
 
 
-def test_filers():
-    # todo
-    pass
+@pytest.mark.parametrize('text, expected', [
+    ('Testing 172.1.7.5', 'Testing ***.***.***.***'),
+    ('Testing 192.168.1.10', 'Testing 192.168.1.10'),
+    ('https://172-1-7-5.abcdef.plex.direct', 'https://***-***-***-***.abcdef.plex.direct'),
+    ('Testing 999.1.1.1', 'Testing 999.1.1.1'),
+    ('Sending to Example@Example.com', 'Sending to ****************@********'),
+    ('/library?X-Plex-Token=5FBCvHo9vFf9erz8ssLQ', '/library?X-Plex-Token=****************'),
+    ('/library?X-Plex-Token%3D5FBCvHo9vFf9erz8ssLQ', '/library?X-Plex-Token%3D****************'),
+    ('password is hunter22 and hunter2222', 'password is **************** and ****************'),
+])
+def test_redactor(text, expected):
+    """Test that sensitive values are redacted in a single pass"""
+    redactor = logger.Redactor(words=['hunter22', 'hunter2222'])
+    assert redactor.redact(text=text) == expected
+
+
+def test_redaction_filter(monkeypatch):
+    """Test that the merged message is redacted once, and only if the blacklist is enabled"""
+    monkeypatch.setattr(logger, '_redactor', logger.Redactor(words=['hunter22']))
+    redaction_filter = logger.RedactionFilter()
+
+    monkeypatch.setattr(logger, 'LOG_BLACKLIST', [])
+    record = logging.makeLogRecord(dict(msg='password %s', args=('hunter22',)))
+    assert redaction_filter.filter(record=record)
+    assert record.getMessage() == 'password hunter22'
+
+    monkeypatch.setattr(logger, 'LOG_BLACKLIST', [True])
+    assert redaction_filter.filter(record=record)
+    assert record.getMessage() == 'password ****************'
+    assert record.redacted
+
+    record.msg = 'hunter22'  # already redacted records are not scanned again
+    assert redaction_filter.filter(record=record)
+    assert record.msg == 'hunter22'
 
 
 def test_listener():
@@ -37,9 +75,58 @@ def test_get_logger():
     assert isinstance(log, logging.Logger)
 
 
-def test_setup_loggers():
-    # todo
-    pass
+@pytest.fixture(scope='function')
+def log_dir(tmp_path, monkeypatch):
+    """Set up the loggers in a temporary log directory, and restore them afterwards"""
+    monkeypatch.setattr(logger.definitions.Paths, 'LOG_DIR', str(tmp_path))
+    monkeypatch.setattr(logger, 'routes', dict(logger.routes))
+
+    yield tmp_path
+
+    monkeypatch.undo()
+    logger.setup_loggers()
+
+
+def test_setup_loggers(log_dir):
+    """Test that one set of handlers is shared by all loggers, and setting up again is a no-op"""
+    logger.setup_loggers()
+    handlers = dict(logger._async_handlers)
+
+    assert sorted(handlers) == sorted(set(logger.routes.values()))
+    assert sorted(os.listdir(log_dir)) == sorted([f'{name}.log' for name in handlers] + ['pyra.jsonl'])
+
+    # module loggers have no handlers, their records propagate to the routed logger
+    module_logger = logger.get_logger(name='pyra.webapp')
+    assert module_logger.handlers == []
+    assert module_logger.propagate
+    routed_handlers = logger.get_logger(name='pyra').handlers
+    assert [handler for handler in routed_handlers if isinstance(handler, logger.AsyncHandler)] == [handlers['pyra']]
+
+    logger.setup_loggers()
+    assert logger._async_handlers == handlers
+
+    module_logger.info('routed to pyra.log')
+    assert logger.flush()
+    with open(os.path.join(log_dir, 'pyra.log')) as f:
+        assert 'routed to pyra.log' in f.read()
+
+
+def test_routes(log_dir):
+    """Test that a module can be logged to its own file"""
+    logger.routes['pyra.webapp'] = 'webapp'
+    logger.setup_loggers()
+
+    assert logger.route(name='pyra.webapp.views') == 'webapp'
+    assert logger.route(name='pyra.config') == 'pyra'
+    assert logger.route(name='unknown') is None
+
+    logger.get_logger(name='pyra.webapp').info('routed to webapp.log')
+    assert logger.flush()
+
+    with open(os.path.join(log_dir, 'webapp.log')) as f:
+        assert 'routed to webapp.log' in f.read()
+    with open(os.path.join(log_dir, 'pyra.log')) as f:
+        assert 'routed to webapp.log' not in f.read()
 
 
 def test_init_logger():
@@ -48,6 +135,162 @@ def test_init_logger():
     assert isinstance(log, logging.Logger)
 
 
+class ListHandler(logging.Handler):
+    """Collect the messages of the handled records."""
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_async_handler():
+    """Test that records are written by the background listener"""
+    target = ListHandler()
+    handler = logger.AsyncHandler(targets=[target])
+
+    if not logger._listener.running:
+        logger._listener.start()
+
+    value = ['original']
+    record = logging.makeLogRecord(dict(msg='message %s', args=(value,), levelno=logging.INFO))
+    handler.handle(record)
+    value[0] = 'changed'  # the message is merged when the record is enqueued
+
+    assert logger.flush()
+    assert target.messages == ["message ['original']"]
+
+
+def test_async_handler_levels():
+    """Test that the level of each target is respected"""
+    info = ListHandler()
+    info.setLevel(logging.INFO)
+    debug = ListHandler()
+    handler = logger.AsyncHandler(targets=[info, debug])
+
+    handler.handle(logging.makeLogRecord(dict(msg='debug', levelno=logging.DEBUG)))
+    assert logger.flush()
+
+    assert info.messages == []
+    assert debug.messages == ['debug']
+
+
+def test_async_handler_overflow(monkeypatch):
+    """Test that records are dropped and counted when the queue is full"""
+    full_queue = queue.Queue(maxsize=1)
+    full_queue.put_nowait(None)
+
+    target = ListHandler()
+    handler = logger.AsyncHandler(targets=[target])
+    handler.queue = full_queue
+    monkeypatch.setattr(logger._listener, 'running', True)
+
+    dropped = logger.queue_stats()['dropped']
+    handler.handle(logging.makeLogRecord(dict(msg='dropped', levelno=logging.INFO)))
+
+    assert logger.queue_stats()['dropped'] == dropped + 1
+    assert target.messages == []
+
+
+def test_async_handler_without_listener(monkeypatch):
+    """Test that records are written directly if the listener is not running"""
+    monkeypatch.setattr(logger._listener, 'running', False)
+
+    target = ListHandler()
+    logger.AsyncHandler(targets=[target]).handle(logging.makeLogRecord(dict(msg='direct', levelno=logging.INFO)))
+
+    assert target.messages == ['direct']
+
+
+def test_queue_stats():
+    """Test that the state of the log queue can be read"""
+    stats = logger.queue_stats()
+    assert stats['capacity'] == logger.QUEUE_SIZE
+    assert 0 <= stats['size'] <= stats['capacity']
+    assert stats['dropped'] >= 0
+
+
+def test_log_file_handler_size(tmp_path):
+    """Test that a log file is rotated by size and compressed in the background"""
+    path = os.path.join(tmp_path, 'pyra.log')
+    handler = logger.LogFileHandler(filename=path, max_bytes=100)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+
+    for index in range(7):  # rotated before the 4th and 7th records
+        handler.handle(logging.makeLogRecord(dict(msg=f'{index:040d}', levelno=logging.INFO)))
+    handler.close()
+    assert logger._compressor.wait(timeout=10)
+
+    segments = sorted(name for name in os.listdir(tmp_path) if name != 'pyra.log')
+    assert len(segments) == 2
+    assert all(name.startswith('pyra.log.') and name.endswith('.gz') for name in segments)
+
+    lines = []
+    for name in segments:
+        with gzip.open(os.path.join(tmp_path, name), 'rt') as f:
+            lines += f.read().splitlines()
+    with open(path) as f:
+        lines += f.read().splitlines()
+    assert sorted(lines) == [f'{index:040d}' for index in range(7)]
+
+
+def test_log_file_handler_interval(tmp_path):
+    """Test that a log file is rotated when its period ends"""
+    path = os.path.join(tmp_path, 'pyra.log')
+    handler = logger.LogFileHandler(filename=path, max_bytes=0, interval=3600)
+    record = logging.makeLogRecord(dict(msg='test', levelno=logging.INFO))
+
+    assert not handler.shouldRollover(record=record)  # empty files are not rotated
+    handler.handle(record)
+    assert not handler.shouldRollover(record=record)
+
+    record.created = handler.rollover_at
+    assert handler.shouldRollover(record=record)
+    handler.close()
+
+
+def test_compress_segments(tmp_path):
+    """Test that rotated log files are compressed, and the oldest are removed to stay below the retention size"""
+    for index, name in enumerate(['pyra.log.20220410-000000', 'werkzeug.log.20220411-000000', 'pyra.log.1']):
+        path = os.path.join(tmp_path, name)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(1000))  # not compressible
+        os.utime(path, (index, index))
+    with open(os.path.join(tmp_path, 'pyra.log'), 'wb') as f:
+        f.write(os.urandom(1000))
+
+    removed = logger.compress_segments(directory=str(tmp_path), retention=3500)
+
+    assert [os.path.basename(path) for path in removed] == ['pyra.log.20220410-000000.gz']
+    assert sorted(os.listdir(tmp_path)) == ['pyra.log', 'pyra.log.1.gz', 'werkzeug.log.20220411-000000.gz']
+
+
+def test_rotation_settings(monkeypatch):
+    """Test that the rotation settings are read from the config"""
+    monkeypatch.setattr(pyra, 'CONFIG', None)
+    assert logger.rotation_settings() == dict(max_bytes=logger.MAX_SIZE, interval=logger.ROTATE_INTERVAL,
+                                              retention=logger.RETENTION_SIZE)
+
+    monkeypatch.setattr(pyra, 'CONFIG', dict(Logging=dict(LOG_ROTATE_SIZE=1, LOG_ROTATE_INTERVAL=0,
+                                                          LOG_RETENTION_SIZE=10)))
+    assert logger.rotation_settings() == dict(max_bytes=1000000, interval=0, retention=10000000)
+
+
+def test_set_debug():
+    """Test that the level of the loggers can be changed"""
+    original = pyra.DEBUG
+
+    logger.set_debug(debug=False)
+    assert logging.getLogger(name='pyra.config').getEffectiveLevel() == logging.INFO
+
+    logger.set_debug(debug=True)
+    assert logging.getLogger(name='pyra.config').getEffectiveLevel() == logging.DEBUG
+    assert pyra.DEBUG is True
+
+    logger.set_debug(debug=original)
+
+
 def test_init_hooks():
     # todo
     pass
@@ -0,0 +1,166 @@
+"""
+..
+   test_logview.py
+
+Unit tests for pyra.logview.
+"""
+# standard imports
+import gzip
+import json
+import logging
+import os
+
+# lib imports
+import pytest
+
+# local imports
+from pyra import logview
+
+
+def make_record(msg: str, level: int = logging.INFO, name: str = 'pyra.webapp') -> logging.LogRecord:
+    """Create a log record"""
+    return logging.makeLogRecord(dict(msg=msg, levelno=level, levelname=logging.getLevelName(level), name=name))
+
+
+@pytest.fixture(scope='function')
+def ring(monkeypatch):
+    """Use an empty ring"""
+    log_ring = logview.LogRing(capacity=5)
+    monkeypatch.setattr(logview, 'ring', log_ring)
+    yield log_ring
+
+
+def write_jsonl(path, entries: list):
+    """Write records as json lines"""
+    with open(path, 'w') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+
+
+def test_to_entry():
+    """Tests the structured form of a record"""
+    entry = logview.to_entry(record=make_record(msg='test %s', level=logging.ERROR), seq=3)
+    assert entry['seq'] == 3
+    assert entry['level'] == 'ERROR'
+    assert entry['logger'] == 'pyra.webapp'
+
+    try:
+        raise ValueError('test')
+    except ValueError:
+        record = make_record(msg='failed')
+        record.exc_info = logging.sys.exc_info()
+    assert 'ValueError: test' in logview.to_entry(record=record)['exception']
+
+
+def test_log_ring(ring):
+    """Tests querying the ring by level, module, and sequence number"""
+    for index in range(4):
+        ring.add(record=make_record(msg=f'info {index}'))
+    ring.add(record=make_record(msg='error', level=logging.ERROR, name='pyra.config'))
+
+    entries, complete = ring.query()
+    assert [entry['seq'] for entry in entries] == [1, 2, 3, 4, 5]
+    assert complete == 1
+
+    entries, _complete = ring.query(level=logging.WARNING)
+    assert [entry['message'] for entry in entries] == ['error']
+
+    entries, _complete = ring.query(module='pyra.webapp', after=2, limit=1)
+    assert [entry['seq'] for entry in entries] == [3]
+
+    entries, _complete = ring.query(before=5, limit=2)
+    assert [entry['seq'] for entry in entries] == [3, 4]
+
+
+def test_log_ring_eviction(ring):
+    """Tests that each level and logger has its own ring"""
+    ring.add(record=make_record(msg='error', level=logging.ERROR))
+    for index in range(10):
+        ring.add(record=make_record(msg=f'debug {index}', level=logging.DEBUG))
+
+    entries, complete = ring.query()
+    assert [entry['seq'] for entry in entries] == [1, 7, 8, 9, 10, 11]
+    assert complete == 7
+
+    entries, complete = ring.query(level=logging.ERROR)
+    assert [entry['message'] for entry in entries] == ['error']
+    assert complete == 1
+
+
+def test_log_ring_resume(ring):
+    """Tests that sequence numbers continue after a previous run"""
+    ring.resume(seq=100)
+    assert ring.add(record=make_record(msg='test'))['seq'] == 101
+    assert ring.start == 101
+
+    ring.resume(seq=200)  # records were already added
+    assert ring.seq == 101
+
+
+def test_json_formatter(ring):
+    """Tests that records are formatted as compact json lines with the sequence number of the ring"""
+    record = make_record(msg='test')
+    logview.RingHandler(log_ring=ring).handle(record)
+
+    line = logview.JsonFormatter().format(record=record)
+    assert ' ' not in line.replace('pyra.webapp', '')
+    assert json.loads(line)['seq'] == 1
+
+
+def test_read_file_logs(tmp_path, monkeypatch):
+    """Tests reading records backwards and forwards across rotated and compressed files, using the index"""
+    monkeypatch.setattr(logview, 'INDEX_INTERVAL', 256)
+    monkeypatch.setattr(logview, 'BLOCK_SIZE', 100)
+
+    path = os.path.join(tmp_path, 'pyra.jsonl')
+    entries = [dict(seq=seq, level='ERROR' if seq % 10 == 0 else 'INFO', logger='pyra.webapp', message=f'{seq}')
+               for seq in range(1, 301)]
+    write_jsonl(f'{path}.20220410-000000', entries[:100])
+    with open(f'{path}.20220410-000000', 'rb') as source, gzip.open(f'{path}.20220410-000000.gz', 'wb') as target:
+        target.write(source.read())
+    os.remove(f'{path}.20220410-000000')
+    write_jsonl(f'{path}.20220411-000000', entries[100:200])
+    write_jsonl(path, entries[200:])
+
+    records = logview.read_file_logs(path=path, before=150, limit=3)
+    assert [record['seq'] for record in records] == [147, 148, 149]
+
+    records = logview.read_file_logs(path=path, after=195, limit=10)
+    assert [record['seq'] for record in records] == list(range(196, 206))
+
+    records = logview.read_file_logs(path=path, level=logging.ERROR, before=35, limit=10)
+    assert [record['seq'] for record in records] == [10, 20, 30]
+
+    records = logview.read_file_logs(path=path, before=102, limit=4)
+    assert [record['seq'] for record in records] == [98, 99, 100, 101]
+
+    records = logview.read_file_logs(path=path, after=50, before=53)
+    assert [record['seq'] for record in records] == [51, 52]
+
+    records = logview.read_file_logs(path=path, limit=2)
+    assert [record['seq'] for record in records] == [299, 300]
+
+    assert logview.last_seq(path=path) == 300
+    assert logview.last_seq(path=os.path.join(tmp_path, 'missing.jsonl')) == 0
+
+
+def test_read_logs(tmp_path, ring):
+    """Tests that records missing from the ring are read from the files"""
+    path = os.path.join(tmp_path, 'pyra.jsonl')
+    write_jsonl(path, [dict(seq=seq, level='INFO', logger='pyra.webapp', message=f'{seq}') for seq in range(1, 11)])
+
+    ring.resume(seq=10)
+    for index in range(3):
+        ring.add(record=make_record(msg=f'{11 + index}'))
+
+    records = logview.read_logs(limit=5, path=path)
+    assert [record['seq'] for record in records] == [9, 10, 11, 12, 13]
+
+    records = logview.read_logs(after=8, limit=3, path=path)
+    assert [record['seq'] for record in records] == [9, 10, 11]
+
+    records = logview.read_logs(before=9, limit=2, path=path)
+    assert [record['seq'] for record in records] == [7, 8]
+
+    records = logview.read_logs(after=13, path=path)
+    assert records == []
@@ -0,0 +1,108 @@
+"""
+..
+   test_process_table.py
+
+Unit tests for pyra.process_table.
+"""
+# standard imports
+import os
+
+# lib imports
+import pytest
+
+# local imports
+from pyra import process_table
+
+
+def _write_process(proc_path, pid: int, name: str, cpu_ticks: int, resident_pages: int, children=(),
+                   start_time: int = 1000):
+    """Write the proc files of a fake process"""
+    fields = ['S', '1'] + ['0'] * 9 + [str(cpu_ticks), '0'] + ['0'] * 6 + [str(start_time), '0']
+
+    task_path = os.path.join(proc_path, str(pid), 'task', str(pid))
+    os.makedirs(task_path, exist_ok=True)
+    with open(os.path.join(proc_path, str(pid), 'stat'), 'w') as f:
+        f.write(f'{pid} ({name}) {" ".join(fields)}\n')
+    with open(os.path.join(proc_path, str(pid), 'statm'), 'w') as f:
+        f.write(f'1000 {resident_pages} 0 0 0 0 0\n')
+    with open(os.path.join(task_path, 'children'), 'w') as f:
+        f.write(' '.join(str(child) for child in children))
+
+
+def _remove_process(proc_path, pid: int):
+    """Remove the proc files of a fake process"""
+    for root, dirs, files in os.walk(os.path.join(proc_path, str(pid)), topdown=False):
+        for name in files:
+            os.remove(os.path.join(root, name))
+        os.rmdir(root)
+
+
+@pytest.fixture(scope='function')
+def test_table(tmp_path):
+    """Create a process table reading a fake proc filesystem with a controlled clock"""
+    now = [0.0]
+
+    table = process_table.ProcessTable(root_pid=10, root_name='RetroArcher', proc_path=str(tmp_path),
+                                       clock=lambda: now[0])
+    table.clock_ticks = 100
+    table.page_size = 1000
+    table.total_memory = 1000000
+
+    yield table, str(tmp_path), now
+
+
+def test_parse_stat():
+    """Tests parsing a stat file with a name containing spaces and parentheses"""
+    content = '42 (a (b) c) S 7 42 42 0 -1 4194304 0 0 0 0 150 50 0 0 20 0 1 0 9000 0 0'
+    assert process_table.parse_stat(content=content) == ('a (b) c', 7, 200, 9000)
+
+    with pytest.raises(ValueError):
+        process_table.parse_stat(content='invalid')
+
+
+def test_sample_tree(test_table):
+    """Tests that descendants are tracked and the cpu percentage is computed from the difference in cpu time"""
+    table, proc_path, now = test_table
+
+    _write_process(proc_path=proc_path, pid=10, name='python', cpu_ticks=0, resident_pages=100, children=[20])
+    _write_process(proc_path=proc_path, pid=20, name='launcher', cpu_ticks=0, resident_pages=10, children=[30])
+    _write_process(proc_path=proc_path, pid=30, name='emulator', cpu_ticks=0, resident_pages=500)
+
+    assert table.sample() == [('RetroArcher', 0.0, 10.0), ('launcher', 0.0, 1.0), ('emulator', 0.0, 50.0)]
+    assert table.pids == [10, 20, 30]
+
+    now[0] = 2.0
+    _write_process(proc_path=proc_path, pid=30, name='emulator', cpu_ticks=100, resident_pages=500)  # 1s cpu in 2s
+    _write_process(proc_path=proc_path, pid=20, name='launcher', cpu_ticks=1000, resident_pages=10, children=[30])
+
+    process_stats = dict((name, cpu) for name, cpu, memory in table.sample())
+    assert process_stats['emulator'] == 50.0
+    assert process_stats['launcher'] == 100.0  # max of 100
+
+
+def test_sample_evicts_exited(test_table):
+    """Tests that exited processes are evicted and reused pids are treated as new processes"""
+    table, proc_path, now = test_table
+
+    _write_process(proc_path=proc_path, pid=10, name='python', cpu_ticks=0, resident_pages=100, children=[20, 30])
+    _write_process(proc_path=proc_path, pid=20, name='emulator', cpu_ticks=0, resident_pages=10)
+    _write_process(proc_path=proc_path, pid=30, name='game', cpu_ticks=0, resident_pages=10)
+    table.sample()
+
+    _remove_process(proc_path=proc_path, pid=20)
+    _write_process(proc_path=proc_path, pid=30, name='other', cpu_ticks=500, resident_pages=10, start_time=2000)
+
+    now[0] = 1.0
+    assert table.sample() == [('RetroArcher', 0.0, 10.0), ('other', 0.0, 1.0)]
+    assert table.pids == [10, 30]
+
+
+def test_sample_psutil():
+    """Tests sampling the current process using psutil"""
+    table = process_table.ProcessTable(root_pid=os.getpid(), root_name='RetroArcher')
+
+    process_stats = table._sample_psutil()
+    assert process_stats[0][0] == 'RetroArcher'
+    for name, cpu_percent, memory_percent in process_stats:
+        assert 0 <= cpu_percent <= 100
+        assert 0 <= memory_percent <= 100
@@ -0,0 +1,103 @@
+"""
+..
+   test_sampler.py
+
+Unit tests for pyra.sampler.
+"""
+# standard imports
+import threading
+import time
+
+# lib imports
+import pytest
+
+# local imports
+from pyra import sampler
+
+
+def test_sampler_runs_tasks():
+    """Tests that tasks run repeatedly in the order they were added, and stop running after stop is called"""
+    calls = []
+    done = threading.Event()
+
+    def second():
+        calls.append('second')
+        if calls.count('second') >= 3:
+            done.set()
+
+    test_sampler = sampler.Sampler(name='TestSampler')
+    test_sampler.add_task(name='first', interval=0.01, target=lambda: calls.append('first'))
+    test_sampler.add_task(name='second', interval=0.01, target=second)
+    test_sampler.start()
+
+    assert done.wait(timeout=5)
+    test_sampler.stop()
+
+    assert calls[:2] == ['first', 'second']  # tasks due at the same time keep their order
+
+    count = len(calls)
+    time.sleep(0.05)
+    assert len(calls) == count
+
+    stats = test_sampler.stats()
+    assert stats['second']['runs'] >= 3
+    assert stats['second']['errors'] == 0
+
+
+def test_sampler_overrun():
+    """Tests that missed deadlines are skipped instead of running the task repeatedly"""
+    task = sampler.Task(name='slow', interval=0.01, target=lambda: time.sleep(0.035))
+    task.deadline = time.monotonic()
+
+    test_sampler = sampler.Sampler()
+    test_sampler._run_task(task=task)
+
+    assert task.runs == 1
+    assert task.overruns == 1
+    assert task.skipped >= 3
+    assert task.deadline > time.monotonic()  # the next deadline is in the future
+
+
+def test_sampler_fixed_deadline():
+    """Tests that the next deadline does not depend on how long the task took"""
+    task = sampler.Task(name='fast', interval=10, target=lambda: time.sleep(0.01))
+    deadline = time.monotonic()
+    task.deadline = deadline
+
+    sampler.Sampler()._run_task(task=task)
+
+    assert task.deadline == deadline + 10
+    assert task.overruns == 0
+    assert task.last_jitter > 0
+
+
+def test_sampler_task_error():
+    """Tests that an exception in a task is counted and does not stop the task from being scheduled"""
+    def fail():
+        raise RuntimeError('test')
+
+    task = sampler.Task(name='fail', interval=10, target=fail)
+    task.deadline = time.monotonic()
+
+    sampler.Sampler()._run_task(task=task)
+
+    assert task.errors == 1
+    assert task.runs == 1
+
+
+def test_sampler_set_interval():
+    """Tests changing the interval of a task"""
+    test_sampler = sampler.Sampler()
+    test_sampler.add_task(name='cpu', interval=1, target=print)
+
+    test_sampler.set_interval(name='cpu', interval=2)
+    assert test_sampler.stats()['cpu']['interval'] == 2
+
+    with pytest.raises(KeyError):
+        test_sampler.set_interval(name='invalid', interval=2)
+
+    with pytest.raises(ValueError):
+        test_sampler.set_interval(name='cpu', interval=0)
+
+    with pytest.raises(ValueError):
+        test_sampler.add_task(name='gpu', interval=-1, target=print)
@@ -0,0 +1,172 @@
+"""
+..
+   test_timeseries.py
+
+Unit tests for pyra.timeseries.
+"""
+# standard imports
+import os
+
+# lib imports
+import numpy as np
+import pytest
+
+# local imports
+from pyra import timeseries
+
+
+def test_to_list():
+    """Tests that NaN values are converted to None"""
+    result = timeseries.to_list(values=np.array([1.0, np.nan, 3.5]))
+    assert result == [1.0, None, 3.5]
+
+
+def test_store_advance():
+    """Tests that rows are appended until the store is full, then the oldest rows are overwritten"""
+    store = timeseries.TimeSeriesStore(capacity=3, series=dict(cpu=['system']))
+    assert store.length == 0
+    assert len(store['cpu']['system']) == 0
+
+    for count in range(5):
+        store.advance(timestamp=count)
+        store.record(group='cpu', key='system', value=count * 10)
+
+    assert store.length == 3
+    assert store.seq == 5
+    assert store.times().tolist() == [2, 3, 4]
+    assert store.values(group='cpu', key='system').tolist() == [20, 30, 40]
+    assert store['cpu']['system'][0] == 20
+    assert store['cpu']['system'][-1] == 40
+
+    with pytest.raises(IndexError):
+        store.get(group='cpu', key='system', index=3)
+
+
+def test_store_rows_since():
+    """Tests reading only the rows appended since a sequence number"""
+    store = timeseries.TimeSeriesStore(capacity=3, series=dict(cpu=['system']))
+
+    for count in range(4):
+        store.advance(timestamp=count)
+        store.record(group='cpu', key='system', value=count)
+
+    assert store.rows_since(seq=2) == 2
+    assert store.times(count=2).tolist() == [2, 3]
+    assert store['cpu']['system'].values(count=2).tolist() == [2, 3]
+    assert store.values(group='cpu', key='system', count=0).size == 0
+
+    assert store.rows_since(seq=0) is None  # overwritten rows
+    assert store.rows_since(seq=5) is None  # newer than the store
+
+
+def test_store_new_series():
+    """Tests that a series created later holds missing values for existing rows"""
+    store = timeseries.TimeSeriesStore(capacity=5)
+
+    store.advance(timestamp=1)
+    store.advance(timestamp=2)
+    store.record(group='gpu', key='test-0', value=50)
+
+    assert 'gpu' in store
+    assert list(store['gpu']) == ['test-0']
+    assert len(store['gpu']['test-0']) == 2
+    assert store['gpu']['test-0'][0] is None
+    assert store['gpu']['test-0'][-1] == 50
+
+
+def test_store_missing_value():
+    """Tests that rows are reset for every series when advancing"""
+    store = timeseries.TimeSeriesStore(capacity=5, series=dict(cpu=['system']))
+
+    store.advance(timestamp=1)
+    store.record(group='cpu', key='system', value=5)
+    store.advance(timestamp=2)
+    store.record(group='cpu', key='system', value=None)
+
+    assert timeseries.to_list(values=store.values(group='cpu', key='system')) == [5, None]
+
+
+def test_store_record_empty():
+    """Tests that recording a value before any row exists only creates the series"""
+    store = timeseries.TimeSeriesStore(capacity=5)
+    store.record(group='cpu', key='system', value=5)
+
+    assert 'system' in store['cpu']
+    assert store.length == 0
+    assert store.values(group='cpu', key='system').size == 0
+
+
+def test_mapped_store_resume(tmp_path):
+    """Tests that a memory-mapped store resumes with the rows and series of the file"""
+    path = os.path.join(tmp_path, 'metrics', 'test.dat')
+
+    store = timeseries.MappedTimeSeriesStore(path=path, capacity=3, series=dict(cpu=['system']))
+    for count in range(4):
+        store.advance(timestamp=count)
+        store.record(group='cpu', key='system', value=count * 10)
+    store.record(group='gpu', key='test-0', value=50)
+    store.flush()
+
+    assert timeseries.read_header(path=path) == dict(capacity=3, max_series=64, head=0, length=3, seq=4,
+                                                     structure_seq=4)
+
+    store = timeseries.MappedTimeSeriesStore(path=path, capacity=3, series=dict(cpu=['system']))
+    assert store.seq == 4
+    assert list(store) == ['cpu', 'gpu']
+    assert store.times().tolist() == [1, 2, 3]
+    assert store.values(group='cpu', key='system').tolist() == [10, 20, 30]
+    assert store['gpu']['test-0'][-1] == 50
+
+    store.advance(timestamp=4)
+    assert store.times().tolist() == [2, 3, 4]
+
+    readonly_store = timeseries.MappedTimeSeriesStore(path=path, readonly=True)
+    assert readonly_store.capacity == 3
+    assert readonly_store.times().tolist() == [2, 3, 4]
+    with pytest.raises(ValueError):
+        readonly_store.advance(timestamp=5)
+
+
+def test_mapped_store_incompatible(tmp_path):
+    """Tests that a file with a different layout is replaced"""
+    path = os.path.join(tmp_path, 'test.dat')
+
+    store = timeseries.MappedTimeSeriesStore(path=path, capacity=3)
+    store.advance(timestamp=1)
+    store.flush()
+
+    store = timeseries.MappedTimeSeriesStore(path=path, capacity=5)
+    assert store.length == 0
+    assert store.head == -1
+    assert timeseries.read_header(path=path)['capacity'] == 5
+
+    with open(path, 'wb') as f:
+        f.write(b'invalid')
+    with pytest.raises(ValueError):
+        timeseries.read_header(path=path)
+
+    with pytest.raises(ValueError):
+        timeseries.MappedTimeSeriesStore(path=path)
+
+
+def test_mapped_store_slots(tmp_path):
+    """Tests that slots of series without values are reused once all slots are used"""
+    store = timeseries.MappedTimeSeriesStore(path=os.path.join(tmp_path, 'test.dat'), capacity=2, max_series=2)
+
+    store.advance(timestamp=1)
+    store.record(group='cpu', key='old', value=5)
+    store.record(group='cpu', key='system', value=5)
+    store.advance(timestamp=2)
+    store.record(group='cpu', key='system', value=10)
+
+    store.record(group='cpu', key='memory-only', value=1)  # no slot without values yet
+    assert store['cpu']['memory-only'][-1] == 1
+
+    store.advance(timestamp=3)  # `old` no longer has any values
+    store.record(group='cpu', key='new', value=15)
+
+    assert list(store['cpu']) == ['system', 'memory-only', 'new']
+    assert store['cpu']['new'].values().tolist()[-1] == 15
+
+    store = timeseries.MappedTimeSeriesStore(path=os.path.join(tmp_path, 'test.dat'), capacity=2, max_series=2)
+    assert list(store['cpu']) == ['new', 'system']  # slot order
@@ -0,0 +1,53 @@
+"""
+..
+   test_watcher.py
+
+Unit tests for pyra.watcher.
+"""
+# standard imports
+import os
+import threading
+
+# lib imports
+import pytest
+
+# local imports
+from pyra import watcher
+
+
+@pytest.fixture(scope='function', params=[True, False], ids=['inotify', 'polling'])
+def use_inotify(request):
+    """Test with inotify and with polling"""
+    if request.param and not watcher._libc:
+        pytest.skip('inotify is not available')
+    yield request.param
+
+
+def test_file_watcher(tmp_path, use_inotify):
+    """Tests that replacing a file calls the callback once"""
+    path = tmp_path / 'config.ini'
+    path.write_text('[General]\n')
+
+    changed = threading.Event()
+    calls = []
+
+    def callback():
+        calls.append(path.read_text())
+        changed.set()
+
+    file_watcher = watcher.FileWatcher(path=str(path), callback=callback, interval=0.1, settle=0.1,
+                                       use_inotify=use_inotify)
+    file_watcher.start()
+    try:
+        assert file_watcher.backend == ('inotify' if use_inotify else 'polling')
+        assert not changed.wait(timeout=0.3)  # the file has not changed
+
+        temp_path = tmp_path / '.config.ini.tmp'
+        temp_path.write_text('[General]\nLOCALE = es\n')
+        os.replace(temp_path, path)
+
+        assert changed.wait(timeout=5)
+    finally:
+        file_watcher.stop(timeout=5)
+
+    assert calls == ['[General]\nLOCALE = es\n']
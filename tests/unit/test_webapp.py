@@ -5,15 +5,17 @@
 Unit tests for pyra.webapp.
 """
 # standard imports
+import json
 import sys
+import time
 
 # local imports
 from pyra import threads
 from pyra import webapp
 
 
-def test_start_webapp():
-    """Test start_webapp function"""
+def test_start_webapp(test_config_object):
+    """Test start_webapp and stop_webapp functions"""
     app = webapp.app
     app.testing = True
 
@@ -23,7 +25,8 @@ def test_start_webapp():
 
     client = app.test_client()
 
-    threads.run_in_thread(target=webapp.start_webapp, name='Flask', daemon=True).start()
+    webapp_thread = threads.run_in_thread(target=webapp.start_webapp, name='Flask', daemon=True)
+    webapp_thread.start()
 
     # Create a test client using the Flask application configured for testing
     with client as test_client:
@@ -31,3 +34,68 @@ def test_start_webapp():
         # with app.app_context():
         response = test_client.get('/')
         assert response.status_code == 200
+
+    for _ in range(100):  # wait for the server to be created
+        if webapp.server:
+            break
+        time.sleep(0.05)
+    assert webapp.server
+
+    webapp.stop_webapp()
+    webapp_thread.join(timeout=10)
+    assert not webapp_thread.is_alive()
+    assert webapp.server is None
+
+    webapp.stop_webapp()  # does nothing when not running
+
+
+def test_event_stream_close():
+    """Test that closing the stream ends the stream of every subscriber"""
+    stream = webapp.EventStream(keep_alive=5)
+    listener = stream.listen()
+    next(listener)  # retry
+
+    stream.close()
+
+    assert stream.subscribers == 0
+    assert list(listener) == []
+
+
+def test_event_stream():
+    """Test that events are encoded once and delivered to every subscriber"""
+    stream = webapp.EventStream(max_queued=2, keep_alive=0.01)
+
+    first = stream.listen()
+    second = stream.listen()
+    assert stream.subscribers == 2
+
+    # the reconnection delay is sent as soon as the stream starts
+    assert next(first) == b'retry: 3000\n\n'
+    assert next(second) == b'retry: 3000\n\n'
+
+    stream.publish(data={'test': True}, event='update')
+
+    for subscriber in (first, second):
+        message = next(subscriber)
+        assert message.startswith(b'event: update\ndata: ')
+        assert message.endswith(b'\n\n')
+        assert json.loads(message.split(b'data: ', 1)[1]) == {'test': True}
+
+    assert next(first) == b': keep-alive\n\n'
+
+    first.close()
+    assert stream.subscribers == 1
+
+
+def test_event_stream_slow_subscriber():
+    """Test that subscribers which do not keep up are disconnected without blocking the publisher"""
+    stream = webapp.EventStream(max_queued=1)
+
+    subscriber = stream.listen()
+    stream.publish(data={'count': 1})
+    stream.publish(data={'count': 2})  # queue is full, this must not block
+
+    assert stream.subscribers == 0
+
+    # the pending events are dropped and the stream ends
+    assert list(subscriber) == [b'retry: 3000\n\n']